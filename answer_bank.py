@@ -0,0 +1,233 @@
+# mirror_backend/answer_bank.py
+
+import json
+import time
+import random
+import shutil
+import numpy as np
+from collections import Counter
+from pathlib import Path
+from typing import Optional, List, Dict, Iterable
+from dataclasses import dataclass, field, asdict
+from config import config
+from logging_config import get_logger
+from semantic_cache import embed, canonicalize
+
+logger = get_logger(__name__)
+
+CURRENT_FILE = "CURRENT"  # Holds the name of the live bank version
+BANK_FILE = "bank.json"
+VECTORS_FILE = "vectors.npy"  # One row per example phrasing
+EXAMPLE_INTENTS_FILE = "example_intents.npy"  # Intent index of each row
+
+@dataclass
+class BankAnswer:
+    text: str
+    audio: str  # File name inside the version directory
+
+@dataclass
+class Intent:
+    name: str  # Most frequent phrasing
+    count: int  # Comments mined for this intent
+    examples: List[str] = field(default_factory=list)
+    answers: List[BankAnswer] = field(default_factory=list)
+
+class AnswerBank:
+    """
+    Pre-generated answers with pre-rendered audio for the most frequent
+    comment intents. A comment matching an intent's example phrasings is
+    answered with one of its clips, with no GPT or TTS call.
+
+    Banks are built offline by build_bank() into versioned directories;
+    the CURRENT file names the live one, so a rebuild or a rollback is a
+    one-line change.
+    """
+    def __init__(self, directory: Path, threshold: float):
+        self.directory = directory
+        self.threshold = threshold
+        self.version: Optional[str] = None
+        self._version_dir: Optional[Path] = None
+        self.intents: List[Intent] = []
+        self._dim = 0
+        self._vectors: Optional[np.ndarray] = None
+        self._example_intents: Optional[np.ndarray] = None
+        self._last_answer: Dict[int, int] = {}  # Last answer served per intent
+
+    def load(self) -> bool:
+        """Load the current bank version. Returns False if there is none."""
+        current = self.directory / CURRENT_FILE
+        if not current.exists():
+            return False
+        try:
+            start = time.monotonic()
+            version_dir = self.directory / current.read_text().strip()
+            data = json.loads((version_dir / BANK_FILE).read_text())
+            self.intents = [
+                Intent(
+                    name=intent["name"],
+                    count=intent["count"],
+                    examples=intent["examples"],
+                    answers=[BankAnswer(**answer) for answer in intent["answers"]]
+                )
+                for intent in data["intents"]
+            ]
+            self._dim = data["dim"]
+            self._vectors = np.load(version_dir / VECTORS_FILE)
+            self._example_intents = np.load(version_dir / EXAMPLE_INTENTS_FILE)
+            self.version = data["version"]
+            self._version_dir = version_dir
+            self._last_answer.clear()
+            logger.info(
+                f"Loaded answer bank {self.version}: {len(self.intents)} intents "
+                f"in {(time.monotonic() - start) * 1000:.1f} ms"
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error loading answer bank: {str(e)}")
+            self.version = None
+            return False
+
+    def match(self, text: str) -> Optional[BankAnswer]:
+        """
+        Return a pre-rendered answer if the text matches a banked intent.
+        The answer's audio field is resolved to a full path. Consecutive
+        matches of one intent get different answers where possible.
+        """
+        if self.version is None or self._vectors is None or not len(self._vectors):
+            return None
+
+        scores = self._vectors @ embed(text, self._dim)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+
+        intent_index = int(self._example_intents[best])
+        answers = self.intents[intent_index].answers
+        choices = [i for i in range(len(answers)) if i != self._last_answer.get(intent_index)]
+        choice = random.choice(choices or range(len(answers)))
+        self._last_answer[intent_index] = choice
+        answer = answers[choice]
+        return BankAnswer(text=answer.text, audio=str(self._version_dir / answer.audio))
+
+def load_comments(paths: Iterable[Path]) -> List[str]:
+    """
+    Read historical comments from recorded comment logs (JSON lines with a
+    "text" field) or plain text files with one comment per line.
+    """
+    comments = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if path.suffix == ".jsonl":
+                    try:
+                        line = json.loads(line).get("text", "")
+                    except ValueError:
+                        continue
+                if line:
+                    comments.append(line)
+    return comments
+
+def mine_intents(comments: List[str], threshold: float, min_count: int,
+                 max_intents: int, max_examples: int = 10) -> List[Intent]:
+    """
+    Group comments into intents by embedding similarity and keep the most
+    frequent. Each distinct phrasing joins the most similar existing group
+    if it clears the threshold, or starts a new one; phrasings are visited
+    most frequent first so groups are led by their commonest form.
+    """
+    phrasings = Counter()
+    first_seen: Dict[str, str] = {}
+    for comment in comments:
+        key = canonicalize(comment)
+        if len(key) < 2:
+            continue
+        phrasings[key] += 1
+        first_seen.setdefault(key, comment)
+
+    dim = config.gpt.semantic_dim
+    # Embedding of each group's leading phrasing, one row per group
+    leaders = np.zeros((len(phrasings), dim), dtype=np.float32)
+    groups: List[Intent] = []
+    for key, count in phrasings.most_common():
+        vector = embed(key, dim)
+        if groups:
+            scores = leaders[:len(groups)] @ vector
+            best = int(np.argmax(scores))
+            if scores[best] >= threshold:
+                group = groups[best]
+                group.count += count
+                if len(group.examples) < max_examples:
+                    group.examples.append(first_seen[key])
+                continue
+        leaders[len(groups)] = vector
+        groups.append(Intent(name=first_seen[key], count=count, examples=[first_seen[key]]))
+
+    groups = [group for group in groups if group.count >= min_count]
+    groups.sort(key=lambda group: group.count, reverse=True)
+    return groups[:max_intents]
+
+def build_bank(comments: List[str], directory: Path, answers_per_intent: int,
+               min_count: int, max_intents: int) -> Optional[str]:
+    """
+    Offline job: mine intents from historical comments, generate several
+    answers per intent with GPT, synthesize them with TTS and write a new
+    bank version. Returns the version name, or None if nothing was built.
+    """
+    # Imported here so loading the bank at runtime doesn't pull in the API clients
+    from gpt_handler import gpt_handler
+    from tts_handler import tts_handler
+
+    settings = config.answer_bank
+    intents = mine_intents(comments, settings.match_threshold, min_count, max_intents)
+    logger.info(f"Mined {len(intents)} intents from {len(comments)} comments")
+
+    version = time.strftime("%Y%m%d_%H%M%S")
+    build_dir = directory / f".{version}.tmp"
+    build_dir.mkdir(parents=True, exist_ok=True)
+
+    kept: List[Intent] = []
+    for intent in intents:
+        replies = gpt_handler.ask_gpt_variants(intent.name, answers_per_intent)
+        for reply in replies:
+            cache_path = tts_handler.cache_audio(reply)
+            if cache_path is None:
+                continue
+            # Copy the clip in so audio cache eviction can't break the bank
+            audio_name = f"{len(kept)}_{len(intent.answers)}.mp3"
+            shutil.copyfile(cache_path, build_dir / audio_name)
+            intent.answers.append(BankAnswer(text=reply, audio=audio_name))
+        if intent.answers:
+            kept.append(intent)
+            logger.info(f"Banked {len(intent.answers)} answers for '{intent.name}'")
+
+    if not kept:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        return None
+
+    dim = config.gpt.semantic_dim
+    rows = [(index, example) for index, intent in enumerate(kept) for example in intent.examples]
+    np.save(build_dir / VECTORS_FILE, np.stack([embed(example, dim) for _, example in rows]))
+    np.save(build_dir / EXAMPLE_INTENTS_FILE, np.array([index for index, _ in rows], dtype=np.int32))
+    (build_dir / BANK_FILE).write_text(json.dumps({
+        "version": version,
+        "created_at": time.time(),
+        "model": gpt_handler.model,
+        "voice_id": tts_handler.voice_id,
+        "dim": dim,
+        "intents": [asdict(intent) for intent in kept],
+    }, indent=2))
+
+    # Publish: move the finished version into place, then switch CURRENT
+    build_dir.rename(directory / version)
+    tmp_current = directory / f"{CURRENT_FILE}.tmp"
+    tmp_current.write_text(version)
+    tmp_current.replace(directory / CURRENT_FILE)
+    return version
+
+# Create singleton instance
+answer_bank = AnswerBank(config.answer_bank.directory, config.answer_bank.match_threshold)
+if config.answer_bank.enabled:
+    answer_bank.load()
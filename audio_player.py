@@ -1,12 +1,16 @@
 # mirror_backend/audio_player.py
 
 import os
+import asyncio
 import platform
 import subprocess
 import threading
 from pathlib import Path
 from queue import Queue
-from typing import Optional
+from typing import Optional, Callable, Union
+from audio_stream import AudioStream
+from metrics import metrics_collector
+from tracing import Trace
 
 class AudioPlayer:
     def __init__(self):
@@ -28,6 +32,39 @@ class AudioPlayer:
         else:  # Linux
             return ["mpg123", "-q", path]
 
+    @property
+    def can_stream(self) -> bool:
+        """Whether this platform's player can play MP3 from stdin."""
+        return platform.system() == "Linux"
+
+    def _get_stream_command(self) -> list:
+        """Player command that reads MP3 from stdin."""
+        return ["mpg123", "-q", "-"]
+
+    def _play_stream(self, stream: AudioStream) -> bool:
+        """Play a clip while it downloads, piping its chunks into the player."""
+        try:
+            process = subprocess.Popen(
+                self._get_stream_command(),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL
+            )
+            self.current_process = process
+            try:
+                for chunk in stream.chunks():
+                    process.stdin.write(chunk)
+                    process.stdin.flush()
+                process.stdin.close()
+            except BrokenPipeError:
+                pass  # The player was stopped mid-clip
+            return process.wait() == 0 and not stream.failed
+        except Exception as e:
+            print(f"Error playing audio stream: {str(e)}")
+            return False
+        finally:
+            self.current_process = None
+
     def _play_audio_file(self, audio_path: str) -> bool:
         """Play a single audio file and return success status."""
         if not os.path.exists(audio_path):
@@ -49,18 +86,95 @@ class AudioPlayer:
         finally:
             self.current_process = None
 
+    def _mark_playback(self, trace: Optional[Trace]):
+        """Mark playback start on a trace and report it the first time."""
+        if trace is not None and trace.mark("playback_start"):
+            metrics_collector.record_trace(trace)
+
+    async def play_audio_file_async(self, audio_path: str, trace: Optional[Trace] = None) -> bool:
+        """Play a single audio file without blocking the event loop."""
+        self._mark_playback(trace)
+        if not os.path.exists(audio_path):
+            print(f"Audio file not found: {audio_path}")
+            return False
+
+        try:
+            cmd = self._get_player_command(audio_path)
+            self.is_playing = True
+            self.current_process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            return await self.current_process.wait() == 0
+        except Exception as e:
+            print(f"Error playing audio: {str(e)}")
+            return False
+        finally:
+            self.is_playing = False
+            self.current_process = None
+
+    async def play_stream_async(self, stream: AudioStream, trace: Optional[Trace] = None) -> bool:
+        """Play a clip while it downloads, without blocking the event loop."""
+        self._mark_playback(trace)
+        try:
+            self.is_playing = True
+            self.current_process = await asyncio.create_subprocess_exec(
+                *self._get_stream_command(),
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            process = self.current_process
+            try:
+                async for chunk in stream.chunks_async():
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+                process.stdin.close()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # The player was stopped mid-clip
+            return await process.wait() == 0 and not stream.failed
+        except Exception as e:
+            print(f"Error playing audio stream: {str(e)}")
+            return False
+        finally:
+            self.is_playing = False
+            self.current_process = None
+
     def _process_queue(self):
         """Process the audio queue in a separate thread."""
         while True:
-            audio_path = self.audio_queue.get()
+            audio, on_complete, trace = self.audio_queue.get()
             self.is_playing = True
-            self._play_audio_file(audio_path)
-            self.is_playing = False
-            self.audio_queue.task_done()
+            self._mark_playback(trace)
+            try:
+                if isinstance(audio, AudioStream):
+                    self._play_stream(audio)
+                else:
+                    self._play_audio_file(audio)
+            finally:
+                self.is_playing = False
+                self._run_callback(on_complete)
+                self.audio_queue.task_done()
+
+    def _run_callback(self, on_complete: Optional[Callable[[], None]]):
+        """Run a completion callback, keeping errors out of the player thread."""
+        if on_complete is None:
+            return
+        try:
+            on_complete()
+        except Exception as e:
+            print(f"Error in playback callback: {str(e)}")
 
-    def play_audio(self, audio_path: str):
-        """Add audio to the playback queue."""
-        self.audio_queue.put(audio_path)
+    def play_audio(self, audio: Union[str, AudioStream],
+                   on_complete: Optional[Callable[[], None]] = None,
+                   trace: Optional[Trace] = None):
+        """
+        Add audio to the playback queue: a file path, or a stream that is
+        still downloading. `on_complete` is called once the clip has
+        played or been discarded.
+        """
+        self.audio_queue.put((audio, on_complete, trace))
 
     def stop_current(self):
         """Stop the currently playing audio."""
@@ -72,8 +186,9 @@ class AudioPlayer:
         """Clear the audio queue."""
         while not self.audio_queue.empty():
             try:
-                self.audio_queue.get_nowait()
+                _, on_complete, _ = self.audio_queue.get_nowait()
                 self.audio_queue.task_done()
+                self._run_callback(on_complete)
             except:
                 pass
 
@@ -0,0 +1,90 @@
+# mirror_backend/audio_stream.py
+
+import asyncio
+from pathlib import Path
+from queue import Queue
+from typing import Optional, Callable, Iterator, AsyncIterator, Union
+from cache_manager import cache_manager
+
+class AudioStream:
+    """
+    MP3 audio that is still downloading from a streamed synthesis.
+    pump() reads the response on a TTS worker, handing every chunk to the
+    player as it arrives and teeing it into the cache file, so playback
+    starts after the first few kilobytes instead of the whole clip. The
+    cache file only appears once the download is complete.
+    """
+    def __init__(self, text: str, cache_path: Path,
+                 source: Union[Iterator[bytes], AsyncIterator[bytes]],
+                 close: Optional[Callable[[], None]] = None):
+        self.text = text
+        self.cache_path = cache_path
+        self.failed = False
+        self._source = source
+        self._close = close  # Releases the HTTP response
+        self._chunks: Queue = Queue()  # None marks the end
+
+    def _part_path(self) -> Path:
+        # Unique per stream, in case two workers download the same text
+        return self.cache_path.with_name(f"{self.cache_path.stem}.{id(self)}.part")
+
+    def _finish(self, completed: bool):
+        """Publish the cache file if the download completed, and end the stream."""
+        part = self._part_path()
+        if completed:
+            part.replace(self.cache_path)
+            cache_manager.file_added(self.cache_path)
+        else:
+            self.failed = True
+            part.unlink(missing_ok=True)
+        self._chunks.put(None)
+        if self._close is not None:
+            self._close()
+
+    def pump(self) -> bool:
+        """Read the whole response. Returns True if it completed and was cached."""
+        completed = False
+        try:
+            with open(self._part_path(), "wb") as f:
+                for chunk in self._source:
+                    if chunk:
+                        f.write(chunk)
+                        self._chunks.put(chunk)
+            completed = True
+        except Exception as e:
+            print(f"TTS stream interrupted: {str(e)}")
+        finally:
+            self._finish(completed)
+        return completed
+
+    async def pump_async(self) -> bool:
+        """Async version of pump, for a response read on the event loop."""
+        completed = False
+        try:
+            with open(self._part_path(), "wb") as f:
+                async for chunk in self._source:
+                    if chunk:
+                        f.write(chunk)
+                        self._chunks.put(chunk)
+            completed = True
+        except Exception as e:
+            print(f"TTS stream interrupted: {str(e)}")
+        finally:
+            self._finish(completed)
+        return completed
+
+    def chunks(self) -> Iterator[bytes]:
+        """Chunks in order, waiting for each to arrive, until the download ends."""
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                return
+            yield chunk
+
+    async def chunks_async(self) -> AsyncIterator[bytes]:
+        """Async version of chunks; waits off the event loop."""
+        while True:
+            chunk = await asyncio.to_thread(self._chunks.get)
+            if chunk is None:
+                return
+            yield chunk
@@ -0,0 +1,36 @@
+import argparse
+from pathlib import Path
+from config import config
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a Mirror.exe answer bank from recorded comments')
+    parser.add_argument('inputs', nargs='*', type=Path,
+                        help='Comment logs (.jsonl) or text files; defaults to the recorded comment logs')
+    parser.add_argument('--answers', type=int, default=config.answer_bank.answers_per_intent,
+                        help='Answers to generate per intent')
+    parser.add_argument('--min-count', type=int, default=config.answer_bank.min_count,
+                        help='Comments an intent needs to be banked')
+    parser.add_argument('--max-intents', type=int, default=config.answer_bank.max_intents,
+                        help='Most frequent intents to bank')
+    args = parser.parse_args()
+
+    # Imported after argument parsing so --help doesn't load the API clients
+    from answer_bank import load_comments, build_bank
+
+    inputs = args.inputs or sorted(config.chat.comment_log_dir.glob("*.jsonl"))
+    comments = load_comments(inputs)
+    print(f"📚 Building answer bank from {len(comments)} comments in {len(inputs)} files...")
+
+    version = build_bank(
+        comments, config.answer_bank.directory,
+        answers_per_intent=args.answers,
+        min_count=args.min_count,
+        max_intents=args.max_intents
+    )
+    if version is None:
+        print("No intents were banked.")
+    else:
+        print(f"✨ Answer bank {version} is now live in {config.answer_bank.directory}")
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,27 @@
 import os
 import time
+import tempfile
+import threading
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Set, Dict, Union
 from config import config
 from logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# Eviction frees space down to this fraction of the limit, so the next
+# few additions don't each trigger another full scan
+EVICT_TO = 0.9
+
 class CacheManager:
     def __init__(self, cache_dir: Path = config.audio.cache_dir):
         self.cache_dir = cache_dir
         self.max_size_bytes = config.audio.max_cache_size_mb * 1024 * 1024
         self.cache_dir.mkdir(exist_ok=True)
+        self._pinned: Set[str] = set()  # File names eviction must keep
+        self._in_use: Dict[str, int] = {}  # Holds on files queued or playing, by name
+        self._size: Optional[int] = None  # Running total, counted on first add
+        self._lock = threading.RLock()
         
     def get_cache_stats(self) -> Tuple[int, int]:
         """Return current cache size and file count."""
@@ -25,31 +35,78 @@ class CacheManager:
                 
         return total_size, file_count
 
+    def pin(self, cache_path: Path) -> None:
+        """Keep a cached file through eviction, for audio that must always play instantly."""
+        self._pinned.add(cache_path.name)
+        logger.debug(f"Pinned cached file: {cache_path.name}")
+
+    def unpin(self, cache_path: Path) -> None:
+        """Let a pinned file be evicted again."""
+        self._pinned.discard(cache_path.name)
+
+    def is_pinned(self, cache_path: Path) -> bool:
+        """Whether a cached file is pinned."""
+        return cache_path.name in self._pinned
+
+    def hold(self, audio_path: Union[str, Path]) -> None:
+        """Keep a file through eviction while it is queued or playing; clips play in place."""
+        name = Path(audio_path).name
+        with self._lock:
+            self._in_use[name] = self._in_use.get(name, 0) + 1
+
+    def release(self, audio_path: Union[str, Path]) -> None:
+        """Drop a hold taken with hold()."""
+        name = Path(audio_path).name
+        with self._lock:
+            count = self._in_use.get(name, 0) - 1
+            if count > 0:
+                self._in_use[name] = count
+            else:
+                self._in_use.pop(name, None)
+
+    def touch(self, cache_path: Path) -> None:
+        """Mark a file as just used, so eviction removes least recently used files first."""
+        try:
+            os.utime(cache_path)
+        except OSError:
+            pass
+
+    def _evictable(self, file: Path) -> bool:
+        return not self.is_pinned(file) and file.name not in self._in_use
+
     def cleanup_cache(self) -> None:
-        """Remove old files if cache exceeds maximum size."""
+        """Remove the least recently used files if cache exceeds maximum size."""
+        with self._lock:
+            self._cleanup()
+
+    def _cleanup(self) -> None:
+        """cleanup_cache with the lock held."""
         total_size, _ = self.get_cache_stats()
+        self._size = total_size
         
         if total_size <= self.max_size_bytes:
             return
 
-        # Get list of files with their timestamps
+        # Get list of evictable files with their timestamps
         files: List[Tuple[float, Path]] = []
         for file in self.cache_dir.glob("*.mp3"):
-            if file.is_file():
+            if file.is_file() and self._evictable(file):
                 files.append((file.stat().st_mtime, file))
 
         # Sort by timestamp (oldest first)
         files.sort()
 
-        # Remove files until we're under the limit
+        # Remove files until we're comfortably under the limit
+        target = self.max_size_bytes * EVICT_TO
         for mtime, file in files:
-            if total_size <= self.max_size_bytes:
+            if total_size <= target:
                 break
                 
             try:
                 size = file.stat().st_size
                 file.unlink()
                 total_size -= size
+                self._size = total_size
                 logger.debug(f"Removed cached file: {file.name}")
             except Exception as e:
                 logger.error(f"Error removing cache file {file}: {str(e)}")
@@ -60,17 +117,29 @@ class CacheManager:
         return cache_path if cache_path.is_file() else None
 
     def add_to_cache(self, file_hash: str, audio_data: bytes) -> Path:
-        """Add a new file to the cache."""
-        # Clean up if necessary
-        self.cleanup_cache()
-        
-        # Save new file
+        """
+        Add a new file to the cache. It is written to a temporary file and
+        renamed into place, so a cached file that exists is always complete.
+        """
         cache_path = self.cache_dir / f"{file_hash}.mp3"
-        cache_path.write_bytes(audio_data)
+        with tempfile.NamedTemporaryFile(dir=self.cache_dir, suffix=".tmp", delete=False) as f:
+            f.write(audio_data)
+        os.replace(f.name, cache_path)
         logger.debug(f"Added new file to cache: {cache_path.name}")
         
+        self.file_added(cache_path)
         return cache_path
 
+    def file_added(self, cache_path: Path) -> None:
+        """Count a file newly written to the cache, evicting old files if over the limit."""
+        with self._lock:
+            if self._size is None:
+                self._size, _ = self.get_cache_stats()
+            else:
+                self._size += cache_path.stat().st_size
+            if self._size > self.max_size_bytes:
+                self._cleanup()
+
     def clear_cache(self) -> None:
         """Clear all cached files."""
         try:
@@ -3,29 +3,55 @@
 import threading
 import asyncio
 import time
-from queue import Queue, Empty
-from typing import Optional, Callable
+from typing import Optional, Callable, List, Dict, Tuple
 from dataclasses import dataclass
 from TikTokLive.client import TikTokLiveClient
-from TikTokLive.types.events import CommentEvent, ConnectEvent, DisconnectEvent
-from config import Config
+from TikTokLive.types.events import (
+    CommentEvent, ConnectEvent, DisconnectEvent, GiftEvent, FollowEvent
+)
+from config import Config, config
+from comment_buffer import CommentBuffer
+from comment_log import comment_log
+from metrics import metrics_collector
+from scheduler import comment_scorer
+from tracing import Trace
 
 @dataclass
 class Comment:
     text: str
     username: str
     timestamp: float
+    priority: float = 0.0
+    event_type: str = "comment"  # "gift" or "follow" if the viewer recently did so
+    is_first_time: bool = False
+    max_age: Optional[float] = None  # Seconds before the comment is too stale to answer
+    trace: Optional[Trace] = None
+
+    def is_stale(self, now: Optional[float] = None) -> bool:
+        """Check whether the comment has outlived its max age."""
+        if self.max_age is None:
+            return False
+        return (now or time.time()) - self.timestamp > self.max_age
 
 class ChatListener:
     def __init__(self):
         self.username = Config.TIKTOK_USERNAME
-        self.comment_queue = Queue()
+        self.comment_queue = CommentBuffer(
+            max_size=config.chat.max_queue_size,
+            policy=config.chat.queue_policy,
+            on_drop=metrics_collector.record_comment_dropped,
+            prioritize=config.scheduler.enabled,
+            aging_rate=config.scheduler.aging_rate
+        )
+        # Recent gift and follow events by viewer: (event type, time)
+        self.supporters: Dict[str, Tuple[str, float]] = {}
         self.client = self._create_client()
         self.is_connected = False
         self.reconnect_delay = 5  # Initial delay in seconds
         self.max_reconnect_delay = 60
         self._setup_handlers()
-        self._start_listener()
+        if config.pipeline.mode != "asyncio":
+            self._start_listener()
 
     def _create_client(self) -> TikTokLiveClient:
         """Create and configure TikTok client."""
@@ -49,14 +75,43 @@ class ChatListener:
             self.is_connected = False
             await self._handle_disconnect()
 
+        @self.client.on("gift")
+        async def on_gift(event: GiftEvent):
+            self.supporters[event.user.nickname] = ("gift", time.time())
+
+        @self.client.on("follow")
+        async def on_follow(event: FollowEvent):
+            # A follow shouldn't mask a more recent gift
+            if self._recent_event(event.user.nickname) != "gift":
+                self.supporters[event.user.nickname] = ("follow", time.time())
+
         @self.client.on("comment")
         async def on_comment(event: CommentEvent):
             comment = Comment(
                 text=event.comment,
                 username=event.user.nickname,
-                timestamp=time.time()
+                timestamp=time.time(),
+                event_type=self._recent_event(event.user.nickname),
+                is_first_time=comment_scorer.is_first_time(event.user.nickname),
+                max_age=config.chat.comment_max_age,
+                trace=Trace(username=event.user.nickname, text=event.comment)
             )
+            comment.trace.mark("received")
+            comment.priority = comment_scorer.score(comment)
             self.comment_queue.put(comment)
+            if config.chat.record_comments:
+                comment_log.record(comment.text, comment.timestamp, comment.event_type)
+
+    def _recent_event(self, username: str) -> str:
+        """Return the viewer's gift/follow event if it's still recent."""
+        event = self.supporters.get(username)
+        if event is None:
+            return "comment"
+        event_type, event_time = event
+        if time.time() - event_time > config.scheduler.supporter_window:
+            del self.supporters[username]
+            return "comment"
+        return event_type
 
     async def _handle_disconnect(self):
         """Handle disconnection with exponential backoff."""
@@ -87,21 +142,70 @@ class ChatListener:
 
         threading.Thread(target=run_client, daemon=True).start()
 
-    def get_new_comment(self) -> Optional[Comment]:
-        """Get the next comment from the queue, if available."""
+    async def run_async(self):
+        """Run the client on the current event loop (asyncio mode)."""
         try:
-            return self.comment_queue.get_nowait()
-        except Empty:
-            return None
+            await self.client.start()
+        except Exception as e:
+            print(f"Client error: {str(e)}")
+            await self._handle_disconnect()
+
+    def get_new_comment(self, timeout: Optional[float] = 0) -> Optional[Comment]:
+        """
+        Get the next comment from the queue.
+        Waits up to `timeout` seconds (forever if None, not at all if 0).
+        Returns None on timeout or when woken by `wake`.
+        """
+        return self._mark_dequeued(self.comment_queue.get(timeout))
+
+    def get_comments(self, max_items: int, timeout: Optional[float] = None) -> List[Comment]:
+        """
+        Wait up to `timeout` seconds for a comment, then drain whatever else
+        is already queued, up to `max_items` comments in total.
+        """
+        comment = self.get_new_comment(timeout)
+        if comment is None:
+            return []
+
+        batch = [comment]
+        while len(batch) < max_items:
+            comment = self.get_new_comment()
+            if comment is None:
+                break
+            batch.append(comment)
+        return batch
+
+    async def get_new_comment_async(self, timeout: Optional[float] = None) -> Optional[Comment]:
+        """Awaitable version of get_new_comment for asyncio mode."""
+        return self._mark_dequeued(await self.comment_queue.get_async(timeout))
+
+    def _mark_dequeued(self, comment: Optional[Comment]) -> Optional[Comment]:
+        """Record on the comment's trace that it left the buffer."""
+        if comment is not None and comment.trace is not None:
+            comment.trace.mark("dequeued")
+        return comment
+
+    async def get_comments_async(self, max_items: int, timeout: Optional[float] = None) -> List[Comment]:
+        """Awaitable version of get_comments for asyncio mode."""
+        comment = await self.get_new_comment_async(timeout)
+        if comment is None:
+            return []
+
+        batch = [comment]
+        while len(batch) < max_items:
+            comment = await self.get_new_comment_async(0)
+            if comment is None:
+                break
+            batch.append(comment)
+        return batch
+
+    def wake(self):
+        """Unblock a consumer waiting in get_new_comment."""
+        self.comment_queue.wake()
 
     def clear_queue(self):
         """Clear all pending comments."""
-        while not self.comment_queue.empty():
-            try:
-                self.comment_queue.get_nowait()
-                self.comment_queue.task_done()
-            except Empty:
-                break
+        self.comment_queue.clear()
 
 # Create singleton instance
 chat_listener = ChatListener()
@@ -0,0 +1,101 @@
+# mirror_backend/coalescer.py
+
+import time
+from typing import List, Dict, Optional, Set
+from dataclasses import dataclass
+from config import config
+from chat_listener import Comment
+from metrics import metrics_collector
+from text_utils import normalize_text, content_words, words_match
+
+# Open groups checked per comment when looking for a near-duplicate
+MAX_CANDIDATES = 32
+
+@dataclass
+class CommentGroup:
+    key: str  # Normalized text of the first comment
+    words: List[str]  # Its content words
+    representative: Comment  # The comment that gets answered
+    first_seen: float
+    size: int = 1
+
+class Coalescer:
+    """
+    Groups identical and near-identical comments seen within a sliding
+    window so each group is answered once. The first comment of a group
+    goes on to the pipeline; later matches are absorbed into it.
+
+    Near-identical means the same content words in the same order, each
+    spelled the same or nearly so ("whats my futur" matches "what's my
+    future?", but "boyfriend" never matches "girlfriend"). Candidates
+    come from an index of open groups by word, so the cost per comment
+    doesn't grow with the number of open groups.
+    """
+    def __init__(self):
+        self.window = config.chat.coalesce_window
+        self.similarity = config.chat.coalesce_similarity
+        self.max_groups = config.chat.coalesce_max_groups
+        self._groups: Dict[str, CommentGroup] = {}  # Open groups by key, oldest first
+        self._by_word: Dict[str, Set[str]] = {}  # Keys of open groups by content word
+
+    def _close(self, key: str):
+        """Close a group and report its size."""
+        group = self._groups.pop(key)
+        for word in set(group.words):
+            keys = self._by_word.get(word)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_word[word]
+        metrics_collector.record_comment_group(group.size)
+
+    def _expire(self, now: float):
+        """Close groups older than the window, and the oldest ones past max_groups."""
+        while self._groups:
+            key, group = next(iter(self._groups.items()))
+            if now - group.first_seen <= self.window and len(self._groups) < self.max_groups:
+                break
+            self._close(key)
+
+    def _find_group(self, key: str, words: List[str]) -> Optional[CommentGroup]:
+        """Find an open group with the same or nearly the same text."""
+        group = self._groups.get(key)
+        if group is not None or self.similarity >= 1.0 or not words:
+            return group
+
+        checked = 0
+        for word in dict.fromkeys(words):
+            for candidate in self._by_word.get(word, ()):
+                group = self._groups[candidate]
+                if words_match(words, group.words, self.similarity):
+                    return group
+                checked += 1
+                if checked >= MAX_CANDIDATES:
+                    return None
+        return None
+
+    def add(self, comment: Comment) -> bool:
+        """Add a comment. Returns True if it starts a new group and should be answered."""
+        if self.window <= 0:
+            return True
+
+        now = time.time()
+        self._expire(now)
+        key = normalize_text(comment.text)
+        words = content_words(key)
+        group = self._find_group(key, words)
+        if group is not None:
+            group.size += 1
+            return False
+
+        self._groups[key] = CommentGroup(key=key, words=words, representative=comment, first_seen=now)
+        for word in set(words):
+            self._by_word.setdefault(word, set()).add(key)
+        return True
+
+    def filter(self, comments: List[Comment]) -> List[Comment]:
+        """Return only the comments that should be answered."""
+        return [comment for comment in comments if self.add(comment)]
+
+# Create singleton instance
+coalescer = Coalescer()
@@ -0,0 +1,218 @@
+# mirror_backend/comment_buffer.py
+
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import threading
+from typing import Optional, List, Dict, Tuple, Callable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from chat_listener import Comment
+
+# Overflow policies
+DROP_OLDEST = "drop_oldest"
+DROP_LOWEST_PRIORITY = "drop_lowest_priority"
+RESERVOIR = "reservoir"
+POLICIES = (DROP_OLDEST, DROP_LOWEST_PRIORITY, RESERVOIR)
+
+class CommentBuffer:
+    """
+    Bounded, thread-safe comment buffer with load shedding.
+    When full, a new comment is admitted or rejected according to `policy`.
+    Comments older than their max age are discarded instead of being served.
+    Supports blocking gets from threads and awaitable gets on an event loop.
+
+    With `prioritize` set, comments are served highest effective priority
+    first instead of FIFO. Effective priority is the comment's priority plus
+    `aging_rate` points per second waited, so low scores can't starve.
+    """
+    def __init__(self, max_size: int, policy: str = DROP_OLDEST,
+                 on_drop: Optional[Callable[[str], None]] = None,
+                 prioritize: bool = False, aging_rate: float = 0.0):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+        self.max_size = max(1, max_size)
+        self.policy = policy
+        self.on_drop = on_drop
+        self.prioritize = prioritize
+        self.aging_rate = aging_rate
+        self.drop_counts: Dict[str, int] = {"overflow": 0, "stale": 0}
+        # Heap of (sort key, arrival seq, comment)
+        self._items: List[Tuple[float, int, "Comment"]] = []
+        self._arrivals = itertools.count()
+        self._cond = threading.Condition()
+        self._woken = False
+        # Arrivals since the buffer last filled up, for reservoir sampling
+        self._offered = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_ready: Optional[asyncio.Event] = None
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._items)
+
+    def _record_drop(self, reason: str):
+        """Count a dropped comment and report it."""
+        self.drop_counts[reason] += 1
+        if self.on_drop:
+            try:
+                self.on_drop(reason)
+            except Exception as e:
+                print(f"Error reporting dropped comment: {str(e)}")
+
+    def _sort_key(self, comment: "Comment") -> float:
+        """
+        Heap key for a comment; smaller is served first. Aging adds the same
+        amount to every waiting comment per second, so ranking by
+        priority - aging_rate * timestamp never needs re-sorting.
+        """
+        if not self.prioritize:
+            return 0.0
+        return -(comment.priority - self.aging_rate * comment.timestamp)
+
+    def _effective_priority(self, comment: "Comment", now: float) -> float:
+        """Priority including the aging bonus for time spent waiting."""
+        return comment.priority + self.aging_rate * (now - comment.timestamp)
+
+    def _remove_at(self, index: int):
+        """Remove an arbitrary heap entry."""
+        self._items[index] = self._items[-1]
+        self._items.pop()
+        heapq.heapify(self._items)
+
+    def _purge_stale(self, now: float):
+        """Remove comments that have outlived their max age."""
+        fresh = [entry for entry in self._items if not entry[2].is_stale(now)]
+        for _ in range(len(self._items) - len(fresh)):
+            self._record_drop("stale")
+        self._items = fresh
+        heapq.heapify(self._items)
+
+    def _admit(self, comment: "Comment") -> bool:
+        """
+        Make room for a new comment according to the policy.
+        Returns False if the new comment itself should be shed.
+        """
+        if len(self._items) < self.max_size:
+            self._offered = 0
+            return True
+
+        if self.policy == DROP_OLDEST:
+            victim = min(range(len(self._items)), key=lambda i: self._items[i][1])
+        elif self.policy == DROP_LOWEST_PRIORITY:
+            # Ties go to the oldest of equally low comments
+            now = time.time()
+            victim = min(
+                range(len(self._items)),
+                key=lambda i: (self._effective_priority(self._items[i][2], now), self._items[i][1])
+            )
+            if comment.priority <= self._effective_priority(self._items[victim][2], now):
+                return False
+        else:
+            # Reservoir sampling: keep a uniform sample of everything
+            # offered since the buffer filled up
+            self._offered += 1
+            victim = random.randrange(self.max_size + self._offered)
+            if victim >= self.max_size:
+                return False
+
+        self._remove_at(victim)
+        self._record_drop("overflow")
+        return True
+
+    def put(self, comment: "Comment") -> bool:
+        """Add a comment. Returns False if it was shed instead."""
+        with self._cond:
+            if len(self._items) >= self.max_size:
+                self._purge_stale(time.time())
+            admitted = self._admit(comment)
+            if admitted:
+                heapq.heappush(
+                    self._items, (self._sort_key(comment), next(self._arrivals), comment)
+                )
+                self._cond.notify()
+            else:
+                self._record_drop("overflow")
+        if admitted:
+            self._notify_async()
+        return admitted
+
+    def _notify_async(self):
+        """Wake an awaiting consumer on the event loop, if there is one."""
+        if self._loop is not None and self._async_ready is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._async_ready.set)
+            except RuntimeError:
+                pass  # Loop already closed
+
+    def _pop(self) -> Optional["Comment"]:
+        """Remove and return the next fresh comment, if any."""
+        now = time.time()
+        while self._items:
+            _, _, comment = heapq.heappop(self._items)
+            if not comment.is_stale(now):
+                return comment
+            self._record_drop("stale")
+        return None
+
+    def get(self, timeout: Optional[float] = 0) -> Optional["Comment"]:
+        """
+        Get the next fresh comment.
+        Waits up to `timeout` seconds (forever if None, not at all if 0).
+        Returns None on timeout or when woken by `wake`.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                if self._woken:
+                    self._woken = False
+                    return None
+                comment = self._pop()
+                if comment is not None:
+                    return comment
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    async def get_async(self, timeout: Optional[float] = None) -> Optional["Comment"]:
+        """Awaitable version of get for use on an event loop."""
+        if self._async_ready is None:
+            self._loop = asyncio.get_running_loop()
+            self._async_ready = asyncio.Event()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if self._woken:
+                    self._woken = False
+                    return None
+                comment = self._pop()
+                if comment is not None:
+                    return comment
+                self._async_ready.clear()
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(self._async_ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                return None
+
+    def wake(self):
+        """Make one waiting (or the next) get return None."""
+        with self._cond:
+            self._woken = True
+            self._cond.notify()
+        self._notify_async()
+
+    def clear(self) -> int:
+        """Drop all pending comments. Returns how many were removed."""
+        with self._cond:
+            count = len(self._items)
+            self._items.clear()
+            self._offered = 0
+            return count
@@ -0,0 +1,83 @@
+# mirror_backend/comment_log.py
+
+import json
+import time
+import threading
+from pathlib import Path
+from queue import Queue, Full, Empty
+from typing import Optional, TextIO
+from config import config
+
+# Seconds a written line may sit in the buffer before it is flushed
+FLUSH_INTERVAL = 5.0
+
+class CommentLog:
+    """
+    Daily JSONL logs of comment text, the answer bank's source data.
+    Only the text, time and event type are kept, never who wrote it.
+    Lines are written by a background thread through one buffered file
+    per day, so recording never blocks the TikTok event handler.
+    """
+    def __init__(self, directory: Path, max_pending: int = 10000):
+        self.directory = directory
+        self._pending: Queue = Queue(maxsize=max_pending)  # None stops the writer
+        self._file: Optional[TextIO] = None
+        self._day: Optional[str] = None
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def record(self, text: str, timestamp: float, event_type: str):
+        """Queue a comment for the log. Comments are dropped while the writer is backed up."""
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True)
+                    self._thread.start()
+        try:
+            self._pending.put_nowait({"text": text, "timestamp": timestamp, "event_type": event_type})
+        except Full:
+            pass
+
+    def _open(self, day: str) -> TextIO:
+        """The log file for `day`, closing the previous day's."""
+        if self._day != day:
+            self._close_file()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.directory / f"comments_{day}.jsonl", "a", encoding="utf-8")
+            self._day = day
+        return self._file
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._day = None
+
+    def _run(self):
+        """Write queued comments until stopped, flushing when the queue goes quiet."""
+        while True:
+            try:
+                entry = self._pending.get(timeout=FLUSH_INTERVAL)
+            except Empty:
+                if self._file is not None:
+                    self._file.flush()
+                continue
+            if entry is None:
+                break
+            try:
+                day = time.strftime("%Y%m%d", time.localtime(entry["timestamp"]))
+                self._open(day).write(json.dumps(entry) + "\n")
+            except OSError as e:
+                print(f"Error recording comment: {str(e)}")
+                self._close_file()
+        self._close_file()
+
+    def close(self):
+        """Write out everything queued and close the log."""
+        if self._thread is not None:
+            self._pending.put(None)
+            self._thread.join()
+            self._thread = None
+
+# Create singleton instance
+comment_log = CommentLog(config.chat.comment_log_dir)
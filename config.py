@@ -1,6 +1,6 @@
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Dict
 from pydantic import BaseModel, Field, validator
 from dotenv import load_dotenv
 
@@ -25,12 +25,30 @@ class AudioConfig(BaseModel):
         v.mkdir(exist_ok=True)
         return v
 
+class TTSConfig(BaseModel):
+    """ElevenLabs connection settings."""
+    pool_size: int = Field(default=4)  # Max open HTTPS connections to the API
+    keepalive_expiry: float = Field(default=60.0)  # Seconds an idle async connection stays open
+    connect_timeout: float = Field(default=5.0)
+    read_timeout: float = Field(default=30.0)  # Longest wait for the next response bytes
+    preconnect: bool = Field(default=True)  # Open a connection at startup so the first reply skips the handshake
+    sentence_cache: bool = Field(default=True)  # Cache audio per sentence and join replies from it
+
 class ChatConfig(BaseModel):
     """Chat configuration settings."""
     max_retry_attempts: int = Field(default=3)
     retry_delay_seconds: int = Field(default=5)
     max_retry_delay_seconds: int = Field(default=60)
     connection_timeout: int = Field(default=30)
+    max_batch_size: int = Field(default=16)
+    max_queue_size: int = Field(default=200)
+    queue_policy: str = Field(default="drop_oldest")  # or "drop_lowest_priority", "reservoir"
+    comment_max_age: Optional[float] = Field(default=60.0)  # None disables the TTL
+    coalesce_window: float = Field(default=10.0)  # Seconds duplicates are grouped; 0 disables
+    coalesce_similarity: float = Field(default=0.9)  # Spelling similarity per word; 1.0 groups exact matches only
+    coalesce_max_groups: int = Field(default=256)  # Open groups kept; the oldest close first
+    record_comments: bool = Field(default=True)  # Append comments to daily JSONL logs
+    comment_log_dir: Path = Field(default=Path("comment_log"))
 
 class GPTConfig(BaseModel):
     """GPT configuration settings."""
@@ -42,13 +60,127 @@ class GPTConfig(BaseModel):
                "in a calm, mystical tone. Your responses should be concise, "
                "engaging, and maintain an air of mystery while being helpful."
     )
+    pool_size: int = Field(default=10)  # Max open HTTPS connections to the API
+    keepalive_expiry: float = Field(default=60.0)  # Seconds an idle connection stays open
+    connect_timeout: float = Field(default=5.0)
+    request_timeout: float = Field(default=30.0)  # Per-request read/write timeout
+    hedge_enabled: bool = Field(default=True)  # Race a faster model when the primary is slow
+    hedge_model: str = Field(default="gpt-3.5-turbo")
+    hedge_percentile: float = Field(default=90.0)  # Hedge once the primary exceeds this latency percentile
+    hedge_min_samples: int = Field(default=20)  # Primary latencies needed before the percentile is used
+    hedge_initial_delay: float = Field(default=4.0)  # Hedge delay until then
+    hedge_min_delay: float = Field(default=0.5)
+    cache_enabled: bool = Field(default=True)
+    cache_ttl_seconds: int = Field(default=3600)  # Replies older than this are asked again
+    cache_max_bytes: int = Field(default=5 * 1024 * 1024)  # Memory bound for cached replies
+    cache_file: Optional[Path] = Field(default=Path("gpt_cache/responses.json"))  # None keeps it in memory
+    semantic_cache_enabled: bool = Field(default=True)  # Answer paraphrases from earlier replies
+    semantic_cache_dir: Path = Field(default=Path("gpt_cache/semantic"))
+    semantic_cache_size: int = Field(default=5000)  # Max entries; least recently used are evicted
+    semantic_dim: int = Field(default=512)  # Embedding width; changing it rebuilds the index
+    semantic_threshold: float = Field(default=0.8)  # Cosine similarity for a candidate; content words must match too
+    semantic_word_similarity: float = Field(default=0.9)  # Spelling similarity per content word for a hit
+    backend: str = Field(default="openai")  # "openai", "local_http" or "llama_cpp"
+    fallback_backend: Optional[str] = Field(default=None)  # Answers when the main backend fails
+    local_base_url: str = Field(default="http://localhost:8080/v1")  # OpenAI-compatible server
+    local_model: str = Field(default="local")  # Model name sent to the local server
+    local_model_path: Optional[Path] = Field(default=None)  # GGUF file for llama_cpp
+    local_threads: int = Field(default=4)
+    local_context: int = Field(default=2048)
+    local_seed: int = Field(default=42)  # Fixed so llama_cpp replies are reproducible
+    local_temperature: float = Field(default=0.0)  # llama_cpp sampling temperature, used instead of temperature
+    routing_enabled: bool = Field(default=True)  # Send simple comments to fast_model
+    fast_model: str = Field(default="gpt-3.5-turbo")
+    complexity_threshold: float = Field(default=0.45)  # Complexity (0-1) that earns the primary model
+    routing_long_comment: int = Field(default=25)  # Words at which length alone counts fully
+    routing_backlog_seconds: float = Field(default=15.0)  # Generated, unspoken audio at which everything takes fast_model
+    token_costs: Dict[str, float] = Field(
+        default_factory=lambda: {"gpt-4": 0.045, "gpt-3.5-turbo": 0.0015}
+    )  # Blended USD per 1K tokens, for cost metrics
+
+class SchedulerConfig(BaseModel):
+    """Comment priority scheduling settings."""
+    enabled: bool = Field(default=True)  # False serves comments FIFO
+    gift_weight: float = Field(default=10.0)
+    follow_weight: float = Field(default=5.0)
+    first_time_weight: float = Field(default=3.0)
+    question_weight: float = Field(default=4.0)
+    aging_rate: float = Field(default=0.2)  # Priority points gained per second waiting
+    supporter_window: int = Field(default=300)  # Seconds a gift/follow boosts comments
+
+class PipelineConfig(BaseModel):
+    """Pipeline stage concurrency settings."""
+    mode: str = Field(default="threaded")  # "threaded" or "asyncio"
+    gpt_workers: int = Field(default=2)
+    tts_workers: int = Field(default=2)
+    gpt_queue_size: int = Field(default=8)
+    tts_queue_size: int = Field(default=8)
+    gpt_batch_size: int = Field(default=1)  # Comments per GPT request; 1 disables batching
+    gpt_batch_window: float = Field(default=0.25)  # Seconds to wait for a batch to fill
+    streaming: bool = Field(default=False)  # Stream replies sentence by sentence; overrides batching
+    stream_audio: bool = Field(default=True)  # Play TTS audio while it downloads (mpg123 only)
+
+class ReplyBudgetConfig(BaseModel):
+    """Reply length adapted to the playback backlog."""
+    enabled: bool = Field(default=True)
+    latency_slo: float = Field(default=20.0)  # Pending audio, in seconds, at which replies are shortest
+    min_words: int = Field(default=12)  # Reply length under full load
+    max_words: int = Field(default=70)  # Reply length when chat is quiet; capped by gpt.max_tokens
+    speech_rate: float = Field(default=2.5)  # Spoken words per second
+    mp3_bytes_per_second: int = Field(default=16000)  # 128 kbps ElevenLabs MP3
+
+class RateLimitConfig(BaseModel):
+    """Client-side OpenAI quota settings."""
+    enabled: bool = Field(default=True)
+    requests_per_minute: int = Field(default=500)
+    tokens_per_minute: int = Field(default=10000)
+    burst_seconds: float = Field(default=10.0)  # Quota that may be spent at once, in seconds of refill
+    max_wait: float = Field(default=5.0)  # Longest a request waits for quota before it is shed
+    shed_headroom: float = Field(default=0.2)  # Below this quota fraction, low-priority comments are shed
+    shed_min_priority: float = Field(default=3.0)  # Comments scoring at least this are still answered
+
+class ResilienceConfig(BaseModel):
+    """Retry, time budget and circuit breaker settings for GPT and TTS."""
+    comment_budget: float = Field(default=20.0)  # Total seconds per comment across GPT and TTS
+    attempt_timeout: float = Field(default=10.0)  # Per-request timeout, capped by the budget left
+    max_attempts: int = Field(default=3)
+    base_delay: float = Field(default=0.5)  # First retry delay; doubles per attempt with jitter
+    max_delay: float = Field(default=4.0)
+    failure_threshold: int = Field(default=5)  # Consecutive failures that open a circuit
+    reset_timeout: float = Field(default=30.0)  # Seconds before an open circuit lets a probe through
+    success_threshold: int = Field(default=2)  # Successful probes needed to close it again
+    fallback_reply: str = Field(default="The mirror's vision is clouded. Try again in a moment.")
+
+class RouterConfig(BaseModel):
+    """Local routing of trivial comments to canned replies."""
+    enabled: bool = Field(default=True)
+    max_words: int = Field(default=4)  # Longer comments always go to GPT
+    route_single_words: bool = Field(default=True)  # One-word non-questions get a canned reply
+    cooldown: float = Field(default=15.0)  # Seconds between canned replies of one intent
+
+class AnswerBankConfig(BaseModel):
+    """Pre-generated answers for frequent comment intents."""
+    enabled: bool = Field(default=True)
+    directory: Path = Field(default=Path("answer_bank"))
+    match_threshold: float = Field(default=0.9)  # Similarity to an intent's examples needed to serve it
+    answers_per_intent: int = Field(default=4)
+    min_count: int = Field(default=5)  # Comments an intent needs to be banked
+    max_intents: int = Field(default=300)
 
 class Config(BaseModel):
     """Main configuration class."""
     api: APIConfig = Field(default_factory=APIConfig)
     audio: AudioConfig = Field(default_factory=AudioConfig)
+    tts: TTSConfig = Field(default_factory=TTSConfig)
     chat: ChatConfig = Field(default_factory=ChatConfig)
     gpt: GPTConfig = Field(default_factory=GPTConfig)
+    scheduler: SchedulerConfig = Field(default_factory=SchedulerConfig)
+    pipeline: PipelineConfig = Field(default_factory=PipelineConfig)
+    reply_budget: ReplyBudgetConfig = Field(default_factory=ReplyBudgetConfig)
+    rate_limit: RateLimitConfig = Field(default_factory=RateLimitConfig)
+    resilience: ResilienceConfig = Field(default_factory=ResilienceConfig)
+    answer_bank: AnswerBankConfig = Field(default_factory=AnswerBankConfig)
+    router: RouterConfig = Field(default_factory=RouterConfig)
     debug_mode: bool = Field(default=False)
     log_level: str = Field(default="INFO")
 
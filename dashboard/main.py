@@ -9,6 +9,7 @@ import asyncio
 from pathlib import Path
 from typing import List, Dict
 from metrics import metrics_collector
+from rate_limiter import rate_limiter
 from config import config
 from .auth import (
     Token, User, authenticate_user, create_access_token,
@@ -100,6 +101,33 @@ async def get_metrics_history(current_user: User = Depends(get_current_active_us
         
     return {"metrics": metrics_data}
 
+@app.get("/api/metrics/latency")
+async def get_latency_summary(current_user: User = Depends(get_current_active_user)):
+    """Get per-stage latency percentiles from comment traces."""
+    return metrics_collector.get_latency_summary()
+
+@app.get("/api/traces")
+async def get_traces(limit: int = 20, current_user: User = Depends(get_current_active_user)):
+    """Get the most recent per-comment latency traces."""
+    return {"traces": metrics_collector.get_recent_traces(limit)}
+
+@app.get("/api/traces/{trace_id}")
+async def get_trace(trace_id: int, current_user: User = Depends(get_current_active_user)):
+    """Get the latency trace of a single comment."""
+    trace = metrics_collector.get_trace(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return trace
+
+@app.get("/api/rate_limit")
+async def get_rate_limit(current_user: User = Depends(get_current_active_user)):
+    """Get the GPT quota headroom left in the client-side rate limiter."""
+    return {
+        "headroom": rate_limiter.headroom(),
+        "requests_per_minute": config.rate_limit.requests_per_minute,
+        "tokens_per_minute": config.rate_limit.tokens_per_minute
+    }
+
 @app.get("/api/config")
 async def get_config(current_user: User = Depends(get_current_active_user)):
     """Get current configuration (excluding sensitive data)."""
@@ -143,7 +171,9 @@ async def websocket_endpoint(websocket: WebSocket):
             await websocket.send_json({
                 "type": "update",
                 "status": status_data,
-                "metrics": metrics_data
+                "metrics": metrics_data,
+                "traces": metrics_collector.get_recent_traces(),
+                "rate_limit": rate_limiter.headroom()
             })
             await asyncio.sleep(1)
     except WebSocketDisconnect:
@@ -160,7 +190,9 @@ async def start_metrics_broadcast():
                 await manager.broadcast({
                     "type": "update",
                     "status": status_data,
-                    "metrics": metrics_data
+                    "metrics": metrics_data,
+                    "traces": metrics_collector.get_recent_traces(),
+                    "rate_limit": rate_limiter.headroom()
                 })
             except Exception as e:
                 print(f"Error broadcasting metrics: {e}")
@@ -1,31 +1,302 @@
 # mirror_backend/gpt_handler.py
 
+import json
+import hashlib
 import openai
 import time
-from typing import Optional, Dict, Any
-from tenacity import retry, stop_after_attempt, wait_exponential
-from config import Config
+from typing import Optional, List, Iterator, AsyncIterator
+from config import config
+from hedging import Hedger, LatencyTracker, timed, timed_async
+from llm_backends import LLMBackend, Completion, make_backend
+from metrics import metrics_collector
+from model_router import model_router, ModelChoice
+from rate_limiter import rate_limiter, estimate_tokens, RateLimitShed, CHARS_PER_TOKEN
+from reply_budget import reply_budget, Backlog, ReplyLength
+from resilience import Deadline, CircuitOpenError, make_policy
+from response_cache import ResponseCache
+from semantic_cache import SemanticCache
+from text_utils import SentenceChunker, split_sentences
+from tracing import Trace
+
+# Fixed replies for API errors; pre-synthesized at startup so they play instantly
+DEPLETED_REPLY = "The mirror's energy is temporarily depleted. Please wait a moment..."
+DISCONNECTED_REPLY = "The mirror's connection to the ethereal plane is disrupted. Please check the configuration."
 
 class GPTHandler:
     def __init__(self):
-        openai.api_key = Config.OPENAI_API_KEY
-        self.system_prompt = (
-            "You are Mirror.exe, a smooth, divine AI oracle who speaks "
-            "in a calm, mystical tone. Your responses should be concise, "
-            "engaging, and maintain an air of mystery while being helpful."
+        self.model = config.gpt.model
+        self.max_tokens = config.gpt.max_tokens
+        self.router = model_router
+        self.reply_budget = reply_budget
+        self.hedge_model = config.gpt.hedge_model
+        self.primary_latency = LatencyTracker()
+        self.hedger = Hedger()
+        self.temperature = config.gpt.temperature
+        self.system_prompt = config.gpt.system_prompt
+        self.batch_instruction = (
+            "You will receive several numbered viewer comments. Answer each one "
+            "separately, in order. Respond with only a JSON array of strings, "
+            "one reply per comment, and nothing else."
+        )
+        self.variant_instruction = (
+            "Give {count} different replies to the viewer comment, each one able "
+            "to stand on its own. Respond with only a JSON array of strings, "
+            "and nothing else."
+        )
+        self.response_cache = ResponseCache(
+            max_bytes=config.gpt.cache_max_bytes,
+            ttl_seconds=config.gpt.cache_ttl_seconds,
+            path=config.gpt.cache_file
+        ) if config.gpt.cache_enabled else None
+        self.semantic_cache = SemanticCache(
+            directory=config.gpt.semantic_cache_dir,
+            capacity=config.gpt.semantic_cache_size,
+            dim=config.gpt.semantic_dim,
+            threshold=config.gpt.semantic_threshold,
+            word_similarity=config.gpt.semantic_word_similarity,
+            ttl_seconds=config.gpt.cache_ttl_seconds
+        ) if config.gpt.semantic_cache_enabled else None
+        # Local shedding and request errors aren't the service failing
+        give_up_on = (RateLimitShed, openai.AuthenticationError, openai.BadRequestError)
+        self.retry_policy = make_policy("GPT", give_up_on=give_up_on)
+        self.backend = make_backend(config.gpt.backend)
+        self.fallback_backend = self._make_fallback_backend()
+        # The fallback backend gets its own circuit so its failures don't trip the main one
+        self.fallback_policy = make_policy("GPT fallback", give_up_on=give_up_on)
+
+    def _make_fallback_backend(self) -> Optional[LLMBackend]:
+        """The backend that answers when the main one fails, if one is configured."""
+        name = config.gpt.fallback_backend
+        if not name or name == config.gpt.backend:
+            return None
+        try:
+            return make_backend(name)
+        except Exception as e:
+            # A broken fallback shouldn't take the main backend down with it
+            print(f"Fallback LLM backend '{name}' unavailable: {str(e)}")
+            return None
+
+    def _create(self, messages: list, max_tokens: int, timeout: float,
+                stream: bool = False, model: Optional[str] = None,
+                backend: Optional[LLMBackend] = None):
+        """
+        Send one completion request to a backend (the main one by
+        default), rate limited if it counts against the OpenAI quota.
+        Returns a Completion, or an iterator of text deltas when streaming.
+        """
+        model = model or self.model
+        backend = backend or self.backend
+        estimate = estimate_tokens(messages, max_tokens)
+        if backend.uses_quota:
+            rate_limiter.acquire(estimate)
+        start = time.monotonic()
+        try:
+            if stream:
+                return backend.stream(messages, model, max_tokens, self.temperature, timeout)
+            completion = backend.complete(messages, model, max_tokens, self.temperature, timeout)
+        except Exception as e:
+            if isinstance(e, openai.RateLimitError):
+                rate_limiter.record_rate_limited()
+            self._record_call(backend, model, time.monotonic() - start, 0, 0, failed=True)
+            raise
+        self._record_completion(backend, model, start, messages, estimate, completion)
+        completion.model = model
+        return completion
+
+    async def _create_async(self, messages: list, max_tokens: int, timeout: float,
+                            stream: bool = False, model: Optional[str] = None,
+                            backend: Optional[LLMBackend] = None):
+        """Async version of _create."""
+        model = model or self.model
+        backend = backend or self.backend
+        estimate = estimate_tokens(messages, max_tokens)
+        if backend.uses_quota:
+            await rate_limiter.acquire_async(estimate)
+        start = time.monotonic()
+        try:
+            if stream:
+                return await backend.stream_async(messages, model, max_tokens, self.temperature, timeout)
+            completion = await backend.complete_async(
+                messages, model, max_tokens, self.temperature, timeout
+            )
+        except Exception as e:
+            if isinstance(e, openai.RateLimitError):
+                rate_limiter.record_rate_limited()
+            self._record_call(backend, model, time.monotonic() - start, 0, 0, failed=True)
+            raise
+        self._record_completion(backend, model, start, messages, estimate, completion)
+        completion.model = model
+        return completion
+
+    def _record_completion(self, backend: LLMBackend, model: str, start: float,
+                           messages: list, estimate: int, completion: Completion):
+        """Record a finished completion, estimating usage the backend didn't report."""
+        if completion.prompt_tokens is None:
+            prompt_tokens = estimate_tokens(messages, 0)
+            completion_tokens = len(completion.text) // CHARS_PER_TOKEN
+        else:
+            prompt_tokens, completion_tokens = completion.prompt_tokens, completion.completion_tokens
+            if backend.uses_quota:
+                rate_limiter.record_usage(estimate, prompt_tokens + completion_tokens)
+        self._record_call(backend, model, time.monotonic() - start, prompt_tokens, completion_tokens)
+
+    def _record_call(self, backend: LLMBackend, model: str, latency: float, prompt_tokens: int,
+                     completion_tokens: int, failed: bool = False):
+        """
+        Record one call's latency, usage and cost against its model tier.
+        Single-model backends are recorded under their own name.
+        """
+        tier = self.router.tier_of(model) if backend.multi_model else backend.name
+        model = backend.model_name(model)
+        metrics_collector.record_model_call(
+            tier, model, latency, prompt_tokens, completion_tokens,
+            self.router.cost(model, prompt_tokens + completion_tokens), failed
+        )
+
+    def _backup_reply(self, messages: list, max_tokens: int,
+                      deadline: Optional[Deadline], error: Exception) -> str:
+        """
+        Answer from the fallback backend after the main one failed, or
+        return the in-character fallback reply if that isn't possible.
+        The call goes through the rate limiter and its own retry policy
+        like any other. Backup replies aren't cached since another model
+        wrote them.
+        """
+        backend = self.fallback_backend
+        if backend is None or (deadline is not None and deadline.expired):
+            return self._fallback_reply(error)
+        try:
+            completion = self.fallback_policy.call(
+                lambda timeout: self._create(messages, max_tokens, timeout, backend=backend), deadline
+            )
+        except Exception as e:
+            if not isinstance(e, (CircuitOpenError, RateLimitShed)):
+                print(f"Fallback LLM Error: {str(e)}")
+            return self._fallback_reply(error)
+        if isinstance(error, RateLimitShed):
+            metrics_collector.record_rate_limit_shed('gpt')
+        return self._sanitize_response(completion.text)
+
+    async def _backup_reply_async(self, messages: list, max_tokens: int,
+                                  deadline: Optional[Deadline], error: Exception) -> str:
+        """Async version of _backup_reply."""
+        backend = self.fallback_backend
+        if backend is None or (deadline is not None and deadline.expired):
+            return self._fallback_reply(error)
+        try:
+            completion = await self.fallback_policy.call_async(
+                lambda timeout: self._create_async(messages, max_tokens, timeout, backend=backend),
+                deadline
+            )
+        except Exception as e:
+            if not isinstance(e, (CircuitOpenError, RateLimitShed)):
+                print(f"Fallback LLM Error: {str(e)}")
+            return self._fallback_reply(error)
+        if isinstance(error, RateLimitShed):
+            metrics_collector.record_rate_limit_shed('gpt')
+        return self._sanitize_response(completion.text)
+
+    def _route(self, prompts: List[str], backlog: Optional[Backlog],
+               choice: Optional[ModelChoice] = None) -> ModelChoice:
+        """Pick the model tier for a request, unless already picked, and record the choice."""
+        choice = choice or self.router.choose(prompts, backlog)
+        metrics_collector.record_model_route(
+            choice.tier, choice.model, choice.complexity, choice.forced
+        )
+        return choice
+
+    def _hedge_delay(self, timeout: float) -> Optional[float]:
+        """
+        How long to wait on the primary model before hedging: the configured
+        percentile of its recent latency. None if hedging doesn't apply.
+        """
+        settings = config.gpt
+        if not settings.hedge_enabled or not self.hedge_model or self.hedge_model == self.model:
+            return None
+        if not self.backend.multi_model:
+            return None
+        if len(self.primary_latency) < settings.hedge_min_samples:
+            delay = settings.hedge_initial_delay
+        else:
+            delay = max(settings.hedge_min_delay,
+                        self.primary_latency.percentile(settings.hedge_percentile))
+        # A hedge sent after the attempt has timed out is no use
+        return delay if delay < timeout else None
+
+    def _hedged_create(self, messages: list, max_tokens: int, timeout: float,
+                       model: Optional[str] = None):
+        """Send a request, hedging to the fallback model if the primary is slow."""
+        if model is not None and model != self.model:
+            # Already routed to a cheaper tier; there's nothing faster to hedge to
+            return self._create(messages, max_tokens, timeout, model=model)
+        primary = timed(lambda: self._create(messages, max_tokens, timeout), self.primary_latency)
+        delay = self._hedge_delay(timeout)
+        if delay is None:
+            return primary()
+        response, winner, hedged = self.hedger.run(
+            primary,
+            lambda: self._create(messages, max_tokens, timeout - delay, model=self.hedge_model),
+            delay
+        )
+        metrics_collector.record_hedge(hedged, winner, delay)
+        return response
+
+    async def _hedged_create_async(self, messages: list, max_tokens: int, timeout: float,
+                                   model: Optional[str] = None):
+        """Async version of _hedged_create; the losing request is cancelled."""
+        if model is not None and model != self.model:
+            return await self._create_async(messages, max_tokens, timeout, model=model)
+        primary = timed_async(
+            lambda: self._create_async(messages, max_tokens, timeout), self.primary_latency
+        )
+        delay = self._hedge_delay(timeout)
+        if delay is None:
+            return await primary()
+        response, winner, hedged = await self.hedger.run_async(
+            primary,
+            lambda: self._create_async(messages, max_tokens, timeout - delay, model=self.hedge_model),
+            delay
+        )
+        metrics_collector.record_hedge(hedged, winner, delay)
+        return response
+
+    def _make_api_call(self, messages: list, max_tokens: Optional[int] = None,
+                       deadline: Optional[Deadline] = None, hedge: bool = True,
+                       model: Optional[str] = None) -> Completion:
+        """Make API call with deadline-aware retries behind the circuit breaker."""
+        create = self._hedged_create if hedge else self._create
+        max_tokens = max_tokens or self.max_tokens
+        return self.retry_policy.call(
+            lambda timeout: create(messages, max_tokens, timeout, model=model), deadline
         )
-        
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=4, max=10)
-    )
-    def _make_api_call(self, messages: list) -> Dict[str, Any]:
-        """Make API call with retry logic."""
-        return openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=messages,
-            temperature=0.7,
-            max_tokens=200
+
+    async def _make_api_call_async(self, messages: list, max_tokens: Optional[int] = None,
+                                   deadline: Optional[Deadline] = None, hedge: bool = True,
+                                   model: Optional[str] = None) -> Completion:
+        """Make a non-blocking API call with deadline-aware retries behind the circuit breaker."""
+        create = self._hedged_create_async if hedge else self._create_async
+        max_tokens = max_tokens or self.max_tokens
+        return await self.retry_policy.call_async(
+            lambda timeout: create(messages, max_tokens, timeout, model=model), deadline
+        )
+
+    def _make_stream_call(self, messages: list, max_tokens: Optional[int] = None,
+                          deadline: Optional[Deadline] = None, model: Optional[str] = None):
+        """Open a streaming API call with deadline-aware retries behind the circuit breaker."""
+        max_tokens = max_tokens or self.max_tokens
+        return self.retry_policy.call(
+            lambda timeout: self._create(messages, max_tokens, timeout, stream=True, model=model),
+            deadline
+        )
+
+    async def _make_stream_call_async(self, messages: list, max_tokens: Optional[int] = None,
+                                      deadline: Optional[Deadline] = None,
+                                      model: Optional[str] = None):
+        """Open a non-blocking streaming API call with deadline-aware retries behind the circuit breaker."""
+        max_tokens = max_tokens or self.max_tokens
+        return await self.retry_policy.call_async(
+            lambda timeout: self._create_async(messages, max_tokens, timeout, stream=True, model=model),
+            deadline
         )
 
     def _sanitize_response(self, text: str) -> str:
@@ -37,32 +308,434 @@ class GPTHandler:
             text += "."
         return text
 
-    def ask_gpt(self, prompt: str) -> str:
+    def _build_messages(self, prompt: str, length: Optional[ReplyLength] = None) -> list:
+        """Build the chat messages for a prompt, with an optional length limit."""
+        system = self.system_prompt
+        if length is not None and length.instruction:
+            system = f"{system} {length.instruction}"
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt}
+        ]
+
+    def _build_batch_messages(self, prompts: List[str], length: Optional[ReplyLength] = None) -> list:
+        """Build one request that asks for a reply to each prompt."""
+        numbered = "\n".join(f"{i + 1}. {prompt}" for i, prompt in enumerate(prompts))
+        system = f"{self.system_prompt} {self.batch_instruction}"
+        if length is not None and length.instruction:
+            system = f"{system} {length.instruction}"
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": numbered}
+        ]
+
+    def _parse_batch_reply(self, text: str, count: int) -> List[Optional[str]]:
         """
-        Process a prompt and return a response.
-        Includes error handling and response processing.
+        Split a batched response back into one reply per prompt.
+        Returns all None if the response doesn't hold exactly `count` replies.
         """
+        text = text.strip()
+        if text.startswith("```"):
+            # Drop a markdown code fence around the JSON
+            text = text.strip("`")
+            text = text[text.find("["):]
+        try:
+            replies = json.loads(text)
+        except ValueError:
+            return [None] * count
+
+        if not isinstance(replies, list) or len(replies) != count:
+            return [None] * count
+        return [
+            self._sanitize_response(reply) if isinstance(reply, str) and reply.strip() else None
+            for reply in replies
+        ]
+
+    def _record_stream(self, model: str, start: float, messages: list,
+                       sentences: List[str], failed: bool = False):
+        """Record a finished stream; streams don't report usage, so tokens are estimated."""
+        completion_tokens = sum(len(sentence) for sentence in sentences) // CHARS_PER_TOKEN
+        self._record_call(self.backend, model, time.monotonic() - start, estimate_tokens(messages, 0),
+                          completion_tokens, failed)
+
+    def _mark(self, traces: List[Optional[Trace]], stage: str):
+        """Record a stage boundary on every trace given."""
+        for trace in traces:
+            if trace is not None:
+                trace.mark(stage)
+
+    def _fallback_reply(self, error: Exception) -> str:
+        """Map an API error to an in-character fallback reply."""
+        if isinstance(error, RateLimitShed):
+            metrics_collector.record_rate_limit_shed('gpt')
+            return DEPLETED_REPLY
+        if isinstance(error, openai.RateLimitError):
+            return DEPLETED_REPLY
+        if isinstance(error, openai.AuthenticationError):
+            return DISCONNECTED_REPLY
+        if not isinstance(error, CircuitOpenError):
+            print(f"GPT Error: {str(error)}")
+        return config.resilience.fallback_reply
+
+    def fallback_replies(self) -> List[str]:
+        """Every fixed reply _fallback_reply can return, for pre-synthesis."""
+        return [DEPLETED_REPLY, DISCONNECTED_REPLY, config.resilience.fallback_reply]
+
+    def _cached_reply(self, prompt: str, model: str) -> Optional[str]:
+        """
+        Look a prompt up in the exact-match cache, then in the semantic
+        cache for a paraphrase of an earlier prompt, among replies
+        written by `model`.
+        """
+        if self.response_cache is None and self.semantic_cache is None:
+            return None
+
+        if self.response_cache is not None:
+            reply = self.response_cache.get(self._cache_key(prompt, model))
+            if reply is not None:
+                metrics_collector.record_cache_lookup('gpt', True)
+                return reply
+
+        if self.semantic_cache is not None:
+            reply = self.semantic_cache.get(prompt, self._settings_key(model))
+            if reply is not None:
+                metrics_collector.record_cache_lookup('gpt', True, semantic=True)
+                # Promote so an exact repeat skips the embedding next time
+                if self.response_cache is not None:
+                    self.response_cache.put(self._cache_key(prompt, model), reply)
+                return reply
+
+        metrics_collector.record_cache_lookup('gpt', False)
+        return None
+
+    def _cache_key(self, prompt: str, model: str) -> str:
+        """Cache key for a prompt answered by `model` under the current request settings."""
+        return ResponseCache.make_key(
+            prompt, self.backend.model_name(model), self.temperature, self.system_prompt
+        )
+
+    def _settings_key(self, model: str) -> str:
+        """Fingerprint of the model and request settings a semantic cache entry is valid for."""
+        raw = json.dumps([self.backend.model_name(model), self.temperature, self.system_prompt])
+        return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+    def _store_reply(self, prompt: str, reply: str, model: str):
+        """Cache a reply that came back from the API under the model that wrote it."""
+        if not reply:
+            return
+        if self.response_cache is not None:
+            self.response_cache.put(self._cache_key(prompt, model), reply)
+        if self.semantic_cache is not None:
+            self.semantic_cache.put(prompt, self._settings_key(model), reply)
+
+    def _complete(self, prompt: str, trace: Optional[Trace] = None,
+                  deadline: Optional[Deadline] = None, backlog: Optional[Backlog] = None,
+                  choice: Optional[ModelChoice] = None) -> str:
+        """Get a reply from the API, skipping the cache lookup."""
+        self._mark([trace], "gpt_start")
+        length = self.reply_budget.plan(backlog)
+        messages = self._build_messages(prompt, length)
         try:
-            # Prepare messages
-            messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": prompt}
-            ]
-            
             # Get response with retry logic
-            response = self._make_api_call(messages)
+            choice = self._route([prompt], backlog, choice)
+            response = self._make_api_call(
+                messages, max_tokens=length.max_tokens, deadline=deadline, model=choice.model
+            )
             
             # Extract and process response
-            reply = response.choices[0].message.content
-            return self._sanitize_response(reply)
+            reply = self._sanitize_response(response.text)
+            self._store_reply(prompt, reply, response.model)
+            return reply
             
-        except openai.error.RateLimitError:
-            return "The mirror's energy is temporarily depleted. Please wait a moment..."
-        except openai.error.AuthenticationError:
-            return "The mirror's connection to the ethereal plane is disrupted. Please check the configuration."
+        except Exception as e:
+            return self._backup_reply(messages, length.max_tokens, deadline, e)
+        finally:
+            self._mark([trace], "gpt_end")
+
+    def ask_gpt(self, prompt: str, trace: Optional[Trace] = None,
+                deadline: Optional[Deadline] = None, backlog: Optional[Backlog] = None) -> str:
+        """
+        Process a prompt and return a response.
+        Includes caching, error handling and response processing.
+        `backlog` describes the replies already in flight; it steers the
+        choice of model tier and how long the reply may be.
+        """
+        # Route first so the cache is searched for the model that would answer
+        choice = self.router.choose([prompt], backlog)
+        cached = self.ask_gpt_cached(prompt, trace, choice.model)
+        if cached is not None:
+            return cached
+        return self._complete(prompt, trace, deadline, backlog, choice)
+
+    def ask_gpt_batch(self, prompts: List[str],
+                      traces: Optional[List[Optional[Trace]]] = None,
+                      deadline: Optional[Deadline] = None,
+                      backlog: Optional[Backlog] = None) -> List[str]:
+        """
+        Answer several prompts with a single API call.
+        Cached prompts are answered from the cache; prompts the batched
+        response doesn't cover are answered individually.
+        """
+        traces = traces or [None] * len(prompts)
+        # Each prompt is looked up under the model that would answer it alone
+        replies = [
+            self.ask_gpt_cached(prompt, trace, self.router.choose([prompt], backlog).model)
+            for prompt, trace in zip(prompts, traces)
+        ]
+        misses = [i for i, reply in enumerate(replies) if reply is None]
+        if len(misses) <= 1:
+            for i in misses:
+                replies[i] = self._complete(prompts[i], traces[i], deadline, backlog)
+            return replies
+
+        miss_traces = [traces[i] for i in misses]
+        self._mark(miss_traces, "gpt_start")
+        length = self.reply_budget.plan(backlog)
+        try:
+            choice = self._route([prompts[i] for i in misses], backlog)
+            response = self._make_api_call(
+                self._build_batch_messages([prompts[i] for i in misses], length),
+                max_tokens=length.max_tokens * len(misses),
+                deadline=deadline,
+                # Batches are slower by nature; hedging them would skew the latency window
+                hedge=False,
+                model=choice.model
+            )
+            batch_replies = self._parse_batch_reply(
+                response.text, len(misses)
+            )
+        except Exception as e:
+            for i in misses:
+                replies[i] = self._backup_reply(
+                    self._build_messages(prompts[i], length), length.max_tokens, deadline, e
+                )
+            self._mark(miss_traces, "gpt_end")
+            return replies
+
+        for i, reply in zip(misses, batch_replies):
+            if reply:
+                self._mark([traces[i]], "gpt_end")
+                self._store_reply(prompts[i], reply, response.model)
+                replies[i] = reply
+            else:
+                replies[i] = self._complete(prompts[i], traces[i], deadline, backlog)
+        return replies
+
+    def ask_gpt_variants(self, prompt: str, count: int) -> List[str]:
+        """
+        Ask for several distinct replies to one prompt, bypassing the
+        caches. Used offline to build the answer bank. Returns only the
+        replies that came back well-formed.
+        """
+        instruction = self.variant_instruction.format(count=count)
+        messages = [
+            {"role": "system", "content": f"{self.system_prompt} {instruction}"},
+            {"role": "user", "content": prompt}
+        ]
+        try:
+            response = self._make_api_call(messages, max_tokens=self.max_tokens * count, hedge=False)
         except Exception as e:
             print(f"GPT Error: {str(e)}")
-            return "The mirror's vision is clouded. Try again in a moment."
+            return []
+        replies = self._parse_batch_reply(response.text, count)
+        return [reply for reply in replies if reply]
+
+    def ask_gpt_cached(self, prompt: str, trace: Optional[Trace] = None,
+                       model: Optional[str] = None) -> Optional[str]:
+        """
+        Return the cached reply `model` gave to a prompt, or None without
+        calling the API. The model defaults to the one the router picks.
+        """
+        model = model or self.router.choose([prompt]).model
+        cached = self._cached_reply(prompt, model)
+        if cached is not None:
+            self._mark([trace], "gpt_start")
+            self._mark([trace], "gpt_end")
+        return cached
+
+    async def _complete_async(self, prompt: str, trace: Optional[Trace] = None,
+                              deadline: Optional[Deadline] = None, backlog: Optional[Backlog] = None,
+                              choice: Optional[ModelChoice] = None) -> str:
+        """Async version of _complete."""
+        self._mark([trace], "gpt_start")
+        length = self.reply_budget.plan(backlog)
+        messages = self._build_messages(prompt, length)
+        try:
+            choice = self._route([prompt], backlog, choice)
+            response = await self._make_api_call_async(
+                messages, max_tokens=length.max_tokens, deadline=deadline, model=choice.model
+            )
+            reply = self._sanitize_response(response.text)
+            self._store_reply(prompt, reply, response.model)
+            return reply
+
+        except Exception as e:
+            return await self._backup_reply_async(messages, length.max_tokens, deadline, e)
+        finally:
+            self._mark([trace], "gpt_end")
+
+    async def ask_gpt_async(self, prompt: str, trace: Optional[Trace] = None,
+                            deadline: Optional[Deadline] = None, backlog: Optional[Backlog] = None) -> str:
+        """Async version of ask_gpt for use on the asyncio runtime."""
+        choice = self.router.choose([prompt], backlog)
+        cached = self.ask_gpt_cached(prompt, trace, choice.model)
+        if cached is not None:
+            return cached
+        return await self._complete_async(prompt, trace, deadline, backlog, choice)
+
+    async def ask_gpt_batch_async(self, prompts: List[str],
+                                  traces: Optional[List[Optional[Trace]]] = None,
+                                  deadline: Optional[Deadline] = None,
+                                  backlog: Optional[Backlog] = None) -> List[str]:
+        """Async version of ask_gpt_batch for use on the asyncio runtime."""
+        traces = traces or [None] * len(prompts)
+        # Each prompt is looked up under the model that would answer it alone
+        replies = [
+            self.ask_gpt_cached(prompt, trace, self.router.choose([prompt], backlog).model)
+            for prompt, trace in zip(prompts, traces)
+        ]
+        misses = [i for i, reply in enumerate(replies) if reply is None]
+        if len(misses) <= 1:
+            for i in misses:
+                replies[i] = await self._complete_async(prompts[i], traces[i], deadline, backlog)
+            return replies
+
+        miss_traces = [traces[i] for i in misses]
+        self._mark(miss_traces, "gpt_start")
+        length = self.reply_budget.plan(backlog)
+        try:
+            choice = self._route([prompts[i] for i in misses], backlog)
+            response = await self._make_api_call_async(
+                self._build_batch_messages([prompts[i] for i in misses], length),
+                max_tokens=length.max_tokens * len(misses),
+                deadline=deadline,
+                # Batches are slower by nature; hedging them would skew the latency window
+                hedge=False,
+                model=choice.model
+            )
+            batch_replies = self._parse_batch_reply(
+                response.text, len(misses)
+            )
+        except Exception as e:
+            for i in misses:
+                replies[i] = await self._backup_reply_async(
+                    self._build_messages(prompts[i], length), length.max_tokens, deadline, e
+                )
+            self._mark(miss_traces, "gpt_end")
+            return replies
+
+        for i, reply in zip(misses, batch_replies):
+            if reply:
+                self._mark([traces[i]], "gpt_end")
+                self._store_reply(prompts[i], reply, response.model)
+                replies[i] = reply
+            else:
+                replies[i] = await self._complete_async(prompts[i], traces[i], deadline, backlog)
+        return replies
+
+    def stream_gpt(self, prompt: str, trace: Optional[Trace] = None,
+                   deadline: Optional[Deadline] = None, backlog: Optional[Backlog] = None) -> Iterator[str]:
+        """
+        Stream a response, yielding it one complete sentence at a time.
+        Yields a fallback reply instead if the call fails before any text.
+        """
+        choice = self.router.choose([prompt], backlog)
+        cached = self.ask_gpt_cached(prompt, trace, choice.model)
+        if cached is not None:
+            yield from split_sentences(cached)
+            return
+
+        chunker = SentenceChunker()
+        sentences: List[str] = []
+        length = self.reply_budget.plan(backlog)
+        messages = self._build_messages(prompt, length)
+        choice = self._route([prompt], backlog, choice)
+        self._mark([trace], "gpt_start")
+        start = time.monotonic()
+        try:
+            for delta in self._make_stream_call(messages, max_tokens=length.max_tokens,
+                                                deadline=deadline, model=choice.model):
+                for sentence in chunker.feed(delta):
+                    self._mark([trace], "gpt_first_sentence")
+                    sentences.append(self._sanitize_response(sentence))
+                    yield sentences[-1]
+            for sentence in chunker.flush():
+                self._mark([trace], "gpt_first_sentence")
+                sentences.append(self._sanitize_response(sentence))
+                yield sentences[-1]
+            self._store_reply(prompt, " ".join(sentences), choice.model)
+            self._record_stream(choice.model, start, messages, sentences)
+
+        except Exception as e:
+            if not sentences:
+                yield self._backup_reply(messages, length.max_tokens, deadline, e)
+            else:
+                self._record_stream(choice.model, start, messages, sentences, failed=True)
+                print(f"GPT stream interrupted: {str(e)}")
+        finally:
+            self._mark([trace], "gpt_end")
+
+    async def stream_gpt_async(self, prompt: str, trace: Optional[Trace] = None,
+                               deadline: Optional[Deadline] = None,
+                               backlog: Optional[Backlog] = None) -> AsyncIterator[str]:
+        """Async version of stream_gpt for use on the asyncio runtime."""
+        choice = self.router.choose([prompt], backlog)
+        cached = self.ask_gpt_cached(prompt, trace, choice.model)
+        if cached is not None:
+            for sentence in split_sentences(cached):
+                yield sentence
+            return
+
+        chunker = SentenceChunker()
+        sentences: List[str] = []
+        length = self.reply_budget.plan(backlog)
+        messages = self._build_messages(prompt, length)
+        choice = self._route([prompt], backlog, choice)
+        self._mark([trace], "gpt_start")
+        start = time.monotonic()
+        try:
+            stream = await self._make_stream_call_async(messages, max_tokens=length.max_tokens,
+                                                        deadline=deadline, model=choice.model)
+            async for delta in stream:
+                for sentence in chunker.feed(delta):
+                    self._mark([trace], "gpt_first_sentence")
+                    sentences.append(self._sanitize_response(sentence))
+                    yield sentences[-1]
+            for sentence in chunker.flush():
+                self._mark([trace], "gpt_first_sentence")
+                sentences.append(self._sanitize_response(sentence))
+                yield sentences[-1]
+            self._store_reply(prompt, " ".join(sentences), choice.model)
+            self._record_stream(choice.model, start, messages, sentences)
+
+        except Exception as e:
+            if not sentences:
+                yield await self._backup_reply_async(messages, length.max_tokens, deadline, e)
+            else:
+                self._record_stream(choice.model, start, messages, sentences, failed=True)
+                print(f"GPT stream interrupted: {str(e)}")
+        finally:
+            self._mark([trace], "gpt_end")
+
+    def close(self):
+        """Close the backends' sync clients and the hedging threads."""
+        self.hedger.shutdown()
+        self.backend.close()
+        if self.fallback_backend is not None:
+            self.fallback_backend.close()
+
+    async def close_async(self):
+        """Close the backends' async clients."""
+        await self.backend.close_async()
+        if self.fallback_backend is not None:
+            await self.fallback_backend.close_async()
+
+    def save_cache(self):
+        """Persist the response caches, if enabled."""
+        if self.response_cache is not None:
+            self.response_cache.save()
+        if self.semantic_cache is not None:
+            self.semantic_cache.save()
 
 # Create singleton instance
 gpt_handler = GPTHandler()
@@ -0,0 +1,123 @@
+# mirror_backend/hedging.py
+
+import time
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Callable, Awaitable, Deque, Dict, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+PRIMARY = "primary"
+HEDGE = "hedge"
+
+class LatencyTracker:
+    """Sliding window of recent call latencies for picking the hedge delay."""
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """The p-th percentile of the window, or None if it is empty."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(p / 100 * len(samples)))
+        return samples[index]
+
+class Hedger:
+    """
+    Runs a primary call and, if it hasn't finished after `delay` seconds,
+    a hedge call alongside it. The first to succeed wins; if one fails the
+    other is still awaited. Returns the result, which call produced it
+    and whether the hedge was sent.
+    """
+    def __init__(self, max_workers: int = 8):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def run(self, primary: Callable[[], T], hedge: Callable[[], T], delay: float) -> Tuple[T, str, bool]:
+        """
+        Threaded version. A losing call can't be interrupted mid-request,
+        so it finishes in the background and its result is discarded.
+        """
+        futures = {self._executor.submit(primary): PRIMARY}
+        done, _ = wait(futures, timeout=delay)
+        if not done:
+            futures[self._executor.submit(hedge)] = HEDGE
+        result, winner = self._first_success(futures)
+        return result, winner, len(futures) > 1
+
+    def _first_success(self, futures: Dict[Future, str]) -> Tuple[T, str]:
+        """Wait for the first successful future; raise the last error if all fail."""
+        pending = set(futures)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.cancel()  # Only stops calls that haven't started
+                    return future.result(), futures[future]
+                error = future.exception()
+        raise error
+
+    async def run_async(self, primary: Callable[[], Awaitable[T]],
+                        hedge: Callable[[], Awaitable[T]], delay: float) -> Tuple[T, str, bool]:
+        """Async version. The losing request is cancelled outright."""
+        tasks = {asyncio.ensure_future(primary()): PRIMARY}
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done:
+            tasks[asyncio.ensure_future(hedge())] = HEDGE
+
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result(), tasks[task], len(tasks) > 1
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+def timed(fn: Callable[[], T], tracker: LatencyTracker) -> Callable[[], T]:
+    """Wrap a call so its latency is recorded when it succeeds."""
+    def call() -> T:
+        start = time.monotonic()
+        result = fn()
+        tracker.observe(time.monotonic() - start)
+        return result
+    return call
+
+def timed_async(fn: Callable[[], Awaitable[T]], tracker: LatencyTracker) -> Callable[[], Awaitable[T]]:
+    """
+    Async version of timed. A call cancelled for losing is recorded at
+    the time it was cancelled, a lower bound that keeps slow calls in
+    the window instead of only the fast ones that got to finish.
+    """
+    async def call() -> T:
+        start = time.monotonic()
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            tracker.observe(time.monotonic() - start)
+            raise
+        tracker.observe(time.monotonic() - start)
+        return result
+    return call
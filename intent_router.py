@@ -0,0 +1,179 @@
+# mirror_backend/intent_router.py
+
+import re
+import time
+import random
+import threading
+from typing import Optional, Dict, List, Tuple
+from config import config
+from text_utils import normalize_text
+
+# Phrases that make up trivial comments, by intent
+KEYWORDS: Dict[str, List[str]] = {
+    "greeting": [
+        "hi", "hii", "hiii", "hello", "helo", "hey", "heyy", "heyyy", "yo", "sup",
+        "wassup", "whats up", "hiya", "howdy", "hola", "greetings", "good morning",
+        "good afternoon", "good evening", "gm", "im here", "first",
+    ],
+    "love": ["love", "love you", "love this", "ily", "luv", "heart", "beautiful", "amazing"],
+    "laugh": ["lol", "lmao", "lmfao", "haha", "hahaha", "hehe", "rofl", "funny"],
+    "thanks": ["thanks", "thank you", "thx", "ty", "tysm", "appreciate it"],
+    "farewell": ["bye", "byee", "goodbye", "good night", "goodnight", "gn", "see you", "cya", "later"],
+}
+
+# Words that don't change what a trivial comment means ("hi mirror", "hello everyone")
+FILLER = {
+    "mirror", "mirrorexe", "exe", "oracle", "everyone", "everybody", "all", "guys",
+    "yall", "there", "fam", "friends", "chat", "again", "so", "much", "very",
+    "i", "u", "you", "my", "dear", "bro", "sis", "omg", "wow", "oh", "ok", "okay",
+}
+
+# Emoji that carry an intent when a comment has no words
+EMOJI_INTENTS = {
+    "love": "❤🧡💛💚💙💜🖤🤍🤎💕💖💗💓💞💘😍🥰😘",
+    "laugh": "😂🤣😆😹",
+    "greeting": "👋🙋",
+}
+
+# In-character lines per intent; pre-synthesized so routed comments never
+# wait on an API
+CANNED_RESPONSES: Dict[str, List[str]] = {
+    "greeting": [
+        "Welcome, traveler. The mirror sees you.",
+        "Ah, a new presence in the glass. Greetings.",
+        "The mirror shimmers in your honor. Welcome.",
+    ],
+    "love": [
+        "The mirror feels your warmth and returns it tenfold.",
+        "Such devotion makes the glass glow brighter.",
+        "Your affection ripples across the mirror's surface.",
+    ],
+    "laugh": [
+        "Even the mirror cannot resist a smile.",
+        "Laughter is the oldest spell of all.",
+    ],
+    "thanks": [
+        "The mirror is honored by your gratitude.",
+        "Gratitude received. The stars take note.",
+    ],
+    "farewell": [
+        "Go gently. The mirror will remember you.",
+        "Until we meet again in the glass.",
+    ],
+    "emoji": [
+        "The mirror understands your symbols.",
+        "Signs and symbols. The mirror reads them all.",
+    ],
+    "single_word": [
+        "A single word, yet the mirror hears its echo.",
+        "Speak more, seeker, and the mirror shall answer.",
+    ],
+}
+
+# Leading words that make even a one-word comment a real question
+QUESTION_WORDS = {"who", "what", "when", "where", "why", "how", "which", "will", "should", "can"}
+
+class IntentRouter:
+    """
+    Cheap pre-classifier that catches trivial comments (greetings, emoji,
+    single words) before they reach GPT. Keywords are matched over the
+    comment's words with a token trie, so multi-word phrases like
+    "good morning" cost the same as single words. Each intent answers at
+    most once per cooldown, so spam waves don't flood playback.
+    """
+    def __init__(self):
+        self.settings = config.router
+        self._trie = self._build_trie(KEYWORDS)
+        self._last_routed: Dict[str, float] = {}
+        self._last_line: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _build_trie(keywords: Dict[str, List[str]]) -> dict:
+        """Build a word-level trie; a None key marks the end of a phrase."""
+        trie: dict = {}
+        for intent, phrases in keywords.items():
+            for phrase in phrases:
+                node = trie
+                for word in normalize_text(phrase).split():
+                    node = node.setdefault(word, {})
+                node[None] = intent
+        return trie
+
+    def _match_words(self, words: List[str]) -> Tuple[Optional[str], bool]:
+        """
+        Scan words for keyword phrases, longest match first. Returns the
+        first intent found and whether every word was a keyword or filler.
+        """
+        intent = None
+        i = 0
+        while i < len(words):
+            node, end, found = self._trie, i, None
+            for j in range(i, len(words)):
+                node = node.get(words[j])
+                if node is None:
+                    break
+                if None in node:
+                    end, found = j + 1, node[None]
+            if found is not None:
+                intent = intent or found
+                i = end
+            elif words[i] in FILLER:
+                i += 1
+            else:
+                return intent, False
+        return intent, True
+
+    def classify(self, text: str) -> Optional[str]:
+        """Return the intent of a trivial comment, or None if it is substantive."""
+        stripped = text.strip()
+        if not stripped:
+            return None
+
+        # No words at all: emoji or punctuation only
+        if not re.search(r"\w", stripped):
+            for intent, emoji in EMOJI_INTENTS.items():
+                if any(char in emoji for char in stripped):
+                    return intent
+            return "emoji"
+
+        words = normalize_text(stripped).split()
+        if len(words) > self.settings.max_words:
+            return None
+        intent, trivial = self._match_words(words)
+        if trivial and intent is not None:
+            return intent
+        if (self.settings.route_single_words and len(words) == 1 and "?" not in stripped
+                and words[0] not in QUESTION_WORDS):
+            return "single_word"
+        return None
+
+    def route(self, text: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Classify a comment. Returns (intent, canned line) for a trivial
+        comment, where the line is None if the intent answered too
+        recently; (None, None) means the comment should go to GPT.
+        """
+        if not self.settings.enabled:
+            return None, None
+        intent = self.classify(text)
+        if intent is None:
+            return None, None
+
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_routed.get(intent, float("-inf")) < self.settings.cooldown:
+                return intent, None
+            self._last_routed[intent] = now
+            lines = CANNED_RESPONSES[intent]
+            choices = [line for line in lines if line != self._last_line.get(intent)]
+            line = random.choice(choices or lines)
+            self._last_line[intent] = line
+        return intent, line
+
+    def canned_lines(self) -> List[str]:
+        """Every canned line, for pre-synthesis."""
+        return [line for lines in CANNED_RESPONSES.values() for line in lines]
+
+# Create singleton instance
+intent_router = IntentRouter()
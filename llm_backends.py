@@ -0,0 +1,301 @@
+# mirror_backend/llm_backends.py
+
+import asyncio
+import threading
+from queue import Queue
+import httpx
+import openai
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, Iterator, AsyncIterator
+from config import Config, config
+
+@dataclass
+class Completion:
+    text: str
+    prompt_tokens: Optional[int] = None  # None when the backend doesn't report usage
+    completion_tokens: Optional[int] = None
+    model: Optional[str] = None  # The model requested; set by GPTHandler, hedged calls may differ
+
+class LLMBackend:
+    """
+    A chat completion service. Backends take OpenAI-style message lists
+    and return plain text, so GPTHandler's caching, routing, retries and
+    metrics work the same whichever one answers.
+    """
+    name = "base"
+    uses_quota = False  # Whether calls count against the OpenAI rate limits
+    multi_model = False  # Whether the model argument picks between models
+
+    def model_name(self, model: str) -> str:
+        """The model that actually answers a request for `model`."""
+        return model
+
+    def complete(self, messages: list, model: str, max_tokens: int,
+                 temperature: float, timeout: float) -> Completion:
+        raise NotImplementedError
+
+    async def complete_async(self, messages: list, model: str, max_tokens: int,
+                             temperature: float, timeout: float) -> Completion:
+        return await asyncio.to_thread(self.complete, messages, model, max_tokens, temperature, timeout)
+
+    def stream(self, messages: list, model: str, max_tokens: int,
+               temperature: float, timeout: float) -> Iterator[str]:
+        """Start a streamed completion and return an iterator of text deltas."""
+        raise NotImplementedError
+
+    async def stream_async(self, messages: list, model: str, max_tokens: int,
+                           temperature: float, timeout: float) -> AsyncIterator[str]:
+        """Async version of stream; the request is sent before this returns."""
+        deltas = await asyncio.to_thread(self.stream, messages, model, max_tokens, temperature, timeout)
+
+        async def iterate() -> AsyncIterator[str]:
+            while True:
+                delta = await asyncio.to_thread(next, deltas, None)
+                if delta is None:
+                    return
+                yield delta
+        return iterate()
+
+    def close(self):
+        pass
+
+    async def close_async(self):
+        pass
+
+class OpenAIBackend(LLMBackend):
+    """The OpenAI API, over pooled keep-alive HTTP clients."""
+    name = "openai"
+    uses_quota = True
+    multi_model = True
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None):
+        self.base_url = base_url
+        self.api_key = api_key or Config.OPENAI_API_KEY
+        self._client: Optional[openai.OpenAI] = None
+        self._async_client: Optional[openai.AsyncOpenAI] = None
+
+    def _pool_settings(self) -> Dict[str, Any]:
+        """Connection pool limits and timeouts shared by both HTTP clients."""
+        return {
+            "limits": httpx.Limits(
+                max_connections=config.gpt.pool_size,
+                max_keepalive_connections=config.gpt.pool_size,
+                keepalive_expiry=config.gpt.keepalive_expiry
+            ),
+            "timeout": httpx.Timeout(
+                config.gpt.request_timeout, connect=config.gpt.connect_timeout
+            ),
+        }
+
+    @property
+    def client(self) -> openai.OpenAI:
+        """Long-lived client shared by the threaded pipeline workers."""
+        if self._client is None:
+            self._client = openai.OpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=httpx.Client(**self._pool_settings()),
+                max_retries=0  # Retries are handled by the retry policy
+            )
+        return self._client
+
+    @property
+    def async_client(self) -> openai.AsyncOpenAI:
+        """Long-lived client shared by all coroutines on the event loop."""
+        if self._async_client is None:
+            self._async_client = openai.AsyncOpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=httpx.AsyncClient(**self._pool_settings()),
+                max_retries=0
+            )
+        return self._async_client
+
+    def _completion(self, response) -> Completion:
+        usage = response.usage
+        return Completion(
+            text=response.choices[0].message.content or "",
+            prompt_tokens=usage.prompt_tokens if usage is not None else None,
+            completion_tokens=usage.completion_tokens if usage is not None else None
+        )
+
+    def complete(self, messages: list, model: str, max_tokens: int,
+                 temperature: float, timeout: float) -> Completion:
+        response = self.client.chat.completions.create(
+            model=self.model_name(model),
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout
+        )
+        return self._completion(response)
+
+    async def complete_async(self, messages: list, model: str, max_tokens: int,
+                             temperature: float, timeout: float) -> Completion:
+        response = await self.async_client.chat.completions.create(
+            model=self.model_name(model),
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            timeout=timeout
+        )
+        return self._completion(response)
+
+    def stream(self, messages: list, model: str, max_tokens: int,
+               temperature: float, timeout: float) -> Iterator[str]:
+        response = self.client.chat.completions.create(
+            model=self.model_name(model),
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            timeout=timeout
+        )
+        return (chunk.choices[0].delta.content or "" for chunk in response if chunk.choices)
+
+    async def stream_async(self, messages: list, model: str, max_tokens: int,
+                           temperature: float, timeout: float) -> AsyncIterator[str]:
+        response = await self.async_client.chat.completions.create(
+            model=self.model_name(model),
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            timeout=timeout
+        )
+
+        async def iterate() -> AsyncIterator[str]:
+            async for chunk in response:
+                if chunk.choices:
+                    yield chunk.choices[0].delta.content or ""
+        return iterate()
+
+    def close(self):
+        """Close the pooled sync HTTP client."""
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+    async def close_async(self):
+        """Close the pooled async HTTP client."""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+class LocalHTTPBackend(OpenAIBackend):
+    """
+    An OpenAI-compatible server on the local network (llama.cpp server,
+    vLLM, Ollama). It serves a single model, so routing and hedging
+    between OpenAI models don't apply.
+    """
+    name = "local_http"
+    uses_quota = False
+    multi_model = False
+
+    def __init__(self):
+        super().__init__(base_url=config.gpt.local_base_url, api_key="local")
+
+    def model_name(self, model: str) -> str:
+        return config.gpt.local_model
+
+class LlamaCppBackend(LLMBackend):
+    """
+    A small GGUF model run in-process on the CPU with llama-cpp-python.
+    No network at all, and its replies are deterministic, which makes it
+    useful for benchmarking the rest of the pipeline: it samples at
+    gpt.local_temperature (0 by default) rather than the temperature it
+    is passed, and reseeds with gpt.local_seed on every call. Calls are
+    serialized since one model instance can't run two generations at once.
+    """
+    name = "llama_cpp"
+
+    def __init__(self):
+        try:
+            from llama_cpp import Llama
+        except ImportError as e:
+            raise ImportError(
+                "The llama_cpp backend needs llama-cpp-python: pip install llama-cpp-python"
+            ) from e
+        if config.gpt.local_model_path is None:
+            raise ValueError("gpt.local_model_path must point to a GGUF model for the llama_cpp backend")
+        self.model_path = config.gpt.local_model_path
+        self._llama = Llama(
+            model_path=str(self.model_path),
+            n_ctx=config.gpt.local_context,
+            n_threads=config.gpt.local_threads,
+            seed=config.gpt.local_seed,
+            verbose=False
+        )
+        self._lock = threading.Lock()
+
+    def model_name(self, model: str) -> str:
+        return self.model_path.stem
+
+    def complete(self, messages: list, model: str, max_tokens: int,
+                 temperature: float, timeout: float) -> Completion:
+        # Generation runs on this thread to the end; the timeout can't cut it short
+        with self._lock:
+            response = self._llama.create_chat_completion(
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=config.gpt.local_temperature,
+                seed=config.gpt.local_seed
+            )
+        usage = response.get("usage") or {}
+        return Completion(
+            text=response["choices"][0]["message"].get("content") or "",
+            prompt_tokens=usage.get("prompt_tokens"),
+            completion_tokens=usage.get("completion_tokens")
+        )
+
+    def stream(self, messages: list, model: str, max_tokens: int,
+               temperature: float, timeout: float) -> Iterator[str]:
+        # Generate on a thread of its own, so the lock is released when
+        # generation ends even if the caller never finishes reading
+        pending: Queue = Queue()  # Deltas, then None or the error that ended generation
+        stopped = threading.Event()
+
+        def generate():
+            try:
+                with self._lock:
+                    for chunk in self._llama.create_chat_completion(
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=config.gpt.local_temperature,
+                        seed=config.gpt.local_seed,
+                        stream=True
+                    ):
+                        if stopped.is_set():
+                            break
+                        pending.put(chunk["choices"][0]["delta"].get("content") or "")
+            except Exception as e:
+                pending.put(e)
+                return
+            pending.put(None)
+
+        def deltas() -> Iterator[str]:
+            try:
+                while True:
+                    delta = pending.get()
+                    if delta is None:
+                        return
+                    if isinstance(delta, Exception):
+                        raise delta
+                    yield delta
+            finally:
+                stopped.set()  # A caller that stops reading stops generation
+
+        threading.Thread(target=generate, daemon=True).start()
+        return deltas()
+
+BACKENDS = {
+    OpenAIBackend.name: OpenAIBackend,
+    LocalHTTPBackend.name: LocalHTTPBackend,
+    LlamaCppBackend.name: LlamaCppBackend,
+}
+
+def make_backend(name: str) -> LLMBackend:
+    """Create the backend registered under `name`."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM backend '{name}'; choose from {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
@@ -1,18 +1,30 @@
 import time
 import json
+import threading
+from collections import deque
 from pathlib import Path
-from typing import Dict, List, Optional
-from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Deque, TYPE_CHECKING
+from dataclasses import dataclass, asdict, field
 from datetime import datetime, timedelta
 from logging_config import get_logger
 
+if TYPE_CHECKING:
+    from tracing import Trace
+
 logger = get_logger(__name__)
 
+# Latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+
 @dataclass
 class APIMetrics:
     total_calls: int = 0
     total_errors: int = 0
     average_latency: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    semantic_cache_hits: int = 0  # Included in cache_hits
+    rate_limit_shed: int = 0  # Calls dropped by the client-side rate limiter
     last_error_time: Optional[float] = None
     last_error_message: Optional[str] = None
 
@@ -22,11 +34,39 @@ class ChatMetrics:
     total_responses: int = 0
     unique_users: set = None
     response_rate: float = 0.0
+    dropped_overflow: int = 0
+    dropped_stale: int = 0
+    dropped_rate_limited: int = 0
+    routed_locally: int = 0  # Trivial comments answered with a canned reply
+    routed_suppressed: int = 0  # Trivial comments skipped during an intent's cooldown
+    comment_groups: int = 0  # Groups of duplicate comments answered once
+    coalesced_comments: int = 0  # Comments absorbed into an earlier duplicate
+    max_group_size: int = 0
     
     def __post_init__(self):
         if self.unique_users is None:
             self.unique_users = set()
 
+@dataclass
+class HedgeMetrics:
+    eligible_calls: int = 0  # Calls that could have been hedged
+    hedged_calls: int = 0  # Calls where the fallback model was also asked
+    hedge_wins: int = 0  # Hedged calls the fallback model answered first
+    current_delay: float = 0.0  # Latest hedge delay in seconds
+
+@dataclass
+class ModelTierMetrics:
+    model: str = ""
+    routed: int = 0  # Requests routed to this tier
+    forced: int = 0  # Routed here by the reply backlog rather than complexity
+    total_complexity: float = 0.0  # Sum of the complexity estimates routed here
+    calls: int = 0  # API calls, including retries and hedges
+    errors: int = 0
+    total_latency: float = 0.0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0  # Estimated USD
+
 @dataclass
 class AudioMetrics:
     total_generations: int = 0
@@ -35,6 +75,37 @@ class AudioMetrics:
     total_playback_time: float = 0.0
     failed_playbacks: int = 0
 
+@dataclass
+class LatencyHistogram:
+    # One count per bucket in LATENCY_BUCKETS, plus one for anything slower
+    buckets: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """Add one latency sample."""
+        index = next(
+            (i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound),
+            len(LATENCY_BUCKETS)
+        )
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p: float) -> float:
+        """Approximate the p-th percentile as the upper bound of its bucket."""
+        if self.count == 0:
+            return 0.0
+        target = p / 100 * self.count
+        seen = 0
+        for bound, bucket_count in zip(LATENCY_BUCKETS, self.buckets):
+            seen += bucket_count
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
 class MetricsCollector:
     def __init__(self, save_interval: int = 300):  # 5 minutes
         self.save_interval = save_interval
@@ -46,8 +117,13 @@ class MetricsCollector:
         # Initialize metrics
         self.gpt_metrics = APIMetrics()
         self.tts_metrics = APIMetrics()
+        self.hedge_metrics = HedgeMetrics()
+        self.model_tiers: Dict[str, ModelTierMetrics] = {}
         self.chat_metrics = ChatMetrics()
         self.audio_metrics = AudioMetrics()
+        self.stage_latency: Dict[str, LatencyHistogram] = {}
+        self.recent_traces: Deque["Trace"] = deque(maxlen=100)
+        self._trace_lock = threading.Lock()
         
         # Load previous metrics if available
         self._load_metrics()
@@ -75,7 +151,15 @@ class MetricsCollector:
                     **asdict(self.chat_metrics),
                     'unique_users': list(self.chat_metrics.unique_users)
                 },
-                'audio': asdict(self.audio_metrics)
+                'audio': asdict(self.audio_metrics),
+                'hedge': asdict(self.hedge_metrics),
+                'model_tiers': {
+                    tier: asdict(metrics) for tier, metrics in self.model_tiers.items()
+                },
+                'latency': {
+                    stage: asdict(histogram)
+                    for stage, histogram in self.stage_latency.items()
+                }
             }
             
             metrics_file = self._get_metrics_file()
@@ -115,6 +199,66 @@ class MetricsCollector:
 
         self._check_save()
 
+    def record_cache_lookup(self, api_type: str, hit: bool, semantic: bool = False) -> None:
+        """Record a response cache lookup in front of an API."""
+        metrics = self.gpt_metrics if api_type == 'gpt' else self.tts_metrics
+
+        if hit:
+            metrics.cache_hits += 1
+            if semantic:
+                metrics.semantic_cache_hits += 1
+        else:
+            metrics.cache_misses += 1
+
+        self._check_save()
+
+    def record_rate_limit_shed(self, api_type: str) -> None:
+        """Record an API call dropped for lack of rate limit quota."""
+        metrics = self.gpt_metrics if api_type == 'gpt' else self.tts_metrics
+        metrics.rate_limit_shed += 1
+
+        self._check_save()
+
+    def record_hedge(self, hedged: bool, winner: str, delay: float) -> None:
+        """Record a GPT call that was eligible for hedging and who answered it."""
+        self.hedge_metrics.eligible_calls += 1
+        self.hedge_metrics.current_delay = delay
+        if hedged:
+            self.hedge_metrics.hedged_calls += 1
+            if winner == 'hedge':
+                self.hedge_metrics.hedge_wins += 1
+
+        self._check_save()
+
+    def _tier_metrics(self, tier: str, model: str) -> ModelTierMetrics:
+        metrics = self.model_tiers.setdefault(tier, ModelTierMetrics())
+        metrics.model = model
+        return metrics
+
+    def record_model_route(self, tier: str, model: str, complexity: float, forced: bool) -> None:
+        """Record the model tier picked for a GPT request."""
+        metrics = self._tier_metrics(tier, model)
+        metrics.routed += 1
+        metrics.total_complexity += complexity
+        if forced:
+            metrics.forced += 1
+
+        self._check_save()
+
+    def record_model_call(self, tier: str, model: str, latency: float, prompt_tokens: int,
+                          completion_tokens: int, cost: float, failed: bool = False) -> None:
+        """Record the latency, token usage and cost of one GPT API call."""
+        metrics = self._tier_metrics(tier, model)
+        metrics.calls += 1
+        metrics.total_latency += latency
+        metrics.prompt_tokens += prompt_tokens
+        metrics.completion_tokens += completion_tokens
+        metrics.cost += cost
+        if failed:
+            metrics.errors += 1
+
+        self._check_save()
+
     def record_chat_activity(self, username: str, response_sent: bool) -> None:
         """Record chat activity metrics."""
         self.chat_metrics.total_comments += 1
@@ -129,6 +273,35 @@ class MetricsCollector:
         
         self._check_save()
 
+    def record_comment_dropped(self, reason: str) -> None:
+        """Record a shed comment ('overflow', 'stale' or 'rate_limited')."""
+        if reason == 'stale':
+            self.chat_metrics.dropped_stale += 1
+        elif reason == 'rate_limited':
+            self.chat_metrics.dropped_rate_limited += 1
+        else:
+            self.chat_metrics.dropped_overflow += 1
+
+        self._check_save()
+
+    def record_comment_routed(self, intent: str, answered: bool) -> None:
+        """Record a trivial comment kept away from GPT by the intent router."""
+        if answered:
+            self.chat_metrics.routed_locally += 1
+        else:
+            self.chat_metrics.routed_suppressed += 1
+
+        self._check_save()
+
+    def record_comment_group(self, size: int) -> None:
+        """Record a closed group of duplicate comments that got one answer."""
+        if size > 1:
+            self.chat_metrics.comment_groups += 1
+            self.chat_metrics.coalesced_comments += size - 1
+        self.chat_metrics.max_group_size = max(self.chat_metrics.max_group_size, size)
+
+        self._check_save()
+
     def record_audio_activity(self, duration: float, cached: bool, failed: bool = False) -> None:
         """Record audio activity metrics."""
         self.audio_metrics.total_generations += 1
@@ -145,6 +318,61 @@ class MetricsCollector:
             
         self._check_save()
 
+    def record_trace(self, trace: "Trace") -> None:
+        """Feed a comment trace into the per-stage latency histograms."""
+        with self._trace_lock:
+            for stage, seconds in trace.spans().items():
+                self.stage_latency.setdefault(stage, LatencyHistogram()).observe(seconds)
+            self.recent_traces.append(trace)
+
+        self._check_save()
+
+    def get_latency_summary(self) -> Dict:
+        """Get p50/p95/max latency in milliseconds for each traced stage."""
+        with self._trace_lock:
+            return {
+                stage: {
+                    'count': histogram.count,
+                    'p50_ms': round(histogram.percentile(50) * 1000, 1),
+                    'p95_ms': round(histogram.percentile(95) * 1000, 1),
+                    'max_ms': round(histogram.max * 1000, 1)
+                }
+                for stage, histogram in self.stage_latency.items()
+            }
+
+    def get_tier_summary(self) -> Dict:
+        """Get routing share, latency and cost per GPT model tier."""
+        total_routed = sum(metrics.routed for metrics in self.model_tiers.values())
+        return {
+            tier: {
+                'model': metrics.model,
+                'routed_share': metrics.routed / max(1, total_routed) * 100,
+                'forced': metrics.forced,
+                'average_complexity': metrics.total_complexity / max(1, metrics.routed),
+                'calls': metrics.calls,
+                'errors': metrics.errors,
+                'average_latency_ms': round(metrics.total_latency / max(1, metrics.calls) * 1000, 1),
+                'tokens': metrics.prompt_tokens + metrics.completion_tokens,
+                'cost': round(metrics.cost, 4),
+                'cost_per_call': round(metrics.cost / max(1, metrics.calls), 5)
+            }
+            for tier, metrics in self.model_tiers.items()
+        }
+
+    def get_recent_traces(self, limit: int = 20) -> List[Dict]:
+        """Get the most recent comment traces, newest first."""
+        with self._trace_lock:
+            traces = list(self.recent_traces)[-limit:]
+        return [trace.to_dict() for trace in reversed(traces)]
+
+    def get_trace(self, trace_id: int) -> Optional[Dict]:
+        """Get one recent comment trace by id."""
+        with self._trace_lock:
+            for trace in self.recent_traces:
+                if trace.trace_id == trace_id:
+                    return trace.to_dict()
+        return None
+
     def _check_save(self) -> None:
         """Check if metrics should be saved based on the interval."""
         current_time = time.time()
@@ -166,12 +394,36 @@ class MetricsCollector:
             ) * 100,
             'chat_response_rate': self.chat_metrics.response_rate * 100,
             'unique_users': len(self.chat_metrics.unique_users),
+            'dropped_overflow': self.chat_metrics.dropped_overflow,
+            'dropped_stale': self.chat_metrics.dropped_stale,
+            'dropped_rate_limited': self.chat_metrics.dropped_rate_limited,
+            'gpt_rate_limit_shed': self.gpt_metrics.rate_limit_shed,
+            'coalesced_comments': self.chat_metrics.coalesced_comments,
+            'routed_locally': self.chat_metrics.routed_locally,
+            'routed_suppressed': self.chat_metrics.routed_suppressed,
+            'max_group_size': self.chat_metrics.max_group_size,
             'cache_hit_rate': (
                 self.audio_metrics.cache_hits
                 / max(1, self.audio_metrics.total_generations)
             ) * 100,
+            'gpt_cache_hit_rate': (
+                self.gpt_metrics.cache_hits
+                / max(1, self.gpt_metrics.cache_hits + self.gpt_metrics.cache_misses)
+            ) * 100,
+            'gpt_semantic_cache_hits': self.gpt_metrics.semantic_cache_hits,
+            'gpt_hedge_rate': (
+                self.hedge_metrics.hedged_calls
+                / max(1, self.hedge_metrics.eligible_calls)
+            ) * 100,
+            'gpt_hedge_win_rate': (
+                self.hedge_metrics.hedge_wins
+                / max(1, self.hedge_metrics.hedged_calls)
+            ) * 100,
+            'gpt_hedge_delay': self.hedge_metrics.current_delay,
+            'gpt_tiers': self.get_tier_summary(),
             'average_gpt_latency': self.gpt_metrics.average_latency,
-            'average_tts_latency': self.tts_metrics.average_latency
+            'average_tts_latency': self.tts_metrics.average_latency,
+            'stage_latency': self.get_latency_summary()
         }
 
 # Create singleton instance
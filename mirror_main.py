@@ -2,18 +2,41 @@
 
 import time
 import random
+import asyncio
 import signal
 import sys
+import threading
 from typing import Optional
 from dataclasses import dataclass
+from config import config
 from chat_listener import chat_listener, Comment
+from coalescer import coalescer
+from comment_log import comment_log
+from answer_bank import answer_bank
+from intent_router import intent_router
+from scheduler import comment_scorer
+from metrics import metrics_collector
 from gpt_handler import gpt_handler
 from tts_handler import tts_handler
 from audio_player import audio_player
+from pipeline import pipeline
+
+# What to do with a comment
+REPLY = "reply"  # Generate a reply with GPT
+SPEAK = "speak"  # Speak a fixed reply
+PLAY = "play"  # Play a reply whose audio is already cached
+DROP = "drop"  # Don't answer
+
+@dataclass
+class CommentAction:
+    kind: str
+    text: Optional[str] = None  # The fixed reply, for SPEAK and PLAY
+    audio: Optional[str] = None  # Its audio file, for PLAY
 
 @dataclass
 class RewardConfig:
     interval: int = 10 * 60  # 10 minutes
+    retry_interval: int = 30  # Seconds before retrying a failed prompt
     prompts: list[str] = None
 
     def __post_init__(self):
@@ -30,7 +53,7 @@ class MirrorApp:
     def __init__(self):
         self.running = True
         self.reward_config = RewardConfig()
-        self.last_reward = time.time()
+        self.next_reward = time.monotonic() + self.reward_config.interval
         self._setup_signal_handlers()
 
     def _setup_signal_handlers(self):
@@ -38,69 +61,192 @@ class MirrorApp:
         def signal_handler(signum, frame):
             print("\n🌙 Mirror.exe is going to sleep...")
             self.running = False
+            # Wake the main loop from a helper thread; putting to the queue
+            # directly could deadlock if the main thread holds its lock.
+            threading.Thread(target=chat_listener.wake, daemon=True).start()
         
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
 
+    def _prepare_audio(self):
+        """
+        Warm up the audio cache with every static phrase (fallback, canned
+        and reward replies), so outages, trivial comments and reward
+        prompts never wait on TTS.
+        """
+        phrases = (gpt_handler.fallback_replies() + intent_router.canned_lines()
+                   + self.reward_config.prompts)
+        total = len(set(phrases))
+        missing = tts_handler.warm_up(phrases)
+        print(f"🔥 Warmed up {total - len(missing)}/{total} static phrases")
+        for phrase in missing:
+            print(f"Could not pre-synthesize: {phrase}")
+
+    def _route_comment(self, comment: Comment) -> CommentAction:
+        """
+        Decide how to answer a comment: a canned line for trivial intents,
+        a stored answer bank reply, nothing if it must be shed, or GPT.
+        """
+        print(f"👁️‍🗨️ @{comment.username}: {comment.text}")
+        intent, line = intent_router.route(comment.text)
+        if intent is not None:
+            metrics_collector.record_comment_routed(intent, line is not None)
+            if line is None:
+                return CommentAction(DROP)
+            print(f"🔮 Mirror replies ({intent}): {line}")
+            audio_path = tts_handler.cached_audio(line)
+            if audio_path is not None:
+                return CommentAction(PLAY, line, str(audio_path))
+            return CommentAction(SPEAK, line)
+        answer = answer_bank.match(comment.text)
+        if answer is not None:
+            print(f"📚 Mirror replies from the answer bank: {answer.text}")
+            return CommentAction(PLAY, answer.text, answer.audio)
+        if comment_scorer.should_shed(comment):
+            metrics_collector.record_comment_dropped('rate_limited')
+            return CommentAction(DROP)
+        return CommentAction(REPLY)
+
     def _handle_comment(self, comment: Comment) -> bool:
-        """Process a single comment. Returns True if successful."""
+        """Queue a single comment for a reply. Returns True if accepted."""
         try:
-            print(f"👁️‍🗨️ @{comment.username}: {comment.text}")
-            
-            # Generate response
-            reply = gpt_handler.ask_gpt(comment.text)
-            if not reply:
-                return False
-            print(f"✨ Mirror replies: {reply}")
-            
-            # Convert to speech
-            audio_path = tts_handler.speak_text(reply)
-            if not audio_path:
-                return False
-            
-            # Play audio
-            audio_player.play_audio(audio_path)
-            return True
+            action = self._route_comment(comment)
+            if action.kind == PLAY:
+                pipeline.submit_clip(comment, action.text, action.audio)
+            elif action.kind == SPEAK:
+                pipeline.submit_text(action.text, comment)
+            elif action.kind == REPLY:
+                pipeline.submit_comment(comment)
+            return action.kind != DROP
             
         except Exception as e:
             print(f"Error processing comment: {str(e)}")
             return False
 
     def _handle_reward(self) -> bool:
-        """Send a reward prompt. Returns True if successful."""
+        """Queue a reward prompt. Returns True if accepted."""
         try:
             nudge = random.choice(self.reward_config.prompts)
             print(f"💫 Reward prompt: {nudge}")
-            
-            audio_path = tts_handler.speak_text(nudge)
-            if not audio_path:
-                return False
-                
-            audio_player.play_audio(audio_path)
+            pipeline.submit_text(nudge)
             return True
             
         except Exception as e:
             print(f"Error processing reward: {str(e)}")
             return False
 
+    async def _handle_comment_async(self, comment: Comment) -> bool:
+        """Queue a single comment for a reply on the asyncio pipeline."""
+        try:
+            action = self._route_comment(comment)
+            if action.kind == PLAY:
+                pipeline.submit_clip(comment, action.text, action.audio)
+            elif action.kind == SPEAK:
+                await pipeline.submit_text(action.text, comment)
+            elif action.kind == REPLY:
+                await pipeline.submit_comment(comment)
+            return action.kind != DROP
+
+        except Exception as e:
+            print(f"Error processing comment: {str(e)}")
+            return False
+
+    async def _handle_reward_async(self) -> bool:
+        """Queue a reward prompt on the asyncio pipeline."""
+        try:
+            nudge = random.choice(self.reward_config.prompts)
+            print(f"💫 Reward prompt: {nudge}")
+            await pipeline.submit_text(nudge)
+            return True
+
+        except Exception as e:
+            print(f"Error processing reward: {str(e)}")
+            return False
+
+    async def _reward_loop(self):
+        """Fire reward prompts on their own deadline."""
+        while self.running:
+            await asyncio.sleep(max(0.0, self.next_reward - time.monotonic()))
+            if await self._handle_reward_async():
+                self.next_reward = time.monotonic() + self.reward_config.interval
+            else:
+                self.next_reward = time.monotonic() + self.reward_config.retry_interval
+
+    def _request_stop(self):
+        """Stop the asyncio runtime from a loop signal handler."""
+        print("\n🌙 Mirror.exe is going to sleep...")
+        self.running = False
+        chat_listener.wake()
+
+    async def run_async(self):
+        """
+        Main application loop for asyncio mode. The TikTok client, the
+        pipeline stages, playback and the reward timer share one event loop.
+        """
+        print("🌟 Mirror.exe awakening... Starting asyncio runtime.")
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self._request_stop)
+            except NotImplementedError:
+                pass  # Windows keeps the handlers from _setup_signal_handlers
+
+        # Nothing else is running yet, so blocking here is harmless
+        await tts_handler.preconnect_async()
+        self._prepare_audio()
+        await pipeline.start()
+        tasks = [
+            asyncio.create_task(chat_listener.run_async()),
+            asyncio.create_task(self._reward_loop())
+        ]
+
+        while self.running:
+            try:
+                comments = await chat_listener.get_comments_async(config.chat.max_batch_size)
+                for comment in coalescer.filter(comments):
+                    if not self.running:
+                        break
+                    await self._handle_comment_async(comment)
+
+            except Exception as e:
+                print(f"Error in main loop: {str(e)}")
+                await asyncio.sleep(1)  # Prevent rapid error loops
+
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        pipeline.clear()
+        audio_player.stop_current()
+        await pipeline.stop()
+        await tts_handler.close_async()
+        await gpt_handler.close_async()
+        self._cleanup()
+
     def run(self):
         """Main application loop."""
         print("🌟 Mirror.exe awakening... Starting main loop.")
+        tts_handler.preconnect()
+        self._prepare_audio()
         
         while self.running:
             try:
-                # Process any new comments
-                comment = chat_listener.get_new_comment()
-                if comment:
+                # Sleep until a comment arrives or the reward prompt is due,
+                # then drain everything already queued in one pass
+                timeout = max(0.0, self.next_reward - time.monotonic())
+                comments = chat_listener.get_comments(
+                    config.chat.max_batch_size, timeout=timeout
+                )
+                for comment in coalescer.filter(comments):
+                    if not self.running:
+                        break
                     self._handle_comment(comment)
 
                 # Check if it's time for a reward prompt
-                if time.time() - self.last_reward > self.reward_config.interval:
+                if self.running and time.monotonic() >= self.next_reward:
                     if self._handle_reward():
-                        self.last_reward = time.time()
-
-                # Small sleep to prevent CPU spinning
-                time.sleep(0.1)
+                        self.next_reward = time.monotonic() + self.reward_config.interval
+                    else:
+                        self.next_reward = time.monotonic() + self.reward_config.retry_interval
                 
             except Exception as e:
                 print(f"Error in main loop: {str(e)}")
@@ -111,12 +257,19 @@ class MirrorApp:
     def _cleanup(self):
         """Clean up resources before shutdown."""
         try:
+            # Clear any pending comments and in-flight jobs
+            chat_listener.clear_queue()
+            pipeline.clear()
+            
             # Stop any playing audio
             audio_player.stop_current()
             audio_player.clear_queue()
-            
-            # Clear any pending comments
-            chat_listener.clear_queue()
+
+            # Keep hot replies for the next session
+            gpt_handler.save_cache()
+            gpt_handler.close()
+            tts_handler.close()
+            comment_log.close()
             
         except Exception as e:
             print(f"Error during cleanup: {str(e)}")
@@ -126,4 +279,7 @@ class MirrorApp:
 
 if __name__ == "__main__":
     app = MirrorApp()
-    app.run()
+    if config.pipeline.mode == "asyncio":
+        asyncio.run(app.run_async())
+    else:
+        app.run()
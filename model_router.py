@@ -0,0 +1,82 @@
+# mirror_backend/model_router.py
+
+from dataclasses import dataclass
+from typing import List, Optional
+from config import config
+from reply_budget import Backlog
+from scheduler import comment_scorer
+from text_utils import normalize_text
+
+FAST = "fast"
+STRONG = "strong"
+
+# Words asking for reasoning rather than a quick remark
+REASONING_WORDS = {
+    "why", "how", "explain", "meaning", "mean", "future", "advice", "should",
+    "difference", "purpose", "truth", "destiny", "fate", "predict", "because",
+}
+
+@dataclass
+class ModelChoice:
+    tier: str
+    model: str
+    complexity: float  # 0-1 estimate the choice was based on
+    forced: bool = False  # Sent to the fast tier by the backlog, not the estimate
+
+class ModelRouter:
+    """
+    Picks a model tier per request from a cheap local estimate of how
+    complex the comment is. Simple comments go to the fast, cheap model
+    and only complex ones to the primary model. While speech falls behind,
+    with more generated audio waiting to play than routing_backlog_seconds,
+    everything takes the fast tier so the queue drains. Comments still
+    waiting for a reply don't count: a burst of them is what routing is for.
+    """
+    def __init__(self):
+        self.settings = config.gpt
+        self.models = {FAST: self.settings.fast_model, STRONG: self.settings.model}
+
+    def complexity(self, text: str) -> float:
+        """
+        Estimate (0-1) how much a comment needs the stronger model, from
+        its length, whether it is a question asking for reasoning, and
+        whether it is written in a non-Latin script.
+        """
+        words = normalize_text(text).split()
+        if not words:
+            return 0.0
+        score = 0.4 * min(1.0, len(words) / self.settings.routing_long_comment)
+        score += 0.3 * comment_scorer.question_likelihood(text)
+        if any(word in REASONING_WORDS for word in words):
+            score += 0.2
+        letters = [char for char in text if char.isalpha()]
+        # Cheap models answer noticeably worse outside English
+        if letters and sum(not char.isascii() for char in letters) / len(letters) > 0.3:
+            score += 0.45
+        return min(1.0, score)
+
+    def choose(self, prompts: List[str], backlog: Optional[Backlog] = None) -> ModelChoice:
+        """Pick the tier for a request answering `prompts` given the reply backlog."""
+        if not self.settings.routing_enabled or not self.settings.fast_model:
+            return ModelChoice(STRONG, self.models[STRONG], 1.0)
+        # A batch takes the tier its hardest comment needs
+        complexity = max((self.complexity(prompt) for prompt in prompts), default=0.0)
+        if backlog is not None and backlog.generated_seconds >= self.settings.routing_backlog_seconds:
+            return ModelChoice(FAST, self.models[FAST], complexity, forced=True)
+        tier = STRONG if complexity >= self.settings.complexity_threshold else FAST
+        return ModelChoice(tier, self.models[tier], complexity)
+
+    def tier_of(self, model: str) -> str:
+        """The tier a model serves, or the model name for one outside both tiers."""
+        if model == self.models[STRONG]:
+            return STRONG
+        if model == self.models[FAST]:
+            return FAST
+        return model
+
+    def cost(self, model: str, tokens: int) -> float:
+        """Estimated USD cost of `tokens` tokens on a model."""
+        return tokens / 1000 * self.settings.token_costs.get(model, 0.0)
+
+# Create singleton instance
+model_router = ModelRouter()
@@ -0,0 +1,114 @@
+# mirror_backend/mp3_frames.py
+
+from typing import List, Optional
+
+# Layer III bitrates in kbps by bitrate index, for MPEG-1 and MPEG-2/2.5
+BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0],
+}
+
+# Sample rates in Hz by sample rate index, keyed by the header's version bits
+SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG-1
+    2: [22050, 24000, 16000],  # MPEG-2
+    0: [11025, 12000, 8000],  # MPEG-2.5
+}
+
+def _id3v2_size(data: bytes, offset: int) -> int:
+    """Length of an ID3v2 tag starting at offset, or 0 if there is none."""
+    if data[offset:offset + 3] != b"ID3" or len(data) < offset + 10:
+        return 0
+    size = 0
+    for byte in data[offset + 6:offset + 10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[offset + 5] & 0x10 else 0
+    return 10 + size + footer
+
+def frame_length(data: bytes, offset: int) -> Optional[int]:
+    """Length of the Layer III frame whose header starts at offset, or None if there isn't one."""
+    if len(data) < offset + 4:
+        return None
+    b1, b2 = data[offset + 1], data[offset + 2]
+    if data[offset] != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 0x03
+    layer = (b1 >> 1) & 0x03
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0x03
+    if version not in SAMPLE_RATES or layer != 1 or rate_index == 3:
+        return None
+    bitrate = BITRATES[1 if version == 3 else 2][bitrate_index]
+    if bitrate == 0:
+        return None  # Free-format and invalid bitrates can't be walked
+    sample_rate = SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 0x01
+    samples = 144 if version == 3 else 72
+    return samples * bitrate * 1000 // sample_rate + padding
+
+def _is_info_frame(frame: bytes) -> bool:
+    """Whether a frame is a Xing/Info header, which describes one file's length and nothing else."""
+    return b"Xing" in frame[:64] or b"Info" in frame[:64]
+
+class FrameReader:
+    """
+    Extracts the audio frames of an MP3 clip that arrives in chunks,
+    without ID3 tags or a Xing/Info header frame. Bytes that aren't a
+    frame are skipped until the next frame header; a trailing partial
+    frame is dropped.
+    """
+    def __init__(self):
+        self._buffer = b""
+        self._past_tag = False  # Past any leading ID3v2 tag
+        self._first = True  # The next frame is the clip's first
+
+    def feed(self, chunk: bytes) -> bytes:
+        """Add a chunk and return the complete audio frames it finished."""
+        data = self._buffer + chunk
+        offset = 0
+        if not self._past_tag:
+            if data[:3] == b"ID3"[:len(data)] and len(data) < 10:
+                self._buffer = data
+                return b""  # Not enough to tell whether a tag starts here
+            offset = _id3v2_size(data, 0)
+            if offset > len(data):
+                self._buffer = data
+                return b""
+            self._past_tag = True
+
+        frames = []
+        while len(data) - offset >= 4:
+            if data[offset:offset + 3] == b"TAG" and len(data) - offset <= 128:
+                break  # Possibly an ID3v1 tag at the end; wait for more or flush
+            length = frame_length(data, offset)
+            if length is None:
+                offset += 1
+                continue
+            if offset + length > len(data):
+                break  # Wait for the rest of the frame
+            frame = data[offset:offset + length]
+            if not (self._first and _is_info_frame(frame)):
+                frames.append(frame)
+            self._first = False
+            offset += length
+        self._buffer = data[offset:]
+        return b"".join(frames)
+
+    def flush(self) -> bytes:
+        """End the clip. Whatever is left is a partial frame or a tag, so nothing is returned."""
+        self._buffer = b""
+        return b""
+
+def audio_frames(data: bytes) -> bytes:
+    """The audio frames of a whole MP3 file, without ID3 tags or a Xing/Info header frame."""
+    reader = FrameReader()
+    return reader.feed(data) + reader.flush()
+
+def concat_mp3(parts: List[bytes]) -> bytes:
+    """
+    Join MP3 clips into one playable stream without re-encoding. Clips
+    must share a sample rate, as clips from one TTS voice do.
+    """
+    if len(parts) == 1:
+        return parts[0]
+    return b"".join(audio_frames(part) for part in parts)
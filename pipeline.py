@@ -0,0 +1,456 @@
+# mirror_backend/pipeline.py
+
+import time
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from queue import Queue, Empty
+from typing import Optional, Dict, Callable, List, Union
+from dataclasses import dataclass, field
+from config import config
+from audio_stream import AudioStream
+from cache_manager import cache_manager
+from chat_listener import Comment
+from reply_budget import reply_budget, Backlog
+from resilience import Deadline
+from tracing import Trace
+from gpt_handler import gpt_handler
+from tts_handler import tts_handler
+from audio_player import audio_player
+
+@dataclass
+class Job:
+    seq: int
+    comment: Optional[Comment] = None
+    reply: Optional[str] = None
+    # Synthesized audio per reply segment: a file, a stream still
+    # downloading, or None where synthesis failed
+    segments: Dict[int, Union[str, AudioStream, None]] = field(default_factory=dict)
+    segment_count: Optional[int] = None  # Known once the whole reply is generated
+    released: int = 0  # Segments already handed to the player
+    # Time budget for generating the whole reply, from submission
+    deadline: Deadline = field(default_factory=lambda: Deadline(config.resilience.comment_budget))
+
+    @property
+    def trace(self) -> Optional[Trace]:
+        """The originating comment's trace, if any."""
+        return self.comment.trace if self.comment else None
+
+@dataclass
+class Segment:
+    job: Job
+    index: int
+    text: str
+
+class BasePipeline(ABC):
+    """
+    Job numbering and in-order release shared by both pipelines.
+    A reply is one segment, or one segment per sentence when streaming.
+    Segments go to the player as soon as they and everything before them
+    are ready, so a streamed reply starts playing before it is finished.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next_seq = 0
+        self._jobs: Dict[int, Job] = {}  # In-flight jobs by seq
+        self._next_release = 0
+        # Estimated seconds of released, unplayed clips. Clips are cache
+        # files played in place, so the same file can be queued twice.
+        self._queued_audio: Dict[Union[str, AudioStream], List[float]] = {}
+        # Pipe TTS audio into the player while it downloads
+        self.stream_audio = config.pipeline.stream_audio and audio_player.can_stream
+
+    def _new_job(self, **kwargs) -> Job:
+        """Create and register a job with the next sequence number."""
+        with self._lock:
+            job = Job(seq=self._next_seq, **kwargs)
+            self._jobs[job.seq] = job
+            self._next_seq += 1
+        return job
+
+    def submit_clip(self, comment: Comment, text: str, audio_path: str):
+        """
+        Queue a reply whose audio already exists, skipping GPT and TTS.
+        The clip is played in place.
+        """
+        job = self._new_job(comment=comment, reply=text)
+        self._segment_done(Segment(job, 0, text), audio_path)
+        self._reply_done(job, 1)
+
+    def backlog(self) -> Backlog:
+        """
+        Replies submitted but not yet fully handed to the player, and the
+        audio still to play: clips waiting for the player, replies waiting
+        for speech and replies not generated yet.
+        """
+        with self._lock:
+            generated = sum(sum(clips) for clips in self._queued_audio.values())
+            pending = 0.0
+            for job in self._jobs.values():
+                if job.released:
+                    continue  # Its audio so far is already counted in the player queue
+                if job.reply is not None:
+                    generated += reply_budget.speech_seconds(job.reply)
+                else:
+                    pending += reply_budget.expected_seconds()
+            return Backlog(replies=len(self._jobs), audio_seconds=generated + pending,
+                           generated_seconds=generated)
+
+    def _segment_done(self, segment: Segment, audio: Union[str, AudioStream, None]):
+        """Record a synthesized (or failed) segment."""
+        if isinstance(audio, str):
+            # Clips play from the audio cache; keep eviction off them until played
+            cache_manager.hold(audio)
+        with self._lock:
+            segment.job.segments[segment.index] = audio
+            self._release()
+
+    def _reply_done(self, job: Job, segment_count: int):
+        """Record that a job's reply is complete with `segment_count` segments."""
+        with self._lock:
+            job.segment_count = segment_count
+            self._release()
+
+    def _release(self):
+        """Hand ready segments to the player in order. Caller holds the lock."""
+        while self._next_release in self._jobs:
+            job = self._jobs[self._next_release]
+            while job.released in job.segments:
+                audio = job.segments.pop(job.released)
+                job.released += 1
+                if audio:
+                    if job.trace is not None:
+                        job.trace.mark("enqueued")
+                    if isinstance(audio, AudioStream):
+                        seconds = reply_budget.speech_seconds(audio.text)
+                    else:
+                        seconds = reply_budget.clip_seconds(audio)
+                    self._queued_audio.setdefault(audio, []).append(seconds)
+                    self._play(audio, job.trace)
+            if job.segment_count is None or job.released < job.segment_count:
+                break
+            del self._jobs[self._next_release]
+            self._next_release += 1
+
+    @abstractmethod
+    def _play(self, audio: Union[str, AudioStream], trace: Optional[Trace]):
+        """Queue a released clip for playback."""
+
+    def _clip_done(self, audio: Union[str, AudioStream]):
+        """Stop counting a clip in the backlog once it has played or been dropped."""
+        if isinstance(audio, str):
+            cache_manager.release(audio)
+        with self._lock:
+            clips = self._queued_audio.get(audio)
+            if clips:
+                clips.pop()
+                if not clips:
+                    del self._queued_audio[audio]
+
+class Pipeline(BasePipeline):
+    """
+    GPT -> TTS -> playback as separate stages, each with its own worker
+    pool and a bounded queue in front of it. Jobs are numbered on entry
+    and released to the player strictly in that order.
+    """
+    def __init__(self):
+        super().__init__()
+        self.gpt_queue: Queue = Queue(maxsize=config.pipeline.gpt_queue_size)
+        self.tts_queue: Queue = Queue(maxsize=config.pipeline.tts_queue_size)
+        self._start_workers(self._gpt_worker, config.pipeline.gpt_workers)
+        self._start_workers(self._tts_worker, config.pipeline.tts_workers)
+
+    def _start_workers(self, target: Callable, count: int):
+        """Start a pool of daemon worker threads for one stage."""
+        for _ in range(max(1, count)):
+            threading.Thread(target=target, daemon=True).start()
+
+    def submit_comment(self, comment: Comment):
+        """Queue a comment for a GPT reply. Blocks while the GPT stage is full."""
+        self.gpt_queue.put(self._new_job(comment=comment))
+
+    def submit_text(self, text: str, comment: Optional[Comment] = None):
+        """
+        Queue fixed text for speech, skipping the GPT stage. `comment` is
+        the comment it answers, if any, so its trace follows the reply.
+        """
+        job = self._new_job(comment=comment, reply=text)
+        self.tts_queue.put(Segment(job, 0, text))
+        self._reply_done(job, 1)
+
+    def _collect_batch(self, first: Job) -> List[Job]:
+        """Gather up to gpt_batch_size jobs arriving within the batch window."""
+        batch = [first]
+        deadline = time.monotonic() + config.pipeline.gpt_batch_window
+        while len(batch) < config.pipeline.gpt_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.gpt_queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _gpt_worker(self):
+        """Generate replies for queued comments."""
+        while True:
+            job = self.gpt_queue.get()
+            if config.pipeline.streaming:
+                try:
+                    self._stream_reply(job)
+                finally:
+                    self.gpt_queue.task_done()
+                continue
+
+            # Several comments per request when batching
+            batch = self._collect_batch(job)
+            try:
+                replies = gpt_handler.ask_gpt_batch(
+                    [job.comment.text for job in batch],
+                    [job.trace for job in batch],
+                    Deadline.earliest(*(job.deadline for job in batch)),
+                    backlog=self.backlog()
+                )
+            except Exception as e:
+                print(f"Error in GPT stage: {str(e)}")
+                replies = [None] * len(batch)
+            finally:
+                for _ in batch:
+                    self.gpt_queue.task_done()
+
+            for job, reply in zip(batch, replies):
+                job.reply = reply
+                if job.reply:
+                    print(f"✨ Mirror replies: {job.reply}")
+                    self.tts_queue.put(Segment(job, 0, job.reply))
+                    self._reply_done(job, 1)
+                else:
+                    self._reply_done(job, 0)
+
+    def _stream_reply(self, job: Job):
+        """Stream a reply, sending each sentence to TTS as soon as it's complete."""
+        sentences: List[str] = []
+        try:
+            for sentence in gpt_handler.stream_gpt(job.comment.text, job.trace, job.deadline,
+                                                   backlog=self.backlog()):
+                self.tts_queue.put(Segment(job, len(sentences), sentence))
+                sentences.append(sentence)
+        except Exception as e:
+            print(f"Error in GPT stage: {str(e)}")
+        finally:
+            job.reply = " ".join(sentences) or None
+            if job.reply:
+                print(f"✨ Mirror replies: {job.reply}")
+            self._reply_done(job, len(sentences))
+
+    def _tts_worker(self):
+        """Synthesize speech for queued reply segments."""
+        while True:
+            segment = self.tts_queue.get()
+            speak = tts_handler.speak_stream if self.stream_audio else tts_handler.speak_text
+            try:
+                audio = speak(
+                    segment.text, segment.job.trace,
+                    deadline=segment.job.deadline,
+                    # Fallback audio stands in for a whole reply, not mid-reply
+                    fallback=segment.index == 0
+                )
+            except Exception as e:
+                print(f"Error in TTS stage: {str(e)}")
+                audio = None
+            finally:
+                self.tts_queue.task_done()
+            self._segment_done(segment, audio)
+            if isinstance(audio, AudioStream):
+                # Download the rest while the player reads what has arrived
+                audio.pump()
+
+    def _play(self, audio: Union[str, AudioStream], trace: Optional[Trace]):
+        """Queue a released clip on the player thread."""
+        audio_player.play_audio(
+            audio,
+            on_complete=lambda: self._clip_done(audio),
+            trace=trace
+        )
+
+    def clear(self):
+        """Drop all queued work, keeping the release order consistent."""
+        while True:
+            try:
+                job = self.gpt_queue.get_nowait()
+            except Empty:
+                break
+            self.gpt_queue.task_done()
+            self._reply_done(job, 0)
+
+        while True:
+            try:
+                segment = self.tts_queue.get_nowait()
+            except Empty:
+                break
+            self.tts_queue.task_done()
+            self._segment_done(segment, None)
+
+class AsyncPipeline(BasePipeline):
+    """
+    Asyncio counterpart of Pipeline. Stage workers are tasks on the running
+    event loop instead of threads, so in-flight requests don't each need a
+    thread. Call start() from inside the loop before submitting work.
+    """
+    def __init__(self):
+        super().__init__()
+        self.gpt_queue: asyncio.Queue = asyncio.Queue(maxsize=config.pipeline.gpt_queue_size)
+        self.tts_queue: asyncio.Queue = asyncio.Queue(maxsize=config.pipeline.tts_queue_size)
+        self.play_queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        """Start the stage workers and the player on the running loop."""
+        for _ in range(max(1, config.pipeline.gpt_workers)):
+            self._tasks.append(asyncio.create_task(self._gpt_worker()))
+        for _ in range(max(1, config.pipeline.tts_workers)):
+            self._tasks.append(asyncio.create_task(self._tts_worker()))
+        self._tasks.append(asyncio.create_task(self._player()))
+
+    async def stop(self):
+        """Cancel all stage workers."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    async def submit_comment(self, comment: Comment):
+        """Queue a comment for a GPT reply. Waits while the GPT stage is full."""
+        await self.gpt_queue.put(self._new_job(comment=comment))
+
+    async def submit_text(self, text: str, comment: Optional[Comment] = None):
+        """Queue fixed text for speech, skipping the GPT stage. See Pipeline.submit_text."""
+        job = self._new_job(comment=comment, reply=text)
+        await self.tts_queue.put(Segment(job, 0, text))
+        self._reply_done(job, 1)
+
+    async def _collect_batch(self, first: Job) -> List[Job]:
+        """Gather up to gpt_batch_size jobs arriving within the batch window."""
+        batch = [first]
+        deadline = time.monotonic() + config.pipeline.gpt_batch_window
+        while len(batch) < config.pipeline.gpt_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.gpt_queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _gpt_worker(self):
+        """Generate replies for queued comments."""
+        while True:
+            job = await self.gpt_queue.get()
+            if config.pipeline.streaming:
+                try:
+                    await self._stream_reply(job)
+                finally:
+                    self.gpt_queue.task_done()
+                continue
+
+            # Several comments per request when batching
+            batch = await self._collect_batch(job)
+            try:
+                replies = await gpt_handler.ask_gpt_batch_async(
+                    [job.comment.text for job in batch],
+                    [job.trace for job in batch],
+                    Deadline.earliest(*(job.deadline for job in batch)),
+                    backlog=self.backlog()
+                )
+            except Exception as e:
+                print(f"Error in GPT stage: {str(e)}")
+                replies = [None] * len(batch)
+            finally:
+                for _ in batch:
+                    self.gpt_queue.task_done()
+
+            for job, reply in zip(batch, replies):
+                job.reply = reply
+                if job.reply:
+                    print(f"✨ Mirror replies: {job.reply}")
+                    await self.tts_queue.put(Segment(job, 0, job.reply))
+                    self._reply_done(job, 1)
+                else:
+                    self._reply_done(job, 0)
+
+    async def _stream_reply(self, job: Job):
+        """Stream a reply, sending each sentence to TTS as soon as it's complete."""
+        sentences: List[str] = []
+        try:
+            async for sentence in gpt_handler.stream_gpt_async(job.comment.text, job.trace, job.deadline,
+                                                               backlog=self.backlog()):
+                await self.tts_queue.put(Segment(job, len(sentences), sentence))
+                sentences.append(sentence)
+        except Exception as e:
+            print(f"Error in GPT stage: {str(e)}")
+        finally:
+            job.reply = " ".join(sentences) or None
+            if job.reply:
+                print(f"✨ Mirror replies: {job.reply}")
+            self._reply_done(job, len(sentences))
+
+    async def _tts_worker(self):
+        """Synthesize speech for queued reply segments."""
+        while True:
+            segment = await self.tts_queue.get()
+            speak = tts_handler.speak_stream_async if self.stream_audio else tts_handler.speak_text_async
+            try:
+                audio = await speak(
+                    segment.text, segment.job.trace,
+                    deadline=segment.job.deadline,
+                    # Fallback audio stands in for a whole reply, not mid-reply
+                    fallback=segment.index == 0
+                )
+            except Exception as e:
+                print(f"Error in TTS stage: {str(e)}")
+                audio = None
+            finally:
+                self.tts_queue.task_done()
+            self._segment_done(segment, audio)
+            if isinstance(audio, AudioStream):
+                # Download the rest while the player reads what has arrived
+                await audio.pump_async()
+
+    def _play(self, audio: Union[str, AudioStream], trace: Optional[Trace]):
+        """Queue a released clip for the player task."""
+        self.play_queue.put_nowait((audio, trace))
+
+    async def _player(self):
+        """Play released clips one at a time."""
+        while True:
+            audio, trace = await self.play_queue.get()
+            try:
+                if isinstance(audio, AudioStream):
+                    await audio_player.play_stream_async(audio, trace)
+                else:
+                    await audio_player.play_audio_file_async(audio, trace)
+            finally:
+                self._clip_done(audio)
+                self.play_queue.task_done()
+
+    def clear(self):
+        """Drop all queued work and clips, keeping the release order consistent."""
+        while not self.gpt_queue.empty():
+            job = self.gpt_queue.get_nowait()
+            self.gpt_queue.task_done()
+            self._reply_done(job, 0)
+
+        while not self.tts_queue.empty():
+            segment = self.tts_queue.get_nowait()
+            self.tts_queue.task_done()
+            self._segment_done(segment, None)
+
+        while not self.play_queue.empty():
+            audio, _ = self.play_queue.get_nowait()
+            self._clip_done(audio)
+            self.play_queue.task_done()
+
+# Create singleton instance
+pipeline = AsyncPipeline() if config.pipeline.mode == "asyncio" else Pipeline()
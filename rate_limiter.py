@@ -0,0 +1,136 @@
+# mirror_backend/rate_limiter.py
+
+import time
+import asyncio
+import threading
+from typing import Dict, List, Optional
+from config import config
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+# Rough characters per token for English text, and the per-message
+# framing tokens the chat format adds
+CHARS_PER_TOKEN = 4
+TOKENS_PER_MESSAGE = 4
+
+def estimate_tokens(messages: List[dict], max_tokens: int) -> int:
+    """Estimate the tokens a chat request will count against the TPM quota."""
+    prompt_chars = sum(len(message.get("content", "")) for message in messages)
+    return prompt_chars // CHARS_PER_TOKEN + TOKENS_PER_MESSAGE * len(messages) + max_tokens
+
+class RateLimitShed(Exception):
+    """Raised when a request would have to wait longer than allowed for quota."""
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a per-minute rate. Takes are
+    allowed to overdraw the bucket so a request larger than the burst
+    size still goes through once the bucket is full, and later takes
+    wait for the debt to be repaid.
+    """
+    def __init__(self, per_minute: float, burst_seconds: float):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float):
+        """Add the tokens earned since the last update."""
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be taken (0 if it can be taken now)."""
+        needed = min(amount, self.capacity) - self.level
+        return max(0.0, needed / self.rate)
+
+    def take(self, amount: float):
+        """Remove tokens, possibly going into debt."""
+        self.level -= amount
+
+    def drain(self):
+        """Empty the bucket, e.g. after the server reported a 429."""
+        self.level = min(self.level, 0.0)
+
+class RateLimiter:
+    """
+    Client-side limiter for the OpenAI requests-per-minute and
+    tokens-per-minute quotas. Requests wait until both buckets have room,
+    so throughput settles at the quota instead of bouncing off 429s.
+    A request that would wait longer than `max_wait` is shed instead.
+    """
+    def __init__(self):
+        self.settings = config.rate_limit
+        self.requests = TokenBucket(self.settings.requests_per_minute, self.settings.burst_seconds)
+        self.tokens = TokenBucket(self.settings.tokens_per_minute, self.settings.burst_seconds)
+        self._lock = threading.Lock()
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Take quota if both buckets have room. Returns 0 on success, else the wait."""
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+            if wait == 0:
+                self.requests.take(1)
+                self.tokens.take(tokens)
+            return wait
+
+    def acquire(self, tokens: int, max_wait: Optional[float] = None):
+        """Block until quota for one request of `tokens` is available."""
+        if not self.settings.enabled:
+            return
+        max_wait = self.settings.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait == 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimitShed(f"no quota within {max_wait:.1f}s")
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int, max_wait: Optional[float] = None):
+        """Async version of acquire that waits without blocking the event loop."""
+        if not self.settings.enabled:
+            return
+        max_wait = self.settings.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self._try_acquire(tokens)
+            if wait == 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimitShed(f"no quota within {max_wait:.1f}s")
+            await asyncio.sleep(wait)
+
+    def record_usage(self, estimated: int, actual: int):
+        """Correct the token bucket once a response reports its real usage."""
+        with self._lock:
+            self.tokens.take(actual - estimated)
+
+    def record_rate_limited(self):
+        """The server returned a 429 anyway; stop sending until quota refills."""
+        with self._lock:
+            self.requests.drain()
+            self.tokens.drain()
+        logger.warning("OpenAI rate limit hit despite client-side limiting")
+
+    def headroom(self) -> Dict[str, float]:
+        """Fraction (0-1) of each bucket currently available."""
+        with self._lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            requests = max(0.0, self.requests.level / self.requests.capacity)
+            tokens = max(0.0, self.tokens.level / self.tokens.capacity)
+        return {
+            "requests": round(requests, 3),
+            "tokens": round(tokens, 3),
+            "overall": round(min(requests, tokens), 3),
+        }
+
+# Create singleton instance
+rate_limiter = RateLimiter()
@@ -0,0 +1,67 @@
+# mirror_backend/reply_budget.py
+
+import os
+from dataclasses import dataclass
+from typing import Optional
+from config import config
+
+# Rough tokens per English word, for turning a word budget into max_tokens
+TOKENS_PER_WORD = 1.4
+# Extra tokens so a reply near its word budget can finish its sentence
+TOKEN_MARGIN = 16
+
+@dataclass
+class Backlog:
+    replies: int = 0  # Replies submitted but not yet fully handed to the player
+    audio_seconds: float = 0.0  # Estimated audio still to play, generated or not
+    generated_seconds: float = 0.0  # Seconds of it from replies already generated
+
+@dataclass
+class ReplyLength:
+    words: int
+    max_tokens: int
+    instruction: str  # Appended to the system prompt; empty for no limit
+
+class ReplyBudget:
+    """
+    Sizes replies to the backlog. A new comment waits behind all audio
+    still pending, so as that wait approaches the latency SLO replies
+    shrink toward min_words, and when chat is quiet they grow back to
+    max_words. Shorter replies take less GPT, TTS and playback time,
+    which is what drains the backlog.
+    """
+    def __init__(self):
+        self.settings = config.reply_budget
+        self._words = self.settings.max_words  # Latest planned length
+
+    def speech_seconds(self, text: str) -> float:
+        """Estimated playback time of text."""
+        return len(text.split()) / self.settings.speech_rate
+
+    def clip_seconds(self, audio_path: str) -> float:
+        """Estimated playback time of an MP3 clip, from its size."""
+        try:
+            return os.path.getsize(audio_path) / self.settings.mp3_bytes_per_second
+        except OSError:
+            return 0.0
+
+    def expected_seconds(self) -> float:
+        """Estimated playback time of a reply that hasn't been generated yet."""
+        return self._words / self.settings.speech_rate
+
+    def plan(self, backlog: Optional[Backlog] = None) -> ReplyLength:
+        """Pick the length of the next reply given the current backlog."""
+        settings = self.settings
+        if not settings.enabled:
+            return ReplyLength(settings.max_words, config.gpt.max_tokens, "")
+
+        load = 0.0
+        if backlog is not None:
+            load = min(1.0, backlog.audio_seconds / settings.latency_slo)
+        words = round(settings.max_words - (settings.max_words - settings.min_words) * load)
+        self._words = words
+        max_tokens = min(config.gpt.max_tokens, int(words * TOKENS_PER_WORD) + TOKEN_MARGIN)
+        return ReplyLength(words, max_tokens, f"Keep each reply under {words} words.")
+
+# Create singleton instance
+reply_budget = ReplyBudget()
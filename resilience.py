@@ -0,0 +1,213 @@
+# mirror_backend/resilience.py
+
+import time
+import random
+import asyncio
+import threading
+from typing import Optional, Callable, Awaitable, Tuple, Type, TypeVar
+from config import config
+from logging_config import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+class DeadlineExceeded(Exception):
+    """Raised when a comment's time budget runs out before a call succeeds."""
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a service whose circuit is open."""
+
+class Deadline:
+    """Total time budget for everything done on behalf of one comment."""
+    def __init__(self, budget: float):
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        """Seconds left, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() == 0.0
+
+    @staticmethod
+    def earliest(*deadlines: Optional["Deadline"]) -> Optional["Deadline"]:
+        """The tightest of several deadlines, ignoring None."""
+        return min((d for d in deadlines if d is not None),
+                   key=lambda d: d.expires_at, default=None)
+
+class CircuitBreaker:
+    """
+    Stops calling a failing service. After `failure_threshold` consecutive
+    failures the circuit opens and calls fail fast. Once `reset_timeout`
+    has passed, single probe calls are let through (half-open); after
+    `success_threshold` probes in a row succeed the circuit closes again.
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float,
+                 success_threshold: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.success_threshold = success_threshold
+        self.state = self.CLOSED
+        self._failures = 0
+        self._successes = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """Whether a call may go out now. A True in half-open state claims the probe."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+                self._successes = 0
+                logger.info(f"{self.name} circuit half-open, probing")
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self):
+        """Report a successful call."""
+        with self._lock:
+            self._failures = 0
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+                self._successes += 1
+                if self._successes >= self.success_threshold:
+                    self.state = self.CLOSED
+                    logger.info(f"{self.name} circuit closed")
+
+    def record_failure(self):
+        """Report a failed call."""
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"{self.name} circuit opened after {self._failures} failures")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def release_probe(self):
+        """Give up a claimed probe without a verdict, e.g. on a local error."""
+        with self._lock:
+            self._probe_in_flight = False
+
+class RetryPolicy:
+    """
+    Retries a call with jittered exponential backoff, but only while the
+    caller's deadline leaves room for another attempt, and never while
+    the service's circuit is open. Each attempt is handed its own timeout,
+    capped by what is left of the deadline.
+    """
+    def __init__(self, breaker: CircuitBreaker, max_attempts: int, base_delay: float,
+                 max_delay: float, attempt_timeout: float,
+                 give_up_on: Tuple[Type[BaseException], ...] = ()):
+        self.breaker = breaker
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        # Errors that are not the service's fault: raised at once, not counted
+        self.give_up_on = give_up_on
+
+    def _attempt_timeout(self, deadline: Optional[Deadline]) -> float:
+        """Timeout for the next attempt, or raise if the deadline is spent."""
+        if deadline is None:
+            return self.attempt_timeout
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(f"{self.breaker.name}: comment budget spent")
+        return min(self.attempt_timeout, remaining)
+
+    def _backoff(self, attempt: int, deadline: Optional[Deadline]) -> Optional[float]:
+        """Delay before the next attempt, or None if there is no time for one."""
+        if attempt + 1 >= self.max_attempts or self.breaker.state == CircuitBreaker.OPEN:
+            return None
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.uniform(0.5, 1.0)
+        # Not worth retrying if the attempt after the wait would get under a second
+        if deadline is not None and deadline.remaining() - delay < 1.0:
+            return None
+        return delay
+
+    def _check_circuit(self):
+        if not self.breaker.allow_request():
+            raise CircuitOpenError(f"{self.breaker.name} circuit is open")
+
+    def call(self, fn: Callable[[float], T], deadline: Optional[Deadline] = None) -> T:
+        """Call fn(timeout) until it succeeds, the attempts run out or the deadline passes."""
+        attempt = 0
+        while True:
+            self._check_circuit()
+            try:
+                result = fn(self._attempt_timeout(deadline))
+            except self.give_up_on:
+                self.breaker.release_probe()
+                raise
+            except DeadlineExceeded:
+                self.breaker.release_probe()
+                raise
+            except Exception:
+                self.breaker.record_failure()
+                delay = self._backoff(attempt, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def call_async(self, fn: Callable[[float], Awaitable[T]],
+                         deadline: Optional[Deadline] = None) -> T:
+        """Async version of call."""
+        attempt = 0
+        while True:
+            self._check_circuit()
+            try:
+                result = await fn(self._attempt_timeout(deadline))
+            except self.give_up_on:
+                self.breaker.release_probe()
+                raise
+            except DeadlineExceeded:
+                self.breaker.release_probe()
+                raise
+            except Exception:
+                self.breaker.record_failure()
+                delay = self._backoff(attempt, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            return result
+
+def make_policy(name: str, give_up_on: Tuple[Type[BaseException], ...] = ()) -> RetryPolicy:
+    """Build a retry policy with its own circuit breaker from the resilience config."""
+    settings = config.resilience
+    breaker = CircuitBreaker(
+        name,
+        failure_threshold=settings.failure_threshold,
+        reset_timeout=settings.reset_timeout,
+        success_threshold=settings.success_threshold
+    )
+    return RetryPolicy(
+        breaker,
+        max_attempts=settings.max_attempts,
+        base_delay=settings.base_delay,
+        max_delay=settings.max_delay,
+        attempt_timeout=settings.attempt_timeout,
+        give_up_on=give_up_on
+    )
@@ -0,0 +1,128 @@
+# mirror_backend/response_cache.py
+
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+from logging_config import get_logger
+from text_utils import normalize_text
+
+logger = get_logger(__name__)
+
+# Rough per-entry bookkeeping overhead in bytes, on top of key and reply
+ENTRY_OVERHEAD = 100
+
+class ResponseCache:
+    """
+    In-process LRU cache of GPT replies with a TTL and a memory bound.
+    Optionally persisted to a JSON file so hot answers survive restarts.
+    """
+    def __init__(self, max_bytes: int, ttl_seconds: float,
+                 path: Optional[Path] = None, save_interval: int = 60):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.save_interval = save_interval
+        # key -> (reply, stored at); least recently used first
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.time()
+        self._load()
+
+    @staticmethod
+    def make_key(prompt: str, model: str, temperature: float, system_prompt: str) -> str:
+        """Build a cache key from the normalized prompt and the request settings."""
+        raw = json.dumps([normalize_text(prompt), model, temperature, system_prompt])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _entry_size(self, key: str, reply: str) -> int:
+        """Approximate memory used by one entry."""
+        return len(key) + len(reply.encode()) + ENTRY_OVERHEAD
+
+    def _remove(self, key: str):
+        """Drop an entry. Caller holds the lock."""
+        reply, _ = self._entries.pop(key)
+        self._size -= self._entry_size(key, reply)
+
+    def _insert(self, key: str, reply: str, stored_at: float):
+        """Add an entry and evict the least recently used ones over the bound."""
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (reply, stored_at)
+        self._size += self._entry_size(key, reply)
+        while self._size > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a fresh cached reply, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            reply, stored_at = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                self._remove(key)
+                self._dirty = True
+                return None
+            self._entries.move_to_end(key)
+            return reply
+
+    def put(self, key: str, reply: str):
+        """Cache a reply."""
+        with self._lock:
+            self._insert(key, reply, time.time())
+            self._dirty = True
+        self._check_save()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _check_save(self):
+        """Persist the cache if it changed and the save interval has passed."""
+        if self.path and self._dirty and time.time() - self._last_save >= self.save_interval:
+            self.save()
+
+    def save(self):
+        """Write the cache to disk, if persistence is enabled."""
+        if not self.path:
+            return
+        try:
+            with self._lock:
+                entries = [[key, reply, stored_at] for key, (reply, stored_at) in self._entries.items()]
+                self._dirty = False
+                self._last_save = time.time()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first so a crash can't leave half a cache
+            tmp_path = self.path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(entries))
+            tmp_path.replace(self.path)
+            logger.debug(f"Saved {len(entries)} cached responses")
+        except Exception as e:
+            logger.error(f"Error saving response cache: {str(e)}")
+
+    def _load(self):
+        """Load unexpired entries from disk, if persistence is enabled."""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            now = time.time()
+            with self._lock:
+                for key, reply, stored_at in json.loads(self.path.read_text()):
+                    if now - stored_at <= self.ttl_seconds:
+                        self._insert(key, reply, stored_at)
+            logger.debug(f"Loaded {len(self._entries)} cached responses")
+        except Exception as e:
+            logger.error(f"Error loading response cache: {str(e)}")
+
+    def clear(self):
+        """Drop all cached replies."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self._dirty = True
@@ -0,0 +1,81 @@
+# mirror_backend/scheduler.py
+
+import re
+import threading
+from typing import Dict, Set, TYPE_CHECKING
+from config import config
+from rate_limiter import rate_limiter
+
+if TYPE_CHECKING:
+    from chat_listener import Comment
+
+class CommentScorer:
+    """
+    Scores comments for the priority scheduler. The score combines the
+    viewer's recent event (gift or follow), whether this is their first
+    comment of the stream, and how likely the comment is a question.
+    Aging is applied by the comment buffer while the comment waits.
+    """
+    QUESTION_WORDS = {
+        "who", "what", "when", "where", "why", "how", "which",
+        "will", "would", "should", "could", "can", "do", "does",
+        "did", "is", "are", "am", "was", "shall"
+    }
+
+    def __init__(self):
+        self.settings = config.scheduler
+        self.event_weights: Dict[str, float] = {
+            "gift": self.settings.gift_weight,
+            "follow": self.settings.follow_weight,
+        }
+        self._seen_users: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def is_first_time(self, username: str) -> bool:
+        """Record a viewer and report whether this is their first comment."""
+        with self._lock:
+            if username in self._seen_users:
+                return False
+            self._seen_users.add(username)
+            return True
+
+    def question_likelihood(self, text: str) -> float:
+        """Cheap estimate (0-1) of how likely the text is a question."""
+        text = text.strip().lower()
+        if not text:
+            return 0.0
+        if "?" in text:
+            return 1.0
+        words = re.findall(r"[a-z']+", text)
+        if words and words[0] in self.QUESTION_WORDS:
+            return 0.8
+        if any(word in self.QUESTION_WORDS for word in words[1:3]):
+            return 0.3
+        return 0.0
+
+    def score(self, comment: "Comment") -> float:
+        """Compute the base priority of a comment."""
+        score = self.event_weights.get(comment.event_type, 0.0)
+        if comment.is_first_time:
+            score += self.settings.first_time_weight
+        score += self.settings.question_weight * self.question_likelihood(comment.text)
+        return score
+
+    def should_shed(self, comment: "Comment") -> bool:
+        """
+        Whether to drop a comment because GPT quota is nearly used up.
+        Only low-priority comments are shed, so supporters, first-timers
+        and questions are still answered while the quota recovers.
+        """
+        settings = config.rate_limit
+        if not settings.enabled or comment.priority >= settings.shed_min_priority:
+            return False
+        return rate_limiter.headroom()["overall"] < settings.shed_headroom
+
+    def reset(self):
+        """Forget seen viewers, e.g. at the start of a new stream."""
+        with self._lock:
+            self._seen_users.clear()
+
+# Create singleton instance
+comment_scorer = CommentScorer()
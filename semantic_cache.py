@@ -0,0 +1,250 @@
+# mirror_backend/semantic_cache.py
+
+import re
+import json
+import time
+import zlib
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+from logging_config import get_logger
+from text_utils import normalize_text, content_words, words_match
+
+logger = get_logger(__name__)
+
+# Common phrasings of the same question, rewritten to one form before
+# embedding since n-grams alone can't tell they mean the same thing.
+# Slang is expanded first so the phrase rule sees "are you going to".
+PHRASE_ALIASES = [
+    (re.compile(r"\bgonna\b"), "going to"),
+    (re.compile(r"\bwhats\b"), "what is"),
+    (re.compile(r"\bhows\b"), "how is"),
+    (re.compile(r"\bwhos\b"), "who is"),
+    (re.compile(r"\bu\b"), "you"),
+    (re.compile(r"\bur\b"), "your"),
+    (re.compile(r"\b(am|are|is) (i|you|we|they|he|she|it) going to\b"), r"will \2"),
+]
+
+# Whole words count more than trigrams so swapping one word ("rich" for
+# "poor") moves the vector further than a typo does
+WORD_WEIGHT = 2.0
+
+def canonicalize(text: str) -> str:
+    """Normalize text and rewrite common paraphrases to one form."""
+    text = normalize_text(text)
+    for pattern, replacement in PHRASE_ALIASES:
+        text = pattern.sub(replacement, text)
+    return text
+
+def embed(text: str, dim: int) -> np.ndarray:
+    """
+    Embed text as an L2-normalized hashed bag of word unigrams and
+    character trigrams. CPU-only and deterministic across runs, so
+    vectors stored on disk stay comparable.
+    """
+    words = canonicalize(text).split()
+    padded = f" {' '.join(words)} "
+    trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for features, weight in ((words, WORD_WEIGHT), (trigrams, 1.0)):
+        for feature in features:
+            h = zlib.crc32(feature.encode())
+            # The top bit picks a sign so hash collisions tend to cancel out
+            vector[h % dim] += weight if h & 0x80000000 else -weight
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def checksum(vector: np.ndarray) -> int:
+    """CRC of a stored vector, kept with its slot to spot rows rewritten since the last save."""
+    return zlib.crc32(np.ascontiguousarray(vector, dtype=np.float32).tobytes())
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache of GPT replies keyed by comment embeddings,
+    so paraphrased questions are answered from earlier replies. A vector
+    hit only counts if both comments have the same content words in the
+    same order, allowing typos: embeddings of comments that differ in
+    one word ("boyfriend" or "girlfriend", "1" or "11") score close.
+
+    Vectors live in a fixed-size memory-mapped matrix with one row per
+    slot; reply text and bookkeeping for each slot are kept in a JSON
+    sidecar. When every slot is taken the least recently used is reused.
+    """
+    def __init__(self, directory: Path, capacity: int, dim: int,
+                 threshold: float, ttl_seconds: float, word_similarity: float = 0.9,
+                 save_interval: int = 60):
+        self.directory = directory
+        self.capacity = capacity
+        self.dim = dim
+        self.threshold = threshold
+        self.word_similarity = word_similarity
+        self.ttl_seconds = ttl_seconds
+        self.save_interval = save_interval
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.time()
+        # Per-slot metadata; None marks a free slot
+        self._slots: List[Optional[Dict[str, Any]]] = [None] * capacity
+        # Mask of occupied slots, so empty rows never match
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._vectors = self._open_index()
+
+    @property
+    def _vectors_file(self) -> Path:
+        return self.directory / "vectors.f32"
+
+    @property
+    def _slots_file(self) -> Path:
+        return self.directory / "slots.json"
+
+    def _open_index(self) -> np.memmap:
+        """Map the vector file, reusing it if its shape matches the settings."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self._vectors_file.exists() and self._load_slots():
+            vectors = np.memmap(self._vectors_file, dtype=np.float32, mode="r+",
+                                shape=(self.capacity, self.dim))
+            self._verify_rows(vectors)
+            return vectors
+        return np.memmap(self._vectors_file, dtype=np.float32, mode="w+",
+                         shape=(self.capacity, self.dim))
+
+    def _load_slots(self) -> bool:
+        """Load slot metadata. Returns False if the index must be rebuilt."""
+        if not self._slots_file.exists():
+            return False
+        try:
+            data = json.loads(self._slots_file.read_text())
+            if data["capacity"] != self.capacity or data["dim"] != self.dim:
+                logger.info("Semantic cache settings changed, starting a new index")
+                return False
+            if self._vectors_file.stat().st_size != self.capacity * self.dim * 4:
+                return False
+
+            now = time.time()
+            for index, slot in enumerate(data["slots"]):
+                if slot is not None and now - slot["stored_at"] <= self.ttl_seconds:
+                    self._slots[index] = slot
+                    self._valid[index] = True
+            logger.debug(f"Loaded {int(self._valid.sum())} semantic cache entries")
+            return True
+        except Exception as e:
+            logger.error(f"Error loading semantic cache: {str(e)}")
+            return False
+
+    def _verify_rows(self, vectors: np.memmap):
+        """
+        Re-embed loaded slots whose row no longer matches the checksum
+        stored with them. put() writes vectors straight into the map but
+        metadata only on save, so after an unclean exit a reused row can
+        hold a newer prompt's vector next to the older reply.
+        """
+        repaired = 0
+        for index in np.flatnonzero(self._valid):
+            slot = self._slots[index]
+            if slot.get("checksum") == checksum(vectors[index]):
+                continue
+            vector = embed(slot["prompt"], self.dim)
+            vectors[index] = vector
+            slot["checksum"] = checksum(vector)
+            repaired += 1
+        if repaired:
+            vectors.flush()
+            self._dirty = True
+            logger.info(f"Repaired {repaired} semantic cache vectors left by an unclean exit")
+
+    def _free(self, index: int):
+        """Release a slot. Caller holds the lock."""
+        self._slots[index] = None
+        self._valid[index] = False
+        self._dirty = True
+
+    def get(self, prompt: str, settings: str) -> Optional[str]:
+        """
+        Return the reply of the most similar cached prompt asked under the
+        same settings, if it clears the similarity threshold and asks the
+        same thing word for word.
+        """
+        query = embed(prompt, self.dim)
+        words = content_words(canonicalize(prompt))
+        with self._lock:
+            if not self._valid.any():
+                return None
+            scores = self._vectors @ query
+            scores[~self._valid] = -1.0
+
+            now = time.time()
+            for index in np.argsort(scores)[::-1]:
+                if scores[index] < self.threshold:
+                    return None
+                slot = self._slots[index]
+                if now - slot["stored_at"] > self.ttl_seconds:
+                    self._free(index)
+                    continue
+                if slot["settings"] != settings:
+                    continue
+                if not words_match(words, content_words(canonicalize(slot["prompt"])),
+                                   self.word_similarity):
+                    continue
+                slot["last_used"] = now
+                return slot["reply"]
+        return None
+
+    def put(self, prompt: str, settings: str, reply: str):
+        """Cache a reply, evicting the least recently used entry if full."""
+        vector = embed(prompt, self.dim)
+        now = time.time()
+        with self._lock:
+            free = np.flatnonzero(~self._valid)
+            if len(free):
+                index = int(free[0])
+            else:
+                index = min(range(self.capacity), key=lambda i: self._slots[i]["last_used"])
+
+            self._vectors[index] = vector
+            self._slots[index] = {
+                "prompt": prompt,
+                "settings": settings,
+                "reply": reply,
+                "stored_at": now,
+                "last_used": now,
+                "checksum": checksum(vector),
+            }
+            self._valid[index] = True
+            self._dirty = True
+        self._check_save()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._valid.sum())
+
+    def _check_save(self):
+        """Persist the index if it changed and the save interval has passed."""
+        if self._dirty and time.time() - self._last_save >= self.save_interval:
+            self.save()
+
+    def save(self):
+        """Flush vectors and write slot metadata to disk."""
+        try:
+            with self._lock:
+                self._vectors.flush()
+                data = {"capacity": self.capacity, "dim": self.dim, "slots": self._slots}
+                payload = json.dumps(data)
+                self._dirty = False
+                self._last_save = time.time()
+            # Write to a temporary file first so a crash can't leave half an index
+            tmp_path = self._slots_file.with_suffix(".tmp")
+            tmp_path.write_text(payload)
+            tmp_path.replace(self._slots_file)
+            logger.debug("Semantic cache saved")
+        except Exception as e:
+            logger.error(f"Error saving semantic cache: {str(e)}")
+
+    def clear(self):
+        """Drop all cached replies."""
+        with self._lock:
+            self._slots = [None] * self.capacity
+            self._valid[:] = False
+            self._dirty = True
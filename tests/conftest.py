@@ -0,0 +1,31 @@
+import sys
+import types
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+def _install_test_config():
+    """
+    config.py builds its Config() from API credentials at import time.
+    Load the settings classes without that step and install a Config
+    with placeholder credentials and every other setting at its default.
+    """
+    path = ROOT / "config.py"
+    source = path.read_text(encoding="utf-8").split("# Create global config instance")[0]
+    module = types.ModuleType("config")
+    module.__file__ = str(path)
+    exec(compile(source, str(path), "exec"), module.__dict__)
+
+    api = module.APIConfig(
+        openai_api_key="test", elevenlabs_api_key="test",
+        voice_id="test", tiktok_username="test"
+    )
+    module.config = module.Config(api=api)
+    module.OPENAI_API_KEY = api.openai_api_key
+    module.ELEVENLABS_API_KEY = api.elevenlabs_api_key
+    module.VOICE_ID = api.voice_id
+    module.TIKTOK_USERNAME = api.tiktok_username
+    sys.modules["config"] = module
+
+_install_test_config()
@@ -0,0 +1,86 @@
+import json
+import numpy as np
+import pytest
+from answer_bank import (
+    AnswerBank, mine_intents, CURRENT_FILE, BANK_FILE, VECTORS_FILE, EXAMPLE_INTENTS_FILE
+)
+from semantic_cache import embed
+
+DIM = 512
+
+def write_bank(directory, intents, version="v1"):
+    """Write a bank version the way build_bank does, from {name: (examples, answers)}."""
+    version_dir = directory / version
+    version_dir.mkdir(parents=True)
+    data = {"version": version, "dim": DIM, "intents": []}
+    rows, owners = [], []
+    for index, (name, (examples, answers)) in enumerate(intents.items()):
+        data["intents"].append({
+            "name": name, "count": 10, "examples": examples,
+            "answers": [{"text": text, "audio": f"{index}_{i}.mp3"} for i, text in enumerate(answers)],
+        })
+        rows += [embed(example, DIM) for example in examples]
+        owners += [index] * len(examples)
+    (version_dir / BANK_FILE).write_text(json.dumps(data))
+    np.save(version_dir / VECTORS_FILE, np.stack(rows))
+    np.save(version_dir / EXAMPLE_INTENTS_FILE, np.array(owners, dtype=np.int32))
+    (directory / CURRENT_FILE).write_text(version)
+
+@pytest.fixture
+def bank(tmp_path):
+    write_bank(tmp_path, {
+        "will i be rich": (["will i be rich", "am i going to be rich"], ["Gold follows you.", "Wealth awaits."]),
+        "whats my future": (["whats my future"], ["The mist is parting."]),
+    })
+    bank = AnswerBank(tmp_path, threshold=0.9)
+    assert bank.load()
+    return bank
+
+def test_matching_comment_gets_a_banked_answer(bank, tmp_path):
+    answer = bank.match("Am I gonna be rich??")
+    assert answer.text in ("Gold follows you.", "Wealth awaits.")
+    assert answer.audio.startswith(str(tmp_path / "v1"))
+
+def test_unrelated_comment_misses(bank):
+    assert bank.match("tell me about the moon landing") is None
+
+def test_consecutive_matches_alternate_answers(bank):
+    texts = [bank.match("will i be rich").text for _ in range(4)]
+    assert all(a != b for a, b in zip(texts, texts[1:]))
+
+def test_single_answer_intent_repeats(bank):
+    assert bank.match("what's my future").text == bank.match("whats my future").text
+
+def test_missing_bank_matches_nothing(tmp_path):
+    bank = AnswerBank(tmp_path, threshold=0.9)
+    assert not bank.load()
+    assert bank.match("will i be rich") is None
+
+def test_current_file_picks_the_version(tmp_path):
+    write_bank(tmp_path, {"will i be rich": (["will i be rich"], ["Old answer."])}, version="v1")
+    write_bank(tmp_path, {"will i be rich": (["will i be rich"], ["New answer."])}, version="v2")
+    bank = AnswerBank(tmp_path, threshold=0.9)
+    assert bank.load()
+    assert bank.version == "v2"
+    assert bank.match("will i be rich").text == "New answer."
+
+def test_broken_version_does_not_load(tmp_path):
+    (tmp_path / CURRENT_FILE).write_text("missing")
+    bank = AnswerBank(tmp_path, threshold=0.9)
+    assert not bank.load()
+    assert bank.version is None
+
+def test_mining_groups_phrasings_led_by_the_commonest():
+    comments = (["will i be rich"] * 4 + ["Am I going to be rich?"] * 2
+                + ["whats my future"] * 3 + ["what is the moon made of"])
+    intents = mine_intents(comments, threshold=0.9, min_count=3, max_intents=10)
+    assert [(intent.name, intent.count) for intent in intents] == [
+        ("will i be rich", 6), ("whats my future", 3)
+    ]
+    # Both phrasings canonicalize alike, so they share one example
+    assert intents[0].examples == ["will i be rich"]
+
+def test_mining_keeps_the_most_frequent_intents():
+    comments = ["hello mirror"] * 5 + ["will i be rich"] * 3 + ["what is my purpose"] * 4
+    intents = mine_intents(comments, threshold=0.9, min_count=1, max_intents=2)
+    assert [intent.name for intent in intents] == ["hello mirror", "what is my purpose"]
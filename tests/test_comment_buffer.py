@@ -0,0 +1,171 @@
+import time
+import asyncio
+import threading
+import pytest
+from dataclasses import dataclass
+from typing import Optional
+import comment_buffer
+from comment_buffer import CommentBuffer, DROP_OLDEST, DROP_LOWEST_PRIORITY, RESERVOIR
+
+@dataclass
+class Comment:
+    """The fields of chat_listener.Comment the buffer uses."""
+    text: str
+    timestamp: float
+    priority: float = 0.0
+    max_age: Optional[float] = None
+
+    def is_stale(self, now: Optional[float] = None) -> bool:
+        if self.max_age is None:
+            return False
+        return (now or time.time()) - self.timestamp > self.max_age
+
+def comment(text: str, priority: float = 0.0, age: float = 0.0,
+            max_age: Optional[float] = None) -> Comment:
+    return Comment(text, time.time() - age, priority, max_age)
+
+def drain(buffer: CommentBuffer) -> list:
+    texts = []
+    while (item := buffer.get()) is not None:
+        texts.append(item.text)
+    return texts
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        CommentBuffer(4, policy="drop_newest")
+
+def test_fifo_order_without_prioritize():
+    buffer = CommentBuffer(4)
+    for text, priority in [("a", 1), ("b", 9), ("c", 5)]:
+        buffer.put(comment(text, priority))
+    assert drain(buffer) == ["a", "b", "c"]
+
+# Overflow policies
+
+def test_drop_oldest_evicts_the_earliest_arrival():
+    drops = []
+    buffer = CommentBuffer(2, DROP_OLDEST, on_drop=drops.append)
+    for text in "abc":
+        assert buffer.put(comment(text))
+    assert drain(buffer) == ["b", "c"]
+    assert drops == ["overflow"]
+    assert buffer.drop_counts["overflow"] == 1
+
+def test_drop_lowest_priority_evicts_the_lowest_comment():
+    buffer = CommentBuffer(2, DROP_LOWEST_PRIORITY, prioritize=True)
+    buffer.put(comment("low", 1))
+    buffer.put(comment("high", 5))
+    assert buffer.put(comment("mid", 3))
+    assert drain(buffer) == ["high", "mid"]
+
+def test_drop_lowest_priority_sheds_a_new_comment_no_better_than_the_worst():
+    buffer = CommentBuffer(2, DROP_LOWEST_PRIORITY, prioritize=True)
+    buffer.put(comment("a", 2))
+    buffer.put(comment("b", 5))
+    assert not buffer.put(comment("tie", 2))
+    assert not buffer.put(comment("lower", 1))
+    assert drain(buffer) == ["b", "a"]
+    assert buffer.drop_counts["overflow"] == 2
+
+def test_drop_lowest_priority_counts_aging():
+    # "old" has waited 20s at 0.5 points/s: effective priority 10
+    buffer = CommentBuffer(2, DROP_LOWEST_PRIORITY, prioritize=True, aging_rate=0.5)
+    buffer.put(comment("old", 0, age=20))
+    buffer.put(comment("fresh", 4))
+    assert buffer.put(comment("new", 6))
+    assert drain(buffer) == ["old", "new"]
+
+def test_reservoir_keeps_or_sheds_by_the_sample(monkeypatch):
+    buffer = CommentBuffer(2, RESERVOIR)
+    buffer.put(comment("a"))
+    buffer.put(comment("b"))
+    draws = iter([0, 2])
+    ranges = []
+    monkeypatch.setattr(comment_buffer.random, "randrange",
+                        lambda n: ranges.append(n) or next(draws))
+    assert buffer.put(comment("c"))  # Replaces slot 0
+    assert not buffer.put(comment("d"))  # Drawn outside the reservoir
+    assert ranges == [3, 4]  # max_size + comments offered since it filled
+    assert sorted(drain(buffer)) == ["b", "c"]
+
+def test_reservoir_sample_restarts_once_there_is_room(monkeypatch):
+    buffer = CommentBuffer(1, RESERVOIR)
+    ranges = []
+    monkeypatch.setattr(comment_buffer.random, "randrange", lambda n: ranges.append(n) or 0)
+    buffer.put(comment("a"))
+    buffer.put(comment("b"))
+    buffer.get()
+    buffer.put(comment("c"))
+    buffer.put(comment("d"))
+    assert ranges == [2, 2]
+
+# Priority and aging
+
+def test_prioritize_serves_highest_priority_first():
+    buffer = CommentBuffer(4, prioritize=True)
+    for text, priority in [("a", 1), ("b", 9), ("c", 5)]:
+        buffer.put(comment(text, priority))
+    assert drain(buffer) == ["b", "c", "a"]
+
+def test_aging_lets_a_long_wait_beat_a_higher_score():
+    buffer = CommentBuffer(4, prioritize=True, aging_rate=1.0)
+    buffer.put(comment("waited", 0, age=10))
+    buffer.put(comment("scored", 5))
+    assert drain(buffer) == ["waited", "scored"]
+
+def test_equal_priorities_are_served_in_arrival_order():
+    buffer = CommentBuffer(4, prioritize=True)
+    for text in "abc":
+        buffer.put(Comment(text, 1000.0, 2.0))
+    assert drain(buffer) == ["a", "b", "c"]
+
+# TTL
+
+def test_stale_comments_are_skipped_on_get():
+    drops = []
+    buffer = CommentBuffer(4, on_drop=drops.append)
+    buffer.put(comment("stale", age=61, max_age=60))
+    buffer.put(comment("fresh", age=59, max_age=60))
+    buffer.put(comment("forever", age=3600))
+    assert drain(buffer) == ["fresh", "forever"]
+    assert drops == ["stale"]
+
+def test_full_buffer_purges_stale_comments_before_shedding():
+    buffer = CommentBuffer(2, DROP_LOWEST_PRIORITY, prioritize=True)
+    buffer.put(comment("stale", 9, age=120, max_age=60))
+    buffer.put(comment("keep", 5))
+    assert buffer.put(comment("new", 1))
+    assert buffer.drop_counts == {"overflow": 0, "stale": 1}
+    assert drain(buffer) == ["keep", "new"]
+
+# Waiting
+
+def test_get_times_out_empty():
+    start = time.monotonic()
+    assert CommentBuffer(4).get(timeout=0.05) is None
+    assert time.monotonic() - start >= 0.05
+
+def test_get_wakes_on_put_from_another_thread():
+    buffer = CommentBuffer(4)
+    threading.Timer(0.02, buffer.put, [comment("late")]).start()
+    assert buffer.get(timeout=5).text == "late"
+
+def test_wake_releases_a_waiting_get():
+    buffer = CommentBuffer(4)
+    threading.Timer(0.02, buffer.wake).start()
+    assert buffer.get(timeout=5) is None
+
+def test_get_async_wakes_on_put_from_another_thread():
+    buffer = CommentBuffer(4)
+
+    async def main():
+        threading.Timer(0.02, buffer.put, [comment("late")]).start()
+        return await buffer.get_async(timeout=5)
+    assert asyncio.run(main()).text == "late"
+
+def test_clear_empties_the_buffer():
+    buffer = CommentBuffer(4)
+    buffer.put(comment("a"))
+    buffer.put(comment("b"))
+    assert buffer.clear() == 2
+    assert len(buffer) == 0
@@ -0,0 +1,126 @@
+import time
+import asyncio
+import threading
+import pytest
+from hedging import Hedger, LatencyTracker, timed, timed_async, PRIMARY, HEDGE
+
+@pytest.fixture
+def hedger():
+    hedger = Hedger(max_workers=4)
+    yield hedger
+    hedger.shutdown()
+
+def test_percentile_of_the_window():
+    tracker = LatencyTracker(window=100)
+    assert tracker.percentile(90) is None
+    for seconds in range(1, 101):
+        tracker.observe(float(seconds))
+    assert tracker.percentile(50) == 51.0
+    assert tracker.percentile(90) == 91.0
+    assert tracker.percentile(100) == 100.0
+
+def test_window_keeps_only_recent_samples():
+    tracker = LatencyTracker(window=3)
+    for seconds in [10.0, 1.0, 2.0, 3.0]:
+        tracker.observe(seconds)
+    assert len(tracker) == 3
+    assert tracker.percentile(100) == 3.0
+
+def test_fast_primary_sends_no_hedge(hedger):
+    hedged = []
+    result = hedger.run(lambda: "primary", lambda: hedged.append(1) or "hedge", delay=1.0)
+    assert result == ("primary", PRIMARY, False)
+    assert hedged == []
+
+def test_slow_primary_is_hedged_and_the_hedge_wins(hedger):
+    release = threading.Event()
+
+    def primary():
+        release.wait(5)
+        return "primary"
+    try:
+        assert hedger.run(primary, lambda: "hedge", delay=0.01) == ("hedge", HEDGE, True)
+    finally:
+        release.set()
+
+def test_primary_can_still_win_after_the_hedge_is_sent(hedger):
+    release = threading.Event()
+
+    def hedge():
+        release.wait(5)
+        return "hedge"
+
+    def primary():
+        time.sleep(0.05)
+        return "primary"
+    try:
+        assert hedger.run(primary, hedge, delay=0.01) == ("primary", PRIMARY, True)
+    finally:
+        release.set()
+
+def test_a_failure_waits_for_the_other_call(hedger):
+    def primary():
+        time.sleep(0.05)
+        raise RuntimeError("primary down")
+    assert hedger.run(primary, lambda: time.sleep(0.1) or "hedge", delay=0.01) == ("hedge", HEDGE, True)
+
+def test_error_is_raised_when_both_fail(hedger):
+    def fail():
+        time.sleep(0.02)
+        raise RuntimeError("down")
+    with pytest.raises(RuntimeError):
+        hedger.run(fail, fail, delay=0.01)
+
+def test_run_async_cancels_the_loser(hedger):
+    cancelled = []
+
+    async def primary():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(PRIMARY)
+            raise
+
+    async def hedge():
+        return "hedge"
+
+    async def main():
+        result = await hedger.run_async(primary, hedge, delay=0.01)
+        await asyncio.sleep(0)  # Let the cancellation land
+        return result
+    assert asyncio.run(main()) == ("hedge", HEDGE, True)
+    assert cancelled == [PRIMARY]
+
+def test_run_async_fast_primary_sends_no_hedge(hedger):
+    async def primary():
+        return "primary"
+
+    async def hedge():
+        raise AssertionError("hedge sent")
+    assert asyncio.run(hedger.run_async(primary, hedge, delay=1.0)) == ("primary", PRIMARY, False)
+
+def test_timed_records_successes_only():
+    tracker = LatencyTracker()
+    assert timed(lambda: "ok", tracker)() == "ok"
+
+    def fail():
+        raise RuntimeError("down")
+    with pytest.raises(RuntimeError):
+        timed(fail, tracker)()
+    assert len(tracker) == 1
+
+def test_timed_async_records_cancelled_calls():
+    tracker = LatencyTracker()
+
+    async def slow():
+        await asyncio.sleep(5)
+
+    async def main():
+        task = asyncio.ensure_future(timed_async(slow, tracker)())
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(main())
+    assert len(tracker) == 1
+    assert tracker.percentile(100) >= 0.02
@@ -0,0 +1,86 @@
+import pytest
+import intent_router as intent_router_module
+from config import config
+from intent_router import IntentRouter, CANNED_RESPONSES
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setattr(config.router, "enabled", True)
+    monkeypatch.setattr(config.router, "max_words", 4)
+    monkeypatch.setattr(config.router, "route_single_words", True)
+    monkeypatch.setattr(config.router, "cooldown", 15.0)
+    return IntentRouter()
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(intent_router_module.time, "monotonic", lambda: now[0])
+    return now
+
+@pytest.mark.parametrize("text, intent", [
+    ("hi", "greeting"),
+    ("Hello everyone!!", "greeting"),
+    ("good morning mirror", "greeting"),
+    ("hey hey", "greeting"),
+    ("love you so much", "love"),
+    ("LMAO", "laugh"),
+    ("thank you mirror", "thanks"),
+    ("good night all", "farewell"),
+    ("❤️❤️", "love"),
+    ("😂", "laugh"),
+    ("👋", "greeting"),
+    ("🔥🔥🔥", "emoji"),
+    ("???", "emoji"),
+    ("pizza", "single_word"),
+])
+def test_trivial_comments_are_classified(router, text, intent):
+    assert router.classify(text) == intent
+
+@pytest.mark.parametrize("text", [
+    "",
+    "why",  # A one-word question
+    "pizza?",
+    "hi mirror will i be rich",  # Longer than max_words
+    "hi what is my future",
+    "good question",  # "good" alone isn't a keyword
+    "love my job",
+])
+def test_substantive_comments_go_to_gpt(router, text):
+    assert router.classify(text) is None
+
+def test_max_words_counts_every_word(router, monkeypatch):
+    assert router.classify("hi hi hi hi hi") is None
+    monkeypatch.setattr(config.router, "max_words", 5)
+    assert router.classify("hi hi hi hi hi") == "greeting"
+
+def test_single_words_can_go_to_gpt(router, monkeypatch):
+    monkeypatch.setattr(config.router, "route_single_words", False)
+    assert router.classify("pizza") is None
+    assert router.classify("hello") == "greeting"
+
+def test_route_returns_a_canned_line(router, clock):
+    intent, line = router.route("hello")
+    assert intent == "greeting"
+    assert line in CANNED_RESPONSES["greeting"]
+
+def test_each_intent_answers_once_per_cooldown(router, clock):
+    assert router.route("hi")[1] is not None
+    clock[0] += 14.9
+    assert router.route("hello") == ("greeting", None)
+    assert router.route("lol")[1] is not None  # Other intents have their own cooldown
+    clock[0] += 0.1
+    assert router.route("hey")[1] is not None
+
+def test_consecutive_lines_differ(router, clock):
+    lines = []
+    for _ in range(10):
+        lines.append(router.route("hi")[1])
+        clock[0] += 15
+    assert all(a != b for a, b in zip(lines, lines[1:]))
+
+def test_disabled_router_routes_nothing(router, monkeypatch):
+    monkeypatch.setattr(config.router, "enabled", False)
+    assert router.route("hi") == (None, None)
+
+def test_non_trivial_comment_routes_to_gpt(router):
+    assert router.route("what does my future hold") == (None, None)
@@ -0,0 +1,62 @@
+import pytest
+from config import config
+from model_router import ModelRouter, FAST, STRONG
+from reply_budget import Backlog
+
+SIMPLE = "nice outfit"
+COMPLEX = "why do people lie to each other so much"
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setattr(config.gpt, "routing_enabled", True)
+    monkeypatch.setattr(config.gpt, "complexity_threshold", 0.45)
+    monkeypatch.setattr(config.gpt, "routing_backlog_seconds", 15.0)
+    return ModelRouter()
+
+def test_simple_comment_takes_the_fast_tier(router):
+    choice = router.choose([SIMPLE])
+    assert choice.tier == FAST
+    assert choice.model == config.gpt.fast_model
+    assert not choice.forced
+
+def test_reasoning_question_takes_the_strong_tier(router):
+    choice = router.choose([COMPLEX])
+    assert choice.tier == STRONG
+    assert choice.model == config.gpt.model
+
+def test_non_latin_comment_takes_the_strong_tier(router):
+    assert router.choose(["この先の私の未来はどうなりますか"]).tier == STRONG
+
+def test_threshold_is_inclusive(router, monkeypatch):
+    complexity = router.complexity(COMPLEX)
+    monkeypatch.setattr(config.gpt, "complexity_threshold", complexity)
+    assert router.choose([COMPLEX]).tier == STRONG
+    monkeypatch.setattr(config.gpt, "complexity_threshold", complexity + 0.01)
+    assert router.choose([COMPLEX]).tier == FAST
+
+def test_batch_takes_the_tier_of_its_hardest_comment(router):
+    choice = router.choose([SIMPLE, COMPLEX, "lol"])
+    assert choice.tier == STRONG
+    assert choice.complexity == router.complexity(COMPLEX)
+
+def test_comments_waiting_for_a_reply_do_not_force_the_fast_tier(router):
+    backlog = Backlog(replies=40, audio_seconds=120.0, generated_seconds=5.0)
+    choice = router.choose([COMPLEX], backlog)
+    assert choice.tier == STRONG
+    assert not choice.forced
+
+def test_unspoken_audio_forces_the_fast_tier(router):
+    choice = router.choose([COMPLEX], Backlog(replies=3, audio_seconds=15.0, generated_seconds=15.0))
+    assert choice.tier == FAST
+    assert choice.forced
+    assert choice.complexity == router.complexity(COMPLEX)
+
+def test_routing_disabled_always_takes_the_strong_tier(router, monkeypatch):
+    monkeypatch.setattr(config.gpt, "routing_enabled", False)
+    backlog = Backlog(generated_seconds=60.0)
+    assert router.choose([SIMPLE], backlog).tier == STRONG
+
+def test_tier_of(router):
+    assert router.tier_of(config.gpt.model) == STRONG
+    assert router.tier_of(config.gpt.fast_model) == FAST
+    assert router.tier_of("other-model") == "other-model"
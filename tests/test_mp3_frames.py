@@ -0,0 +1,132 @@
+import pytest
+from mp3_frames import FrameReader, audio_frames, concat_mp3, frame_length
+
+def header(version_bits: int = 3, bitrate_index: int = 9, rate_index: int = 0,
+           padding: int = 0) -> bytes:
+    """A Layer III frame header. Defaults: MPEG-1, 128 kbps, 44.1 kHz."""
+    b1 = 0xE0 | (version_bits << 3) | (1 << 1) | 1  # Layer III, no CRC
+    b2 = (bitrate_index << 4) | (rate_index << 2) | (padding << 1)
+    return bytes([0xFF, b1, b2, 0x00])
+
+def frame(fill: int, padding: int = 0, **kwargs) -> bytes:
+    """A whole frame of the given header settings, filled with one byte value."""
+    head = header(padding=padding, **kwargs)
+    return head + bytes([fill]) * (frame_length(head, 0) - 4)
+
+def info_frame(tag: bytes = b"Info") -> bytes:
+    """A frame carrying a Xing/Info header after the MPEG-1 stereo side info."""
+    data = bytearray(frame(0))
+    data[36:40] = tag
+    return bytes(data)
+
+def id3v2(body: bytes = b"TIT2 tag body", footer: bool = False) -> bytes:
+    """An ID3v2.4 tag with a syncsafe size, optionally with a footer."""
+    size = len(body)
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    flags = 0x10 if footer else 0x00
+    tag = b"ID3\x04\x00" + bytes([flags]) + syncsafe + body
+    if footer:
+        tag += b"3DI\x04\x00" + bytes([flags]) + syncsafe
+    return tag
+
+def id3v1() -> bytes:
+    return b"TAG" + b"title".ljust(125, b"\x00")
+
+# frame_length
+
+def test_mpeg1_frame_length():
+    assert frame_length(header(), 0) == 417  # 144 * 128000 / 44100
+    assert frame_length(header(padding=1), 0) == 418
+
+def test_mpeg1_48khz_frame_length():
+    assert frame_length(header(rate_index=1), 0) == 384  # 144 * 128000 / 48000
+
+def test_mpeg2_frame_length():
+    # MPEG-2, 64 kbps (index 8), 22.05 kHz: 72 * 64000 / 22050
+    assert frame_length(header(version_bits=2, bitrate_index=8), 0) == 208
+    assert frame_length(header(version_bits=2, bitrate_index=8, padding=1), 0) == 209
+
+def test_mpeg25_frame_length():
+    # MPEG-2.5, 32 kbps (index 4), 8 kHz: 72 * 32000 / 8000
+    assert frame_length(header(version_bits=0, bitrate_index=4, rate_index=2), 0) == 288
+
+@pytest.mark.parametrize("data", [
+    b"\xff\xfb\x90",  # Too short
+    b"\x00\xfb\x90\x00",  # No sync
+    header(version_bits=1),  # Reserved version
+    header(bitrate_index=0),  # Free format
+    header(bitrate_index=15),  # Invalid bitrate
+    header(rate_index=3),  # Reserved sample rate
+    bytes([0xFF, 0xFD, 0x90, 0x00]),  # Layer II
+])
+def test_frame_length_rejects_non_layer3_headers(data):
+    assert frame_length(data, 0) is None
+
+# audio_frames
+
+def test_plain_frames_pass_through():
+    frames = frame(1) + frame(2, padding=1) + frame(3)
+    assert audio_frames(frames) == frames
+
+def test_strips_id3v2_tag():
+    assert audio_frames(id3v2() + frame(1) + frame(2)) == frame(1) + frame(2)
+
+def test_strips_id3v2_tag_with_footer():
+    assert audio_frames(id3v2(footer=True) + frame(1)) == frame(1)
+
+def test_strips_id3v1_tag():
+    assert audio_frames(frame(1) + frame(2) + id3v1()) == frame(1) + frame(2)
+
+@pytest.mark.parametrize("tag", [b"Xing", b"Info"])
+def test_drops_leading_xing_or_info_frame(tag):
+    assert audio_frames(info_frame(tag) + frame(1) + frame(2)) == frame(1) + frame(2)
+
+def test_keeps_info_like_bytes_after_the_first_frame():
+    later = info_frame()
+    assert audio_frames(frame(1) + later) == frame(1) + later
+
+def test_resyncs_over_junk_bytes():
+    assert audio_frames(b"junk" + frame(1) + b"\x00\x01\x02" + frame(2)) == frame(1) + frame(2)
+
+def test_drops_truncated_last_frame():
+    assert audio_frames(frame(1) + frame(2)[:100]) == frame(1)
+
+def test_mpeg2_frames():
+    frames = frame(1, version_bits=2, bitrate_index=8) + frame(2, version_bits=2, bitrate_index=8)
+    assert audio_frames(id3v2() + frames + id3v1()) == frames
+
+def test_full_clip():
+    clip = id3v2() + info_frame() + frame(1) + frame(2, padding=1) + id3v1()
+    assert audio_frames(clip) == frame(1) + frame(2, padding=1)
+
+# FrameReader
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 100, 417, 4096])
+def test_chunked_reading_matches_whole_file(chunk_size):
+    clip = id3v2() + info_frame() + frame(1) + b"junk" + frame(2, padding=1) + frame(3) + id3v1()
+    reader = FrameReader()
+    out = b"".join(reader.feed(clip[i:i + chunk_size]) for i in range(0, len(clip), chunk_size))
+    out += reader.flush()
+    assert out == audio_frames(clip) == frame(1) + frame(2, padding=1) + frame(3)
+
+def test_reader_returns_frames_as_soon_as_they_complete():
+    reader = FrameReader()
+    first = frame(1)
+    assert reader.feed(id3v2() + first[:200]) == b""
+    assert reader.feed(first[200:] + frame(2)[:10]) == first
+
+def test_tag_bytes_mid_stream_are_not_taken_for_id3v1():
+    reader = FrameReader()
+    clip = frame(1) + b"TAG" + b"\x00" * 200 + frame(2)
+    assert reader.feed(clip) + reader.flush() == frame(1) + frame(2)
+
+# concat_mp3
+
+def test_concat_joins_frames_of_each_clip():
+    first = id3v2() + info_frame() + frame(1) + id3v1()
+    second = id3v2() + info_frame() + frame(2) + frame(3)
+    assert concat_mp3([first, second]) == frame(1) + frame(2) + frame(3)
+
+def test_concat_of_one_clip_is_unchanged():
+    clip = id3v2() + frame(1)
+    assert concat_mp3([clip]) == clip
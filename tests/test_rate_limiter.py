@@ -0,0 +1,106 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+import rate_limiter as rate_limiter_module
+from config import config
+from rate_limiter import RateLimiter, RateLimitShed, TokenBucket, estimate_tokens
+
+class FakeClock:
+    """Stands in for the time module: monotonic() only moves when slept or advanced."""
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter_module, "time", clock)
+
+    async def sleep(seconds: float):
+        clock.sleep(seconds)
+    monkeypatch.setattr(rate_limiter_module, "asyncio", SimpleNamespace(sleep=sleep))
+    return clock
+
+@pytest.fixture
+def limiter(clock, monkeypatch):
+    # 1 request/s and 10 tokens/s, with 10 seconds of burst
+    monkeypatch.setattr(config.rate_limit, "enabled", True)
+    monkeypatch.setattr(config.rate_limit, "requests_per_minute", 60)
+    monkeypatch.setattr(config.rate_limit, "tokens_per_minute", 600)
+    monkeypatch.setattr(config.rate_limit, "burst_seconds", 10.0)
+    monkeypatch.setattr(config.rate_limit, "max_wait", 5.0)
+    return RateLimiter()
+
+def test_estimate_tokens_counts_prompt_framing_and_reply():
+    messages = [{"role": "system", "content": "x" * 40}, {"role": "user", "content": "y" * 20}]
+    assert estimate_tokens(messages, 100) == 60 // 4 + 2 * 4 + 100
+
+def test_bucket_capacity_is_the_burst():
+    assert TokenBucket(60, 10.0).capacity == 10.0
+    assert TokenBucket(1, 10.0).capacity == 1.0  # Always room for one request
+
+def test_burst_goes_through_then_requests_are_paced(limiter, clock):
+    for _ in range(10):
+        limiter.acquire(1)
+    assert clock.sleeps == []
+    limiter.acquire(1)
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+def test_request_that_would_wait_too_long_is_shed(limiter, clock):
+    for _ in range(10):
+        limiter.acquire(1)
+    with pytest.raises(RateLimitShed):
+        limiter.acquire(1, max_wait=0.5)
+    assert clock.sleeps == []
+
+def test_request_larger_than_the_burst_overdraws_once_full(limiter, clock):
+    limiter.acquire(150)  # Capacity is 100 tokens
+    assert clock.sleeps == []
+    # 50 tokens of debt plus 10 for the next request, at 10 tokens/s
+    limiter.acquire(10, max_wait=10.0)
+    assert clock.sleeps == [pytest.approx(6.0)]
+
+def test_shed_after_overdraft_respects_max_wait(limiter):
+    limiter.acquire(150)
+    with pytest.raises(RateLimitShed):
+        limiter.acquire(10)  # Would wait 6s, max_wait is 5s
+
+def test_record_usage_corrects_the_estimate(limiter):
+    limiter.acquire(50)
+    limiter.record_usage(estimated=50, actual=20)
+    assert limiter.headroom()["tokens"] == pytest.approx(0.8)
+
+def test_server_rate_limit_drains_both_buckets(limiter, clock):
+    limiter.record_rate_limited()
+    assert limiter.headroom() == {"requests": 0.0, "tokens": 0.0, "overall": 0.0}
+    clock.now += 5
+    assert limiter.headroom()["requests"] == pytest.approx(0.5)
+
+def test_headroom_is_the_emptier_bucket(limiter):
+    limiter.acquire(80)
+    assert limiter.headroom() == {"requests": 0.9, "tokens": 0.2, "overall": 0.2}
+
+def test_disabled_limiter_never_waits(limiter, clock, monkeypatch):
+    monkeypatch.setattr(config.rate_limit, "enabled", False)
+    for _ in range(100):
+        limiter.acquire(1000)
+    assert clock.sleeps == []
+
+def test_acquire_async_paces_like_acquire(limiter, clock):
+    async def main():
+        for _ in range(11):
+            await limiter.acquire_async(1)
+    asyncio.run(main())
+    assert clock.sleeps == [pytest.approx(1.0)]
+
+def test_acquire_async_sheds(limiter):
+    limiter.record_rate_limited()
+    with pytest.raises(RateLimitShed):
+        asyncio.run(limiter.acquire_async(1, max_wait=0.5))
@@ -0,0 +1,54 @@
+import pytest
+from config import config
+from reply_budget import ReplyBudget, Backlog, TOKENS_PER_WORD, TOKEN_MARGIN
+
+@pytest.fixture
+def budget(monkeypatch):
+    monkeypatch.setattr(config.reply_budget, "enabled", True)
+    monkeypatch.setattr(config.reply_budget, "latency_slo", 20.0)
+    monkeypatch.setattr(config.reply_budget, "min_words", 12)
+    monkeypatch.setattr(config.reply_budget, "max_words", 70)
+    monkeypatch.setattr(config.reply_budget, "speech_rate", 2.5)
+    monkeypatch.setattr(config.gpt, "max_tokens", 200)
+    return ReplyBudget()
+
+def test_quiet_chat_gets_the_longest_replies(budget):
+    length = budget.plan(Backlog())
+    assert length.words == 70
+    assert length.max_tokens == min(200, int(70 * TOKENS_PER_WORD) + TOKEN_MARGIN)
+    assert "70 words" in length.instruction
+
+def test_no_backlog_is_a_quiet_chat(budget):
+    assert budget.plan(None).words == 70
+
+def test_length_shrinks_linearly_with_pending_audio(budget):
+    assert budget.plan(Backlog(audio_seconds=10.0)).words == 41
+    assert budget.plan(Backlog(audio_seconds=15.0)).words == round(70 - 58 * 0.75)
+
+@pytest.mark.parametrize("seconds", [20.0, 45.0])
+def test_backlog_at_or_past_the_slo_gets_the_shortest_replies(budget, seconds):
+    assert budget.plan(Backlog(audio_seconds=seconds)).words == 12
+
+def test_max_tokens_is_capped_by_the_gpt_setting(budget, monkeypatch):
+    monkeypatch.setattr(config.gpt, "max_tokens", 40)
+    assert budget.plan(Backlog()).max_tokens == 40
+
+def test_disabled_budget_adds_no_instruction(budget, monkeypatch):
+    monkeypatch.setattr(config.reply_budget, "enabled", False)
+    length = budget.plan(Backlog(audio_seconds=60.0))
+    assert length.words == 70
+    assert length.max_tokens == 200
+    assert length.instruction == ""
+
+def test_expected_seconds_follows_the_latest_plan(budget):
+    assert budget.expected_seconds() == pytest.approx(70 / 2.5)
+    budget.plan(Backlog(audio_seconds=20.0))
+    assert budget.expected_seconds() == pytest.approx(12 / 2.5)
+
+def test_speech_and_clip_seconds(budget, tmp_path, monkeypatch):
+    monkeypatch.setattr(config.reply_budget, "mp3_bytes_per_second", 16000)
+    clip = tmp_path / "clip.mp3"
+    clip.write_bytes(b"\x00" * 32000)
+    assert budget.speech_seconds("one two three four five") == pytest.approx(2.0)
+    assert budget.clip_seconds(str(clip)) == pytest.approx(2.0)
+    assert budget.clip_seconds(str(tmp_path / "missing.mp3")) == 0.0
@@ -0,0 +1,264 @@
+import asyncio
+import pytest
+from types import SimpleNamespace
+import resilience
+from resilience import (
+    CircuitBreaker, RetryPolicy, Deadline, CircuitOpenError, DeadlineExceeded
+)
+
+class FakeClock:
+    """Stands in for the time module: monotonic() only moves when slept or advanced."""
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience, "time", clock)
+
+    async def sleep(seconds: float):
+        clock.sleep(seconds)
+    monkeypatch.setattr(resilience, "asyncio", SimpleNamespace(sleep=sleep))
+    # No jitter, so backoff delays are exact
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)
+    return clock
+
+def make_breaker(**kwargs) -> CircuitBreaker:
+    settings = dict(failure_threshold=3, reset_timeout=30.0, success_threshold=2)
+    settings.update(kwargs)
+    return CircuitBreaker("test", **settings)
+
+def make_policy(breaker=None, **kwargs) -> RetryPolicy:
+    settings = dict(max_attempts=3, base_delay=0.5, max_delay=4.0, attempt_timeout=10.0)
+    settings.update(kwargs)
+    return RetryPolicy(breaker or make_breaker(), **settings)
+
+class Flaky:
+    """A call that fails `failures` times, then returns "ok". Records its timeouts."""
+    def __init__(self, failures: int, error: Exception = None):
+        self.failures = failures
+        self.error = error or RuntimeError("service down")
+        self.timeouts = []
+
+    def __call__(self, timeout: float) -> str:
+        self.timeouts.append(timeout)
+        if len(self.timeouts) <= self.failures:
+            raise self.error
+        return "ok"
+
+    async def call_async(self, timeout: float) -> str:
+        return self(timeout)
+
+def open_breaker(breaker: CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+# Deadline
+
+def test_deadline_counts_down_to_zero(clock):
+    deadline = Deadline(5.0)
+    clock.advance(2.0)
+    assert deadline.remaining() == pytest.approx(3.0)
+    assert not deadline.expired
+    clock.advance(10.0)
+    assert deadline.remaining() == 0.0
+    assert deadline.expired
+
+def test_earliest_ignores_none(clock):
+    short, long = Deadline(1.0), Deadline(5.0)
+    assert Deadline.earliest(long, None, short) is short
+    assert Deadline.earliest(None, None) is None
+
+# CircuitBreaker
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = make_breaker()
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # Resets the streak
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+def test_breaker_half_opens_after_reset_timeout(clock):
+    breaker = make_breaker()
+    open_breaker(breaker)
+    clock.advance(29.0)
+    assert not breaker.allow_request()
+    clock.advance(1.0)
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+def test_half_open_lets_one_probe_through_at_a_time(clock):
+    breaker = make_breaker()
+    open_breaker(breaker)
+    clock.advance(30.0)
+    assert breaker.allow_request()
+    assert not breaker.allow_request()  # Probe already in flight
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()  # Next probe
+
+def test_breaker_closes_after_enough_successful_probes(clock):
+    breaker = make_breaker(success_threshold=2)
+    open_breaker(breaker)
+    clock.advance(30.0)
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request()
+    assert breaker.allow_request()
+
+def test_failed_probe_reopens_and_restarts_the_timeout(clock):
+    breaker = make_breaker()
+    open_breaker(breaker)
+    clock.advance(30.0)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock.advance(29.0)
+    assert not breaker.allow_request()
+    clock.advance(1.0)
+    assert breaker.allow_request()
+
+def test_released_probe_can_be_claimed_again(clock):
+    breaker = make_breaker()
+    open_breaker(breaker)
+    clock.advance(30.0)
+    assert breaker.allow_request()
+    breaker.release_probe()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request()
+
+# RetryPolicy.call
+
+def test_call_retries_with_exponential_backoff(clock):
+    fn = Flaky(failures=2)
+    policy = make_policy()
+    assert policy.call(fn) == "ok"
+    assert clock.sleeps == [0.5, 1.0]
+    assert fn.timeouts == [10.0, 10.0, 10.0]
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+
+def test_call_raises_after_max_attempts(clock):
+    fn = Flaky(failures=5)
+    with pytest.raises(RuntimeError):
+        make_policy(make_breaker(failure_threshold=10)).call(fn)
+    assert len(fn.timeouts) == 3
+    assert len(clock.sleeps) == 2
+
+def test_backoff_is_capped_by_max_delay(clock):
+    fn = Flaky(failures=4)
+    policy = make_policy(make_breaker(failure_threshold=10), max_attempts=5, max_delay=1.5)
+    assert policy.call(fn) == "ok"
+    assert clock.sleeps == [0.5, 1.0, 1.5, 1.5]
+
+def test_attempt_timeout_is_capped_by_the_deadline(clock):
+    fn = Flaky(failures=1)
+    deadline = Deadline(6.0)
+    assert make_policy().call(fn, deadline) == "ok"
+    assert fn.timeouts == [6.0, 5.5]
+
+def test_no_retry_without_a_second_of_budget_after_the_backoff(clock):
+    fn = Flaky(failures=1)
+    deadline = Deadline(1.4)
+    with pytest.raises(RuntimeError):
+        make_policy().call(fn, deadline)
+    assert len(fn.timeouts) == 1
+    assert clock.sleeps == []
+
+def test_spent_deadline_raises_without_calling(clock):
+    fn = Flaky(failures=0)
+    deadline = Deadline(1.0)
+    clock.advance(2.0)
+    policy = make_policy()
+    with pytest.raises(DeadlineExceeded):
+        policy.call(fn, deadline)
+    assert fn.timeouts == []
+    assert policy.breaker.state == CircuitBreaker.CLOSED
+
+def test_open_circuit_fails_fast(clock):
+    breaker = make_breaker()
+    open_breaker(breaker)
+    fn = Flaky(failures=0)
+    with pytest.raises(CircuitOpenError):
+        make_policy(breaker).call(fn)
+    assert fn.timeouts == []
+
+def test_no_retry_once_the_circuit_opens(clock):
+    fn = Flaky(failures=5)
+    policy = make_policy(make_breaker(failure_threshold=2), max_attempts=5)
+    with pytest.raises(RuntimeError):
+        policy.call(fn)
+    assert len(fn.timeouts) == 2
+    assert policy.breaker.state == CircuitBreaker.OPEN
+
+def test_give_up_errors_release_the_probe_without_counting(clock):
+    breaker = make_breaker()
+    open_breaker(breaker)
+    clock.advance(30.0)
+    fn = Flaky(failures=1, error=ValueError("bad request"))
+    policy = make_policy(breaker, give_up_on=(ValueError,))
+    with pytest.raises(ValueError):
+        policy.call(fn)
+    assert len(fn.timeouts) == 1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert policy.call(fn) == "ok"  # The probe was released, not leaked
+
+def test_successful_probe_through_the_policy_closes_the_circuit(clock):
+    breaker = make_breaker(success_threshold=1)
+    open_breaker(breaker)
+    clock.advance(30.0)
+    assert make_policy(breaker).call(Flaky(failures=0)) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+# RetryPolicy.call_async
+
+def test_call_async_retries_with_backoff(clock):
+    fn = Flaky(failures=2)
+    assert asyncio.run(make_policy().call_async(fn.call_async)) == "ok"
+    assert clock.sleeps == [0.5, 1.0]
+    assert len(fn.timeouts) == 3
+
+def test_call_async_stops_at_the_deadline(clock):
+    fn = Flaky(failures=5)
+    deadline = Deadline(2.0)
+    with pytest.raises(RuntimeError):
+        asyncio.run(make_policy().call_async(fn.call_async, deadline))
+    # 2s budget: one 0.5s backoff leaves 1.5s, a second 1s backoff would leave 0.5s
+    assert fn.timeouts == [2.0, 1.5]
+    assert clock.sleeps == [0.5]
+
+def test_call_async_fails_fast_on_open_circuit(clock):
+    breaker = make_breaker()
+    open_breaker(breaker)
+    fn = Flaky(failures=0)
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(make_policy(breaker).call_async(fn.call_async))
+    assert fn.timeouts == []
+
+def test_call_async_deadline_exceeded_releases_the_probe(clock):
+    breaker = make_breaker()
+    open_breaker(breaker)
+    clock.advance(30.0)
+    deadline = Deadline(0.0)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(make_policy(breaker).call_async(Flaky(failures=0).call_async, deadline))
+    assert breaker.allow_request()
@@ -0,0 +1,81 @@
+import time
+import pytest
+import response_cache
+from response_cache import ResponseCache, ENTRY_OVERHEAD
+
+def key(prompt: str, model: str = "gpt-4", temperature: float = 0.7, system: str = "system") -> str:
+    return ResponseCache.make_key(prompt, model, temperature, system)
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    return now
+
+def test_keys_ignore_case_and_punctuation():
+    assert key("Will I be rich?!") == key("will i be rich")
+
+@pytest.mark.parametrize("other", [
+    key("will i be poor"),
+    key("will i be rich", model="gpt-3.5-turbo"),
+    key("will i be rich", temperature=0.0),
+    key("will i be rich", system="another persona"),
+])
+def test_keys_differ_by_prompt_and_settings(other):
+    assert key("will i be rich") != other
+
+def test_hit_and_miss():
+    cache = ResponseCache(max_bytes=10_000, ttl_seconds=60)
+    cache.put(key("will i be rich"), "yes")
+    assert cache.get(key("Will I be rich?")) == "yes"
+    assert cache.get(key("will i be poor")) is None
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = ResponseCache(max_bytes=10_000, ttl_seconds=60)
+    cache.put("k", "reply")
+    clock[0] += 60
+    assert cache.get("k") == "reply"
+    clock[0] += 1
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+def test_least_recently_used_entries_are_evicted_over_the_byte_bound():
+    entry = len("k1") + len("reply") + ENTRY_OVERHEAD
+    cache = ResponseCache(max_bytes=2 * entry, ttl_seconds=60)
+    cache.put("k1", "reply")
+    cache.put("k2", "reply")
+    assert cache.get("k1") == "reply"  # Now the most recently used
+    cache.put("k3", "reply")
+    assert len(cache) == 2
+    assert cache.get("k2") is None
+    assert cache.get("k1") == "reply"
+
+def test_reply_larger_than_the_bound_is_not_kept():
+    cache = ResponseCache(max_bytes=50, ttl_seconds=60)
+    cache.put("k", "x" * 100)
+    assert cache.get("k") is None
+
+def test_replacing_an_entry_keeps_one_copy():
+    cache = ResponseCache(max_bytes=10_000, ttl_seconds=60)
+    cache.put("k", "old")
+    cache.put("k", "new")
+    assert len(cache) == 1
+    assert cache.get("k") == "new"
+
+def test_saved_cache_reloads_without_expired_entries(tmp_path, clock):
+    path = tmp_path / "responses.json"
+    cache = ResponseCache(max_bytes=10_000, ttl_seconds=60, path=path)
+    cache.put("old", "a")
+    clock[0] += 30
+    cache.put("new", "b")
+    cache.save()
+
+    clock[0] += 40  # "old" is now 70s old, "new" 40s
+    reloaded = ResponseCache(max_bytes=10_000, ttl_seconds=60, path=path)
+    assert reloaded.get("old") is None
+    assert reloaded.get("new") == "b"
+
+def test_corrupt_file_starts_empty(tmp_path):
+    path = tmp_path / "responses.json"
+    path.write_text("{not json")
+    assert len(ResponseCache(max_bytes=10_000, ttl_seconds=60, path=path)) == 0
@@ -0,0 +1,102 @@
+import time
+import numpy as np
+import pytest
+import semantic_cache
+from semantic_cache import SemanticCache
+
+SETTINGS = "settings"
+
+def make_cache(directory, **kwargs) -> SemanticCache:
+    settings = dict(capacity=8, dim=512, threshold=0.8, ttl_seconds=3600, save_interval=3600)
+    settings.update(kwargs)
+    return SemanticCache(directory, **settings)
+
+@pytest.fixture
+def cache(tmp_path):
+    return make_cache(tmp_path)
+
+@pytest.mark.parametrize("stored, asked", [
+    ("What's my future?", "whats my future"),
+    ("Am I going to be rich?", "will i be rich"),
+    ("are u gonna tell me my future", "are you going to tell me my future"),
+    ("Mirror, will I find love?", "will i find love"),
+    ("what is my future", "whats my futur"),
+])
+def test_paraphrases_hit(cache, stored, asked):
+    cache.put(stored, SETTINGS, "reply")
+    assert cache.get(asked, SETTINGS) == "reply"
+
+@pytest.mark.parametrize("stored, asked", [
+    ("mirror tell me if my boyfriend is going to propose this year",
+     "mirror tell me if my girlfriend is going to propose this year"),
+    ("should i quit my job to start a bakery", "should i quit my job to start a band"),
+    ("should i take the job in new york or stay in chicago",
+     "should i take the job in chicago or stay in new york"),
+    ("question number 1 what is my lucky color", "question number 11 what is my lucky color"),
+    ("thing 0", "thing 7919"),
+    ("will i be rich", "will i be poor"),
+    ("will i be rich", "will i not be rich"),
+])
+def test_near_misses_miss(cache, stored, asked):
+    cache.put(stored, SETTINGS, "reply")
+    assert cache.get(asked, SETTINGS) is None
+
+def test_near_miss_does_not_hide_a_real_match(cache):
+    cache.put("should i quit my job to start a bakery", SETTINGS, "bakery")
+    cache.put("should i quit my job to start a band", SETTINGS, "band")
+    assert cache.get("should i quit my job to start a band?", SETTINGS) == "band"
+    assert cache.get("Should I quit my job to start a bakery", SETTINGS) == "bakery"
+
+def test_other_settings_miss(cache):
+    cache.put("will i be rich", SETTINGS, "reply")
+    assert cache.get("will i be rich", "other settings") is None
+
+def test_expired_entries_miss_and_free_their_slot(cache, monkeypatch):
+    cache.put("will i be rich", SETTINGS, "reply")
+    later = time.time() + 3601
+    monkeypatch.setattr(semantic_cache.time, "time", lambda: later)
+    assert cache.get("will i be rich", SETTINGS) is None
+    assert len(cache) == 0
+
+def test_full_cache_reuses_least_recently_used_slot(tmp_path):
+    cache = make_cache(tmp_path, capacity=2)
+    cache.put("will i be rich", SETTINGS, "rich")
+    cache.put("will i find love", SETTINGS, "love")
+    assert cache.get("will i be rich", SETTINGS) == "rich"  # Now the most recently used
+    cache.put("what is my lucky color", SETTINGS, "color")
+    assert len(cache) == 2
+    assert cache.get("will i find love", SETTINGS) is None
+    assert cache.get("will i be rich", SETTINGS) == "rich"
+
+def test_saved_index_reloads_without_re_embedding(tmp_path, monkeypatch):
+    cache = make_cache(tmp_path)
+    cache.put("will i be rich", SETTINGS, "rich")
+    cache.put("will i find love", SETTINGS, "love")
+    cache.save()
+
+    calls = []
+    embed = semantic_cache.embed
+    monkeypatch.setattr(semantic_cache, "embed", lambda text, dim: calls.append(text) or embed(text, dim))
+    reloaded = make_cache(tmp_path)
+    assert calls == []
+    assert len(reloaded) == 2
+    assert reloaded.get("will i find love", SETTINGS) == "love"
+
+def test_row_rewritten_after_the_last_save_is_repaired(tmp_path):
+    cache = make_cache(tmp_path, capacity=1)
+    cache.put("will i be rich", SETTINGS, "rich")
+    cache.save()
+    # The slot is reused but the process dies before the metadata is saved
+    cache.put("what is the capital of france", SETTINGS, "paris")
+    cache._vectors.flush()
+
+    reloaded = make_cache(tmp_path, capacity=1)
+    assert reloaded.get("what is the capital of france", SETTINGS) is None
+    assert reloaded.get("will i be rich", SETTINGS) == "rich"
+    assert np.allclose(reloaded._vectors[0], semantic_cache.embed("will i be rich", 512))
+
+def test_changed_settings_start_a_new_index(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.put("will i be rich", SETTINGS, "rich")
+    cache.save()
+    assert len(make_cache(tmp_path, dim=256)) == 0
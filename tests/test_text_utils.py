@@ -0,0 +1,53 @@
+import pytest
+from text_utils import normalize_text, content_words, words_match, split_sentences, SentenceChunker
+
+def test_normalize_drops_case_punctuation_and_emoji():
+    assert normalize_text("What's my FUTURE?? 🔮") == "whats my future"
+
+def test_symbol_only_text_keeps_its_symbols():
+    assert normalize_text(" 🔥🔥 ") == "🔥🔥"
+    assert normalize_text("🔥") != normalize_text("❤️")
+
+def test_content_words_drop_filler_and_stretched_letters():
+    assert content_words("omg mirror pls tell me my futureee") == ["tell", "me", "my", "future"]
+
+def test_content_words_keep_negations_and_question_words():
+    assert content_words("why will i not be rich") == ["why", "will", "i", "not", "be", "rich"]
+
+@pytest.mark.parametrize("a, b", [
+    ("what is my future", "what is my futur"),
+    ("will i find love", "will i find loove"),
+    ("tell me my destiny", "tell me my destiny"),
+])
+def test_typos_match(a, b):
+    assert words_match(a.split(), b.split(), 0.8)
+
+@pytest.mark.parametrize("a, b", [
+    ("is my boyfriend cheating", "is my girlfriend cheating"),
+    ("start a bakery", "start a band"),
+    ("question 1", "question 11"),
+    ("question 2024", "question 2025"),  # Long numbers aren't fuzzy either
+    ("will i be rich", "will i be rich soon"),
+    ("new york or chicago", "chicago or new york"),
+    ("am i ok", "am i on"),  # Short words must match exactly
+])
+def test_different_questions_do_not_match(a, b):
+    assert not words_match(a.split(), b.split(), 0.8)
+
+def test_similarity_setting_is_the_spelling_bar():
+    assert words_match(["future"], ["futur"], 0.9)
+    assert not words_match(["future"], ["futur"], 0.95)
+
+def test_split_sentences_keeps_punctuation():
+    assert split_sentences("Hello there. How are you?! Fine…") == ["Hello there.", "How are you?!", "Fine…"]
+
+def test_chunker_waits_for_the_space_after_a_sentence():
+    chunker = SentenceChunker()
+    assert chunker.feed("The stars align") == []
+    assert chunker.feed(".") == []
+    assert chunker.feed(" Your path is clear.") == ["The stars align."]
+    assert chunker.flush() == ["Your path is clear."]
+    assert chunker.flush() == []
+
+def test_chunker_keeps_closing_quotes_with_the_sentence():
+    assert split_sentences('She said "go." Then left.') == ['She said "go."', "Then left."]
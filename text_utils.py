@@ -0,0 +1,92 @@
+# mirror_backend/text_utils.py
+
+import re
+from difflib import SequenceMatcher
+from typing import List
+
+# Anything that isn't a letter, digit or whitespace (punctuation, emoji, symbols)
+NON_WORD = re.compile(r"[^\w\s]|_")
+
+# Words that don't change what a comment asks ("the mirror pls" adds nothing).
+# Pronouns, negations and question words are kept: they change the question.
+FILLER_WORDS = {
+    "a", "an", "the", "pls", "plz", "please", "mirror", "oh", "um", "uh",
+    "like", "just", "really", "very", "so", "hey", "yo", "omg", "lol",
+}
+
+# Letters repeated three or more times ("sooo", "whyyy")
+REPEATED_LETTERS = re.compile(r"(\w)\1{2,}")
+
+# Shortest word compared by spelling; shorter words must match exactly
+MIN_FUZZY_LENGTH = 4
+
+# End of a sentence: terminal punctuation, optional closing quotes or
+# brackets, then whitespace
+SENTENCE_BOUNDARY = re.compile(r"[.!?…]+[\"'”’)\]]*\s+")
+
+def normalize_text(text: str) -> str:
+    """
+    Reduce text to lowercase words separated by single spaces, dropping
+    punctuation and emoji. Text made only of symbols keeps its stripped
+    original so different emoji don't collapse into the same empty key.
+    """
+    text_lower = text.lower().replace("'", "").replace("’", "")
+    normalized = " ".join(NON_WORD.sub(" ", text_lower).split())
+    return normalized or text.strip()
+
+def content_words(key: str) -> List[str]:
+    """The words of a normalized comment that carry its meaning, in order."""
+    words = (REPEATED_LETTERS.sub(r"\1", word) for word in key.split())
+    return [word for word in words if word not in FILLER_WORDS]
+
+def words_match(words: List[str], other: List[str], similarity: float) -> bool:
+    """
+    Whether two content word lists match word for word, allowing typos:
+    words spelled at least `similarity` alike count as the same. Short
+    words and anything with a digit must match exactly, so "boyfriend"
+    never matches "girlfriend" and "question 1" never matches "question 11".
+    """
+    if len(words) != len(other):
+        return False
+    for word, other_word in zip(words, other):
+        if word == other_word:
+            continue
+        if min(len(word), len(other_word)) < MIN_FUZZY_LENGTH:
+            return False
+        if any(char.isdigit() for char in word + other_word):
+            return False
+        if SequenceMatcher(None, word, other_word).ratio() < similarity:
+            return False
+    return True
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences, keeping their punctuation."""
+    chunker = SentenceChunker()
+    return chunker.feed(text) + chunker.flush()
+
+class SentenceChunker:
+    """
+    Cuts streamed text into complete sentences. A sentence is emitted once
+    the whitespace after its punctuation arrives; flush() returns the rest.
+    """
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        """Add text and return any sentences it completed."""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_BOUNDARY.finditer(self._buffer):
+            sentence = self._buffer[start:match.end()].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self) -> List[str]:
+        """Return whatever text is left as a final sentence."""
+        rest = self._buffer.strip()
+        self._buffer = ""
+        return [rest] if rest else []
@@ -0,0 +1,75 @@
+# mirror_backend/tracing.py
+
+import time
+import itertools
+from typing import Dict, Any
+from dataclasses import dataclass, field
+
+# Stage boundaries a comment passes, in pipeline order
+STAGES = (
+    "received",            # ChatListener got the comment
+    "dequeued",            # Main loop took it from the comment buffer
+    "gpt_start",
+    "gpt_first_sentence",  # Streaming mode only
+    "gpt_end",
+    "tts_start",
+    "tts_end",             # First audio available when streaming TTS
+    "enqueued",            # Released to the player in order
+    "playback_start",
+)
+
+# Named spans as (start boundary, end boundary)
+SPANS = {
+    "queue_wait": ("received", "dequeued"),
+    "gpt_wait": ("dequeued", "gpt_start"),
+    "gpt_first_sentence": ("gpt_start", "gpt_first_sentence"),
+    "gpt": ("gpt_start", "gpt_end"),
+    "tts": ("tts_start", "tts_end"),
+    "release_wait": ("tts_end", "enqueued"),
+    "player_wait": ("enqueued", "playback_start"),
+    "end_to_end": ("received", "playback_start"),
+}
+
+_trace_ids = itertools.count(1)
+
+@dataclass
+class Trace:
+    """
+    Monotonic timestamps of the stage boundaries one comment passes.
+    Only the first time a boundary is reached is kept, so a streamed reply
+    with several segments is traced up to its first audio.
+    """
+    username: str
+    text: str
+    trace_id: int = field(default_factory=lambda: next(_trace_ids))
+    created_at: float = field(default_factory=time.time)
+    marks: Dict[str, float] = field(default_factory=dict)
+
+    def mark(self, stage: str) -> bool:
+        """Record a stage boundary. Returns False if it was already recorded."""
+        now = time.monotonic()
+        # setdefault is atomic, so concurrent workers can't both win
+        return self.marks.setdefault(stage, now) is now
+
+    def spans(self) -> Dict[str, float]:
+        """Durations in seconds of every span whose boundaries were reached."""
+        return {
+            name: self.marks[end] - self.marks[start]
+            for name, (start, end) in SPANS.items()
+            if start in self.marks and end in self.marks
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serialize with boundaries and spans in milliseconds."""
+        origin = self.marks.get("received", min(self.marks.values(), default=0.0))
+        return {
+            "trace_id": self.trace_id,
+            "username": self.username,
+            "text": self.text,
+            "created_at": self.created_at,
+            "marks": {
+                stage: round((self.marks[stage] - origin) * 1000, 1)
+                for stage in STAGES if stage in self.marks
+            },
+            "spans": {name: round(value * 1000, 1) for name, value in self.spans().items()},
+        }
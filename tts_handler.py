@@ -1,33 +1,60 @@
 # mirror_backend/tts_handler.py
 
 import os
+import asyncio
 import hashlib
+import threading
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional
-from config import Config
+from typing import Optional, Tuple, Union, List, Dict, Iterator, AsyncIterator
+from audio_stream import AudioStream
+from cache_manager import cache_manager
+from config import Config, config
+from mp3_frames import FrameReader, audio_frames, concat_mp3
+from resilience import Deadline, CircuitOpenError, make_policy
+from text_utils import split_sentences
+from tracing import Trace
+
+API_BASE = "https://api.elevenlabs.io/v1"
+
+# Bytes read per chunk of a streamed response; about a quarter second of 128 kbps MP3
+STREAM_CHUNK_SIZE = 4096
 
 class TTSHandler:
     def __init__(self):
         self.api_key = Config.ELEVENLABS_API_KEY
         self.voice_id = Config.VOICE_ID
-        self.cache_dir = Path("audio_cache")
-        self.output_dir = Path("audio_output")
+        self.cache_dir = config.audio.cache_dir  # Shared with cache_manager, which evicts from it
+        self._sync_session: Optional[requests.Session] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._pool: Optional[ThreadPoolExecutor] = None  # Synthesizes a reply's sentences in parallel
+        self._lock = threading.Lock()  # Guards lazy creation shared by the TTS workers
+        self.retry_policy = make_policy("TTS")
         self._ensure_directories()
 
     def _ensure_directories(self):
         """Ensure necessary directories exist."""
         self.cache_dir.mkdir(exist_ok=True)
-        self.output_dir.mkdir(exist_ok=True)
 
     def _get_cache_path(self, text: str) -> Path:
         """Generate a cache path for the given text."""
         text_hash = hashlib.md5(text.encode()).hexdigest()
         return self.cache_dir / f"{text_hash}.mp3"
 
-    def _make_api_request(self, text: str) -> Optional[bytes]:
-        """Make API request to ElevenLabs."""
-        url = f"https://api.elevenlabs.io/v1/text-to-speech/{self.voice_id}"
+    def _store(self, cache_path: Path, audio_data: bytes):
+        """
+        Add audio to the cache through cache_manager, which writes it
+        atomically (cache files are played in place) and evicts the least
+        recently used files once the cache is over its size limit.
+        """
+        cache_manager.add_to_cache(cache_path.stem, audio_data)
+
+    def _build_request(self, text: str) -> Tuple[str, dict, dict]:
+        """Build the URL, headers and payload for an ElevenLabs request."""
+        url = f"{API_BASE}/text-to-speech/{self.voice_id}"
         
         headers = {
             "xi-api-key": self.api_key,
@@ -42,43 +69,475 @@ class TTSHandler:
                 "speaking_rate": 1.0
             }
         }
+        return url, headers, payload
 
-        try:
-            response = requests.post(url, headers=headers, json=payload)
+    def _http_session(self) -> requests.Session:
+        """Long-lived keep-alive session shared by the threaded TTS workers."""
+        with self._lock:
+            if self._sync_session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=1,
+                    pool_maxsize=config.tts.pool_size,
+                    max_retries=0  # Retries are handled by the retry policy
+                )
+                session.mount("https://", adapter)
+                self._sync_session = session
+            return self._sync_session
+
+    def _async_session(self) -> aiohttp.ClientSession:
+        """Long-lived keep-alive session shared by all coroutines on the event loop."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=config.tts.pool_size,
+                keepalive_timeout=config.tts.keepalive_expiry
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    def _sentence_pool(self) -> ThreadPoolExecutor:
+        """Threads that synthesize a reply's sentences in parallel, started on first use."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=config.tts.pool_size)
+            return self._pool
+
+    def _timeouts(self, timeout: float) -> Tuple[float, float]:
+        """Connect and read timeouts for one attempt, capped by its overall timeout."""
+        return min(config.tts.connect_timeout, timeout), min(config.tts.read_timeout, timeout)
+
+    def _make_api_request(self, text: str, timeout: float) -> bytes:
+        """Make one API request to ElevenLabs."""
+        url, headers, payload = self._build_request(text)
+        response = self._http_session().post(url, headers=headers, json=payload,
+                                             timeout=self._timeouts(timeout))
+        response.raise_for_status()
+        return response.content
+
+    async def _make_api_request_async(self, text: str, timeout: float) -> bytes:
+        """Make one non-blocking API request to ElevenLabs."""
+        url, headers, payload = self._build_request(text)
+        connect, _ = self._timeouts(timeout)
+        async with self._async_session().post(
+            url, headers=headers, json=payload,
+            timeout=aiohttp.ClientTimeout(total=timeout, sock_connect=connect)
+        ) as response:
             response.raise_for_status()
-            return response.content
-        except requests.exceptions.RequestException as e:
+            return await response.read()
+
+    def _open_stream_request(self, text: str, timeout: float) -> requests.Response:
+        """
+        Start one streaming API request and return once the response has
+        started. `timeout` bounds the connect and each read, not the whole
+        download.
+        """
+        url, headers, payload = self._build_request(text)
+        response = self._http_session().post(f"{url}/stream", headers=headers, json=payload,
+                                             timeout=self._timeouts(timeout), stream=True)
+        if not response.ok:
+            response.close()
+        response.raise_for_status()
+        return response
+
+    async def _open_stream_request_async(self, text: str, timeout: float) -> aiohttp.ClientResponse:
+        """Async version of _open_stream_request."""
+        url, headers, payload = self._build_request(text)
+        connect, read = self._timeouts(timeout)
+        response = await self._async_session().post(
+            f"{url}/stream", headers=headers, json=payload,
+            timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        )
+        response.raise_for_status()  # Releases the connection on failure
+        return response
+
+    def _synthesize(self, text: str, deadline: Optional[Deadline] = None) -> Optional[bytes]:
+        """Generate audio with deadline-aware retries behind the circuit breaker."""
+        try:
+            return self.retry_policy.call(
+                lambda timeout: self._make_api_request(text, timeout), deadline
+            )
+        except CircuitOpenError:
+            return None
+        except Exception as e:
+            print(f"TTS API Error: {str(e)}")
+            return None
+
+    async def _synthesize_async(self, text: str, deadline: Optional[Deadline] = None) -> Optional[bytes]:
+        """Async version of _synthesize."""
+        try:
+            return await self.retry_policy.call_async(
+                lambda timeout: self._make_api_request_async(text, timeout), deadline
+            )
+        except CircuitOpenError:
+            return None
+        except Exception as e:
             print(f"TTS API Error: {str(e)}")
             return None
 
-    def speak_text(self, text: str, output_path: Optional[str] = None) -> Optional[str]:
+    def _sentences(self, text: str) -> List[str]:
+        """The sentences text is cached by; the whole text if sentence caching is off."""
+        if not config.tts.sentence_cache:
+            return [text]
+        return split_sentences(text) or [text]
+
+    def _cached_parts(self, sentences: List[str]) -> Dict[str, bytes]:
+        """Cached audio of whichever sentences have it."""
+        parts = {}
+        for sentence in sentences:
+            try:
+                parts[sentence] = self._get_cache_path(sentence).read_bytes()
+            except FileNotFoundError:
+                pass
+        return parts
+
+    def _assemble(self, sentences: List[str], parts: Dict[str, bytes]) -> bytes:
+        """Join the sentences' audio in order by concatenating MP3 frames."""
+        return concat_mp3([parts[sentence] for sentence in sentences])
+
+    def _synthesize_text(self, text: str, deadline: Optional[Deadline] = None) -> Optional[bytes]:
+        """
+        Generate audio for text sentence by sentence, so replies built
+        from familiar sentences reuse their audio. Cached sentences are
+        read back, the rest are synthesized in parallel and cached, and
+        the clips are joined into one MP3 without re-encoding. Returns
+        None if any sentence fails.
+        """
+        sentences = self._sentences(text)
+        if len(sentences) == 1:
+            return self._synthesize(text, deadline)
+
+        parts = self._cached_parts(sentences)
+        missing = [sentence for sentence in dict.fromkeys(sentences) if sentence not in parts]
+        if missing:
+            results = self._sentence_pool().map(lambda sentence: self._synthesize(sentence, deadline), missing)
+            for sentence, audio_data in zip(missing, results):
+                if audio_data is None:
+                    return None
+                self._store(self._get_cache_path(sentence), audio_data)
+                parts[sentence] = audio_data
+        return self._assemble(sentences, parts)
+
+    async def _synthesize_text_async(self, text: str, deadline: Optional[Deadline] = None) -> Optional[bytes]:
+        """Async version of _synthesize_text."""
+        sentences = self._sentences(text)
+        if len(sentences) == 1:
+            return await self._synthesize_async(text, deadline)
+
+        parts = self._cached_parts(sentences)
+        missing = [sentence for sentence in dict.fromkeys(sentences) if sentence not in parts]
+        results = await asyncio.gather(
+            *(self._synthesize_async(sentence, deadline) for sentence in missing)
+        )
+        for sentence, audio_data in zip(missing, results):
+            if audio_data is None:
+                return None
+            self._store(self._get_cache_path(sentence), audio_data)
+            parts[sentence] = audio_data
+        return self._assemble(sentences, parts)
+
+    def _assemble_cached(self, text: str) -> Optional[str]:
+        """
+        Cache audio for text from its cached sentences alone, without any
+        API call. Returns the path, or None unless every sentence is cached.
+        """
+        sentences = self._sentences(text)
+        if len(sentences) == 1:
+            return None
+        parts = self._cached_parts(sentences)
+        if len(parts) < len(set(sentences)):
+            return None
+        cache_path = self._get_cache_path(text)
+        self._store(cache_path, self._assemble(sentences, parts))
+        return str(cache_path)
+
+    def _sentence_stream(self, text: str, sentences: List[str],
+                         deadline: Optional[Deadline] = None) -> AudioStream:
+        """
+        Stream text sentence by sentence. Cached sentences play from the
+        cache; the missing ones are streamed one after another and each is
+        cached once complete. The first request is opened here, so a
+        failure to start falls back like a whole-text stream.
+        """
+        parts = self._cached_parts(sentences)
+        first = next(sentence for sentence in sentences if sentence not in parts)
+        response = self.retry_policy.call(
+            lambda timeout: self._open_stream_request(first, timeout), deadline
+        )
+        source = self._sentence_chunks(sentences, parts, response)
+        return AudioStream(text, self._get_cache_path(text), source, close=source.close)
+
+    def _sentence_chunks(self, sentences: List[str], parts: Dict[str, bytes],
+                         response: requests.Response) -> Iterator[bytes]:
+        """
+        Audio frames of each sentence in turn, so the clips join into one
+        MP3. `response` is the open stream of the first missing sentence.
+        """
+        try:
+            for sentence in sentences:
+                if sentence in parts:
+                    yield audio_frames(parts[sentence])
+                    continue
+                if response is None:
+                    response = self.retry_policy.call(
+                        lambda timeout: self._open_stream_request(sentence, timeout)
+                    )
+                reader = FrameReader()
+                audio_data = bytearray()
+                for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                    audio_data += chunk
+                    yield reader.feed(chunk)
+                yield reader.flush()
+                response.close()
+                response = None
+                parts[sentence] = bytes(audio_data)
+                self._store(self._get_cache_path(sentence), parts[sentence])
+        finally:
+            if response is not None:
+                response.close()
+
+    async def _sentence_stream_async(self, text: str, sentences: List[str],
+                                     deadline: Optional[Deadline] = None) -> AudioStream:
+        """Async version of _sentence_stream."""
+        parts = self._cached_parts(sentences)
+        first = next(sentence for sentence in sentences if sentence not in parts)
+        response = await self.retry_policy.call_async(
+            lambda timeout: self._open_stream_request_async(first, timeout), deadline
+        )
+        return AudioStream(text, self._get_cache_path(text),
+                           self._sentence_chunks_async(sentences, parts, response))
+
+    async def _sentence_chunks_async(self, sentences: List[str], parts: Dict[str, bytes],
+                                     response: aiohttp.ClientResponse) -> AsyncIterator[bytes]:
+        """Async version of _sentence_chunks."""
+        try:
+            for sentence in sentences:
+                if sentence in parts:
+                    yield audio_frames(parts[sentence])
+                    continue
+                if response is None:
+                    response = await self.retry_policy.call_async(
+                        lambda timeout: self._open_stream_request_async(sentence, timeout)
+                    )
+                reader = FrameReader()
+                audio_data = bytearray()
+                async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                    audio_data += chunk
+                    yield reader.feed(chunk)
+                yield reader.flush()
+                response.release()
+                response = None
+                parts[sentence] = bytes(audio_data)
+                self._store(self._get_cache_path(sentence), parts[sentence])
+        finally:
+            if response is not None:
+                response.release()
+
+    def cached_audio(self, text: str) -> Optional[Path]:
+        """Path of the cached audio for text, if there is any."""
+        cache_path = self._get_cache_path(text)
+        if not cache_path.exists():
+            return None
+        cache_manager.touch(cache_path)
+        return cache_path
+
+    def cache_audio(self, text: str) -> Optional[Path]:
+        """Make sure audio for text is in the cache and return its path."""
+        cache_path = self._get_cache_path(text)
+        if not cache_path.exists():
+            audio_data = self._synthesize_text(text)
+            if audio_data is None:
+                return None
+            self._store(cache_path, audio_data)
+        return cache_path
+
+    def _fallback_audio(self, fallback: bool = True) -> Optional[str]:
+        """Cached audio of the fallback reply, if wanted and it has been synthesized."""
+        if not fallback:
+            return None
+        cache_path = self.cached_audio(config.resilience.fallback_reply)
+        return str(cache_path) if cache_path is not None else None
+
+    def warm_up(self, texts: List[str]) -> List[str]:
+        """
+        Make sure every static phrase is in the cache, synthesizing the
+        missing ones in parallel over the connection pool, and pin them
+        so eviction never removes them. Returns the phrases that couldn't
+        be synthesized.
+        """
+        texts = list(dict.fromkeys(texts))
+        with ThreadPoolExecutor(max_workers=config.tts.pool_size) as executor:
+            cache_paths = list(executor.map(self.cache_audio, texts))
+
+        missing = []
+        for text, cache_path in zip(texts, cache_paths):
+            if cache_path is not None and cache_path.exists():
+                cache_manager.pin(cache_path)
+            else:
+                missing.append(text)
+        return missing
+
+    def speak_text(self, text: str,
+                   trace: Optional[Trace] = None,
+                   deadline: Optional[Deadline] = None,
+                   fallback: bool = True) -> Optional[str]:
         """
         Convert text to speech, with caching and error handling.
-        Returns the path to the audio file or None if generation failed.
+        If generation fails and `fallback` is set, the cached audio of the
+        fallback reply is used instead.
+        Returns the path of the cached audio file, which the player reads
+        in place, or None if there is nothing to play.
         """
+        if trace is not None:
+            trace.mark("tts_start")
         try:
             # Check cache first
             cache_path = self._get_cache_path(text)
             if cache_path.exists():
-                audio_data = cache_path.read_bytes()
-            else:
-                # Generate new audio
-                audio_data = self._make_api_request(text)
-                if audio_data is None:
-                    return None
-                # Save to cache
-                cache_path.write_bytes(audio_data)
+                cache_manager.touch(cache_path)
+                return str(cache_path)
 
-            # Determine output path
-            final_path = Path(output_path) if output_path else self.output_dir / "output.mp3"
-            
-            # Save to output location
-            final_path.write_bytes(audio_data)
-            return str(final_path)
+            # Generate new audio
+            audio_data = self._synthesize_text(text, deadline)
+            if audio_data is None:
+                return self._fallback_audio(fallback)
+            self._store(cache_path, audio_data)
+            return str(cache_path)
 
         except Exception as e:
             print(f"TTS Error: {str(e)}")
             return None
+        finally:
+            if trace is not None:
+                trace.mark("tts_end")
+
+    async def speak_text_async(self, text: str,
+                               trace: Optional[Trace] = None,
+                               deadline: Optional[Deadline] = None,
+                               fallback: bool = True) -> Optional[str]:
+        """Async version of speak_text for use on the asyncio runtime."""
+        if trace is not None:
+            trace.mark("tts_start")
+        try:
+            cache_path = self._get_cache_path(text)
+            if cache_path.exists():
+                cache_manager.touch(cache_path)
+                return str(cache_path)
+
+            audio_data = await self._synthesize_text_async(text, deadline)
+            if audio_data is None:
+                return self._fallback_audio(fallback)
+            self._store(cache_path, audio_data)
+            return str(cache_path)
+
+        except Exception as e:
+            print(f"TTS Error: {str(e)}")
+            return None
+        finally:
+            if trace is not None:
+                trace.mark("tts_end")
+
+    def speak_stream(self, text: str,
+                     trace: Optional[Trace] = None,
+                     deadline: Optional[Deadline] = None,
+                     fallback: bool = True) -> Union[str, AudioStream, None]:
+        """
+        Streaming version of speak_text. Cached text is served as usual;
+        otherwise an AudioStream is returned as soon as the response has
+        started. The caller hands it to the player and then calls its
+        pump() to download the rest, which also fills the cache. With the
+        sentence cache on, text of several sentences is streamed sentence
+        by sentence, requesting only the sentences not yet cached.
+        """
+        cache_path = self._get_cache_path(text)
+        # Text cached whole or sentence by sentence plays from the cache
+        if cache_path.exists() or self._assemble_cached(text) is not None:
+            return self.speak_text(text, trace, deadline, fallback)
+
+        if trace is not None:
+            trace.mark("tts_start")
+        try:
+            sentences = self._sentences(text)
+            if len(sentences) > 1:
+                return self._sentence_stream(text, sentences, deadline)
+            response = self.retry_policy.call(
+                lambda timeout: self._open_stream_request(text, timeout), deadline
+            )
+            return AudioStream(text, cache_path, response.iter_content(STREAM_CHUNK_SIZE),
+                               close=response.close)
+        except Exception as e:
+            if not isinstance(e, CircuitOpenError):
+                print(f"TTS API Error: {str(e)}")
+            return self._fallback_audio(fallback)
+        finally:
+            if trace is not None:
+                trace.mark("tts_end")
+
+    async def speak_stream_async(self, text: str,
+                                 trace: Optional[Trace] = None,
+                                 deadline: Optional[Deadline] = None,
+                                 fallback: bool = True) -> Union[str, AudioStream, None]:
+        """Async version of speak_stream; pump the stream with pump_async()."""
+        cache_path = self._get_cache_path(text)
+        if cache_path.exists() or self._assemble_cached(text) is not None:
+            return await self.speak_text_async(text, trace, deadline, fallback)
+
+        if trace is not None:
+            trace.mark("tts_start")
+        try:
+            sentences = self._sentences(text)
+            if len(sentences) > 1:
+                return await self._sentence_stream_async(text, sentences, deadline)
+            response = await self.retry_policy.call_async(
+                lambda timeout: self._open_stream_request_async(text, timeout), deadline
+            )
+            return AudioStream(text, cache_path, response.content.iter_chunked(STREAM_CHUNK_SIZE),
+                               close=response.release)
+        except Exception as e:
+            if not isinstance(e, CircuitOpenError):
+                print(f"TTS API Error: {str(e)}")
+            return self._fallback_audio(fallback)
+        finally:
+            if trace is not None:
+                trace.mark("tts_end")
+
+    def preconnect(self):
+        """
+        Open a pooled connection to ElevenLabs ahead of the first reply, so
+        it doesn't pay for the TCP and TLS handshake. Failures are harmless.
+        """
+        if not config.tts.preconnect:
+            return
+        try:
+            self._http_session().head(API_BASE, timeout=self._timeouts(config.tts.connect_timeout))
+        except requests.RequestException as e:
+            print(f"TTS pre-connect failed: {str(e)}")
+
+    async def preconnect_async(self):
+        """Async version of preconnect, warming the event loop's session."""
+        if not config.tts.preconnect:
+            return
+        try:
+            async with self._async_session().head(
+                API_BASE, timeout=aiohttp.ClientTimeout(total=config.tts.connect_timeout)
+            ):
+                pass
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"TTS pre-connect failed: {str(e)}")
+
+    def close(self):
+        """Close the pooled sync HTTP session and the sentence synthesis threads."""
+        with self._lock:
+            session, self._sync_session = self._sync_session, None
+            pool, self._pool = self._pool, None
+        if session is not None:
+            session.close()
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+    async def close_async(self):
+        """Close the pooled async HTTP session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
 
 # Create singleton instance
 tts_handler = TTSHandler()